@@ -0,0 +1,97 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def saved_items_to_rows(apps, schema_editor):
+    UserProfile = apps.get_model("accounts", "UserProfile")
+    SavedItem = apps.get_model("accounts", "SavedItem")
+    SuggestionModel = apps.get_model("suggestions", "SuggestionModel")
+
+    profiles = list(UserProfile.objects.values_list("id", "saved_items"))
+    external_ids = {external_id for _, saved_items in profiles for external_id in saved_items or []}
+    suggestion_ids = dict(SuggestionModel.objects.filter(external_id__in=external_ids).values_list("external_id", "id"))
+
+    # Saved ids that no longer match a suggestion are dropped, they could not be displayed anyway
+    rows = {
+        (profile_id, suggestion_ids[external_id])
+        for profile_id, saved_items in profiles
+        for external_id in saved_items or []
+        if external_id in suggestion_ids
+    }
+    SavedItem.objects.bulk_create(
+        [SavedItem(user_id=user_id, suggestion_id=suggestion_id) for user_id, suggestion_id in rows],
+        batch_size=500,
+    )
+
+    counts = Counter(suggestion_id for _, suggestion_id in rows)
+    suggestions = list(SuggestionModel.objects.filter(id__in=counts).only("id"))
+    for suggestion in suggestions:
+        suggestion.saved_count = counts[suggestion.id]
+    SuggestionModel.objects.bulk_update(suggestions, ["saved_count"], batch_size=500)
+
+
+def rows_to_saved_items(apps, schema_editor):
+    UserProfile = apps.get_model("accounts", "UserProfile")
+    SavedItem = apps.get_model("accounts", "SavedItem")
+
+    saved_items = defaultdict(list)
+    for user_id, external_id in SavedItem.objects.order_by("created_at").values_list(
+        "user_id", "suggestion__external_id"
+    ):
+        saved_items[user_id].append(external_id)
+
+    profiles = list(UserProfile.objects.filter(id__in=saved_items).only("id"))
+    for profile in profiles:
+        profile.saved_items = saved_items[profile.id]
+    UserProfile.objects.bulk_update(profiles, ["saved_items"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("suggestions", "0003_saved_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SavedItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "suggestion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="suggestions.suggestionmodel",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="accounts.userprofile",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("user", "suggestion"), name="unique_saved_item")],
+            },
+        ),
+        migrations.RunPython(saved_items_to_rows, rows_to_saved_items),
+        migrations.RemoveField(
+            model_name="userprofile",
+            name="saved_items",
+        ),
+    ]
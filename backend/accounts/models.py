@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from suggestions.models import SuggestionModel
+
 User = get_user_model()
 
 
@@ -9,7 +11,6 @@ class UserProfile(models.Model):
 
     name = models.CharField(max_length=255)
     google_sub = models.CharField(max_length=255, unique=True, null=True, blank=True)
-    saved_items = models.JSONField(default=list)
     basic_information = models.JSONField(default=dict)
     interests = models.JSONField(default=list)
     goals = models.JSONField(default=list)
@@ -18,3 +19,18 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class SavedItem(models.Model):
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    suggestion = models.ForeignKey(SuggestionModel, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = (
+            # Also the index behind the save/unsave/check lookups and the user's saved list
+            models.UniqueConstraint(fields=["user", "suggestion"], name="unique_saved_item"),
+        )
+
+    def __str__(self):
+        return f"{self.user.name} - {self.suggestion.name}"
@@ -0,0 +1,22 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from suggestions.models import SuggestionModel
+
+from .models import SavedItem
+
+
+@receiver(post_save, sender=SavedItem)
+def increment_saved_count(sender, instance, created, **kwargs):
+    # Runs in the transaction that inserted the row, so the count commits or rolls back with it
+    if created:
+        SuggestionModel.objects.filter(pk=instance.suggestion_id).update(saved_count=F("saved_count") + 1)
+
+
+@receiver(post_delete, sender=SavedItem)
+def decrement_saved_count(sender, instance, **kwargs):
+    # Also fires for the rows cascaded away with a deleted profile
+    SuggestionModel.objects.filter(pk=instance.suggestion_id, saved_count__gt=0).update(
+        saved_count=F("saved_count") - 1
+    )
@@ -4,7 +4,7 @@ from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 from django.contrib.auth.models import User
 
-from accounts.models import UserProfile
+from accounts.models import SavedItem, UserProfile
 from suggestions.models import EXAMPLE_EXTERNAL_ID, SuggestionModel
 
 
@@ -110,7 +110,6 @@ class UserProfileViewTestCase(APITestCase):
             interests=["math"],
             goals=["learn"],
             other_goals="Other goals",
-            saved_items=["item1"],
             finished_onboarding=True,
         )
 
@@ -140,8 +139,18 @@ class SaveItemViewTestCase(APITestCase):
         self.user_model = UserProfile.objects.create(
             user=self.user,
             name="Test User",
-            saved_items=[],
         )
+        self.suggestions = {
+            external_id: SuggestionModel.objects.create(external_id=external_id, name=external_id)
+            for external_id in ["test123", "item1", "item2", "item3"]
+        }
+
+    def saved_items(self):
+        return set(SavedItem.objects.filter(user=self.user_model).values_list("suggestion__external_id", flat=True))
+
+    def save_items(self, *external_ids):
+        for external_id in external_ids:
+            SavedItem.objects.create(user=self.user_model, suggestion=self.suggestions[external_id])
 
     def test_save_item_without_auth(self):
         """Test that save item returns 401 when not authenticated"""
@@ -171,14 +180,14 @@ class SaveItemViewTestCase(APITestCase):
         self.assertEqual(response.data["message"], "Item added to saved items")
 
         # Check that item was added
-        self.user_model.refresh_from_db()
-        self.assertIn("test123", self.user_model.saved_items)
+        self.assertIn("test123", self.saved_items())
+        self.suggestions["test123"].refresh_from_db()
+        self.assertEqual(self.suggestions["test123"].saved_count, 1)
 
     def test_save_item_remove_existing_item(self):
         """Test that save item removes existing item from saved items"""
         # First add an item
-        self.user_model.saved_items = ["test123"]
-        self.user_model.save()
+        self.save_items("test123")
 
         response = self.client.post(
             "/accounts/save-item/",
@@ -190,8 +199,9 @@ class SaveItemViewTestCase(APITestCase):
         self.assertEqual(response.data["message"], "Item removed from saved items")
 
         # Check that item was removed
-        self.user_model.refresh_from_db()
-        self.assertNotIn("test123", self.user_model.saved_items)
+        self.assertNotIn("test123", self.saved_items())
+        self.suggestions["test123"].refresh_from_db()
+        self.assertEqual(self.suggestions["test123"].saved_count, 0)
 
     def test_save_item_user_model_not_found(self):
         """Test that save item returns 404 when UserProfile doesn't exist"""
@@ -226,15 +236,13 @@ class SaveItemViewTestCase(APITestCase):
         self.assertEqual(response2.status_code, status.HTTP_200_OK)
 
         # Verify both items are saved
-        self.user_model.refresh_from_db()
-        self.assertIn("item1", self.user_model.saved_items)
-        self.assertIn("item2", self.user_model.saved_items)
+        self.assertIn("item1", self.saved_items())
+        self.assertIn("item2", self.saved_items())
 
     def test_save_item_remove_one_keeps_others(self):
         """Test that removing one item doesn't affect other saved items"""
         # Add multiple items
-        self.user_model.saved_items = ["item1", "item2", "item3"]
-        self.user_model.save()
+        self.save_items("item1", "item2", "item3")
 
         # Remove one item
         response = self.client.post(
@@ -245,10 +253,32 @@ class SaveItemViewTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Verify other items are still saved
-        self.user_model.refresh_from_db()
-        self.assertIn("item1", self.user_model.saved_items)
-        self.assertNotIn("item2", self.user_model.saved_items)
-        self.assertIn("item3", self.user_model.saved_items)
+        self.assertIn("item1", self.saved_items())
+        self.assertNotIn("item2", self.saved_items())
+        self.assertIn("item3", self.saved_items())
+
+    def test_save_item_unknown_suggestion(self):
+        """Test that save item returns 404 when the suggestion doesn't exist"""
+        response = self.client.post(
+            "/accounts/save-item/",
+            {"external_id": "does-not-exist"},
+            HTTP_AUTHORIZATION=f"Bearer {self.access}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn("Suggestion not found", response.data["message"])
+
+    def test_saved_count_follows_deleted_profiles(self):
+        """Test that deleting a profile takes its saves out of the saved count"""
+        self.save_items("item1")
+        other_user = User.objects.create_user(username="other", email="other@example.com", password="testpassword123")
+        other_profile = UserProfile.objects.create(user=other_user, name="Other User")
+        SavedItem.objects.create(user=other_profile, suggestion=self.suggestions["item1"])
+        self.suggestions["item1"].refresh_from_db()
+        self.assertEqual(self.suggestions["item1"].saved_count, 2)
+
+        other_profile.delete()
+        self.suggestions["item1"].refresh_from_db()
+        self.assertEqual(self.suggestions["item1"].saved_count, 1)
 
 
 class CheckItemSavedViewTestCase(APITestCase):
@@ -261,7 +291,10 @@ class CheckItemSavedViewTestCase(APITestCase):
         self.user_model = UserProfile.objects.create(
             user=self.user,
             name="Test User",
-            saved_items=["saved_item_123"],
+        )
+        SavedItem.objects.create(
+            user=self.user_model,
+            suggestion=SuggestionModel.objects.create(external_id="saved_item_123", name="Saved Item"),
         )
 
     def test_check_item_saved_without_auth(self):
@@ -329,18 +362,18 @@ class SavedItemsViewTestCase(APITestCase):
         self.user_model = UserProfile.objects.create(
             user=self.user,
             name="Test User",
-            saved_items=[EXAMPLE_EXTERNAL_ID],
         )
 
         # Create test suggestions
-        SuggestionModel.objects.update_or_create(
+        suggestion = SuggestionModel.objects.update_or_create(
             external_id=EXAMPLE_EXTERNAL_ID,
             name="Example Item",
             category=["Example Category"],
             description="Example Description",
             url="https://example.com",
             image="https://example.com/image.jpg",
-        )
+        )[0]
+        SavedItem.objects.create(user=self.user_model, suggestion=suggestion)
 
     def test_saved_items_without_auth(self):
         """Test that saved items returns 401 when not authenticated"""
@@ -362,8 +395,7 @@ class SavedItemsViewTestCase(APITestCase):
     def test_saved_items_empty_list(self):
         """Test that saved items returns empty list when user has no saved items"""
         # Clear saved items
-        self.user_model.saved_items = []
-        self.user_model.save()
+        SavedItem.objects.filter(user=self.user_model).delete()
 
         response = self.client.post(
             "/accounts/saved-items/",
@@ -10,12 +10,13 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 
 from suggestions.models import SuggestionModel
 from suggestions.serializers import SuggestionSerializer
 
-from .models import UserProfile
+from .models import SavedItem, UserProfile
 from .serializers import CustomRefreshToken
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
@@ -162,7 +163,7 @@ class UserProfileView(APIView):
                     "interests": user_model.interests,
                     "goals": user_model.goals,
                     "other_goals": user_model.other_goals,
-                    "saved_items": user_model.saved_items,
+                    "saved_items": list(user_model.saveditem_set.values_list("suggestion__external_id", flat=True)),
                 },
                 status=status.HTTP_200_OK,
             )
@@ -198,20 +199,23 @@ class SaveItemView(APIView):
         except UserProfile.DoesNotExist:
             raise errors.NotFound("User not found")
 
-        if external_id in user_model.saved_items:
-            UserProfile.objects.update_or_create(
-                user=user,
-                defaults={"saved_items": [item for item in user_model.saved_items if item != external_id]},
-            )
+        with transaction.atomic():
+            # Locking the suggestion serializes concurrent toggles, so saved_count can't drift
+            try:
+                suggestion = SuggestionModel.objects.select_for_update().only("id").get(external_id=external_id)
+            except SuggestionModel.DoesNotExist:
+                raise errors.NotFound("Suggestion not found")
+
+            deleted, _ = SavedItem.objects.filter(user=user_model, suggestion=suggestion).delete()
+            if not deleted:
+                SavedItem.objects.create(user=user_model, suggestion=suggestion)
+
+        if deleted:
             return Response(
                 {"status": "ok", "message": "Item removed from saved items"},
                 status=status.HTTP_200_OK,
             )
         else:
-            UserProfile.objects.update_or_create(
-                user=user,
-                defaults={"saved_items": [*user_model.saved_items, external_id]},
-            )
             return Response(
                 {"status": "ok", "message": "Item added to saved items"},
                 status=status.HTTP_200_OK,
@@ -244,7 +248,7 @@ class CheckItemSavedView(APIView):
         except UserProfile.DoesNotExist:
             raise errors.NotFound("User not found")
 
-        if external_id in user_model.saved_items:
+        if SavedItem.objects.filter(user=user_model, suggestion__external_id=external_id).exists():
             return Response(
                 {"status": "ok", "message": "Item is saved", "is_saved": True},
                 status=status.HTTP_200_OK,
@@ -276,8 +280,10 @@ class SavedItemsView(APIView):
         except UserProfile.DoesNotExist:
             raise errors.ValidationError("User not found")
 
-        saved_items = user_model.saved_items
-        suggestions = SuggestionModel.objects.filter(external_id__in=saved_items)
+        # Most recently saved first, activities removed from the sheet are hidden until they return
+        suggestions = (
+            SuggestionModel.objects.active().filter(saveditem__user=user_model).order_by("-saveditem__created_at")
+        )
         suggestions_data = SuggestionSerializer(suggestions, many=True).data
         for suggestion in suggestions_data:
             suggestion["is_saved"] = True
@@ -0,0 +1,17 @@
+# Picked up automatically by `gunicorn pathfinder_api.wsgi:application` run from this directory, and by
+# the ASGI profile `gunicorn pathfinder_api.asgi:application -k uvicorn_worker.UvicornWorker`
+
+
+def post_worker_init(worker):
+    # Runs in every worker once Django is loaded, before it accepts requests. The model is loaded
+    # per worker because ONNX sessions cannot be shared across a fork.
+    from django.conf import settings
+
+    if not settings.EMBEDDING_MODEL["PRELOAD"]:
+        return
+
+    from pathfinder_api.vectordb import warm_up
+    from suggestions.models import SuggestionModel
+
+    timings = warm_up(index_models=[SuggestionModel])
+    worker.log.info("Worker %s warmed up: %s", worker.pid, ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
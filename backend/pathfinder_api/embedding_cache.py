@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from django.core.cache import caches
+
+
+def normalize_text(text):
+    """Canonical form of a text, so trivially different queries share one embedding"""
+    return " ".join(unicodedata.normalize("NFKC", str(text)).split())
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of float32 embeddings keyed by normalized text.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are evicted past
+    ``max_entries``. With ``shared_alias`` set, misses fall through to that Django cache (e.g.
+    Redis or the database cache) so all workers share the embeddings of popular queries.
+    """
+
+    def __init__(self, max_entries=10_000, ttl=None, shared_alias=None, namespace="embedding"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.namespace = namespace
+        self._entries = OrderedDict()  # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def key(self, text):
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    def get_many(self, texts):
+        """Return ``{text: vector}`` for the texts that are cached"""
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key, text in keys.items():
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] is not None and entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[text] = entry[1]
+            self.hits += len(found)
+
+        missing = [key for key, text in keys.items() if text not in found]
+        if missing and self.shared is not None:
+            shared = self.shared.get_many(missing)
+            vectors = {keys[key]: self._frombytes(value) for key, value in shared.items()}
+            self._store({self.key(text): vector for text, vector in vectors.items()})
+            found.update(vectors)
+            with self._lock:
+                self.shared_hits += len(vectors)
+
+        with self._lock:
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, vectors):
+        """Cache ``{text: vector}``"""
+        entries = {self.key(text): self._readonly(vector) for text, vector in vectors.items()}
+        self._store(entries)
+        if entries and self.shared is not None:
+            self.shared.set_many({key: vector.tobytes() for key, vector in entries.items()}, timeout=self.ttl)
+
+    def _store(self, entries):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            for key, vector in entries.items():
+                self._entries[key] = (expires_at, vector)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "shared_alias": self.shared_alias,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _readonly(vector):
+        # Cached arrays are handed out to every caller, so nobody may modify them in place
+        vector = np.array(vector, dtype=np.float32).reshape(-1)
+        vector.setflags(write=False)
+        return vector
+
+    @staticmethod
+    def _frombytes(value):
+        return np.frombuffer(value, dtype=np.float32)
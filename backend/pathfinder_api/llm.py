@@ -0,0 +1,147 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from django.conf import settings
+
+from .vectordb import LazySingleton
+
+
+class LLMStats:
+    """Per-worker counters of the upstream LLM calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = self.retries = self.failures = self.in_flight = 0
+
+    def record(self, outcome, delta=1):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + delta)
+
+    def clear(self):
+        with self._lock:
+            self.requests = self.retries = self.failures = self.in_flight = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+            }
+
+
+llm_stats = LLMStats()
+
+
+def retry_delay(attempt, error, config):
+    """Seconds to wait before retry number ``attempt``: the server's Retry-After, or full jitter backoff"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(float(retry_after), config["BACKOFF_MAX"])
+    except (TypeError, ValueError):
+        return random.uniform(0, min(config["BACKOFF_MAX"], config["BACKOFF_BASE"] * 2 ** (attempt - 1)))
+
+
+def is_retryable(error):
+    """Rate limits, server errors and dropped connections are worth another attempt"""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
+class LLMClient:
+    """Process-wide OpenAI client with a persistent connection pool.
+
+    The ``AsyncOpenAI`` client lives on its own event loop thread, so sync views, background
+    threads and management commands share one pool of keep-alive connections instead of paying
+    for a new client, TLS handshake and event loop per call. At most ``MAX_CONCURRENCY`` calls are
+    sent upstream at once, and 429/5xx answers are retried with jittered exponential backoff
+    within the caller's timeout.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or settings.LLM_CLIENT
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+        self._submit(self._setup()).result()
+
+    async def _setup(self):
+        # Created on the client's loop, which its connections and the semaphore are bound to
+        config = self.config
+        self._semaphore = asyncio.Semaphore(config["MAX_CONCURRENCY"])
+        self._client = AsyncOpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            base_url=config["BASE_URL"],
+            max_retries=0,  # Retried by _create, which knows the caller's deadline
+            timeout=httpx.Timeout(config["READ_TIMEOUT"], connect=config["CONNECT_TIMEOUT"]),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=config["MAX_CONNECTIONS"], max_keepalive_connections=config["MAX_CONNECTIONS"]
+                )
+            ),
+        )
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def chat(self, timeout=None, **kwargs):
+        """Create a chat completion from sync code, ``kwargs`` are those of ``chat.completions.create``.
+
+        ``timeout`` is the budget of the whole call in seconds, retries and queueing included.
+        """
+        return self._submit(self._create(timeout, kwargs)).result()
+
+    async def achat(self, timeout=None, **kwargs):
+        """``chat`` for async code running on any event loop"""
+        return await asyncio.wrap_future(self._submit(self._create(timeout, kwargs)))
+
+    async def _create(self, timeout, kwargs):
+        deadline = time.monotonic() + (timeout or self.config["READ_TIMEOUT"])
+        attempt = 0
+        while True:
+            try:
+                async with asyncio.timeout(deadline - time.monotonic()):
+                    async with self._semaphore:
+                        llm_stats.record("requests")
+                        llm_stats.record("in_flight")
+                        try:
+                            return await self._client.chat.completions.create(
+                                **kwargs, timeout=max(deadline - time.monotonic(), 0.001)
+                            )
+                        finally:
+                            llm_stats.record("in_flight", -1)
+            except TimeoutError:
+                llm_stats.record("failures")
+                raise openai.APITimeoutError(request=httpx.Request("POST", str(self._client.base_url)))
+            except openai.OpenAIError as error:
+                attempt += 1
+                delay = retry_delay(attempt, error, self.config)
+                retry = (
+                    is_retryable(error)
+                    and attempt <= self.config["MAX_RETRIES"]
+                    and time.monotonic() + delay < deadline
+                )
+                if not retry:
+                    llm_stats.record("failures")
+                    raise
+                llm_stats.record("retries")
+                await asyncio.sleep(delay)
+
+    def close(self):
+        self._submit(self._client.close()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+# The shared client of this process, rebuilt after a fork like the embedding model
+llm_client = LazySingleton(LLMClient)
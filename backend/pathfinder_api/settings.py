@@ -216,3 +216,92 @@ SIMPLE_JWT = {
     "SIGNING_KEY": SECRET_KEY,
     "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.CustomTokenObtainPairSerializer",
 }
+
+# Embedding model
+# Weights are stored in CACHE_DIR, downloaded at build time by `manage.py warm_up_embeddings`.
+# LOCAL_FILES_ONLY makes workers fail instead of downloading them at request time, and PRELOAD
+# makes every gunicorn worker load the model (and the vector index) before serving requests.
+# THREADS is the number of ONNX threads per worker. By default ONNX uses every core in every
+# worker, so keep workers x THREADS <= cores (see `manage.py benchmark_embeddings`).
+# PARALLEL > 1 embeds large batches (e.g. sheet syncs) in that many processes.
+EMBEDDING_MODEL = {
+    "NAME": env("EMBEDDING_MODEL_NAME", default="BAAI/bge-small-en-v1.5"),
+    "THREADS": env.int("EMBEDDING_MODEL_THREADS", default=None),
+    "BATCH_SIZE": env.int("EMBEDDING_MODEL_BATCH_SIZE", default=256),
+    "PARALLEL": env.int("EMBEDDING_MODEL_PARALLEL", default=None),
+    "CACHE_DIR": env("EMBEDDING_MODEL_CACHE_DIR", default=os.path.join(BASE_DIR, "var", "models")),
+    "LOCAL_FILES_ONLY": env.bool("EMBEDDING_MODEL_LOCAL_FILES_ONLY", default=False),
+    "PRELOAD": env.bool("EMBEDDING_MODEL_PRELOAD", default=False),
+}
+
+# Caches
+# e.g. CACHE_URL=redis://127.0.0.1:6379/1 or dbcache://django_cache (run `manage.py createcachetable`)
+CACHES = {"default": env.cache_url("CACHE_URL", default="locmemcache://")}
+
+# Query embeddings are cached per worker (bounded LRU with a TTL in seconds). Set SHARED_ALIAS
+# to a shared cache from CACHES so every worker reuses the embeddings of popular queries.
+EMBEDDING_CACHE = {
+    "MAX_ENTRIES": env.int("EMBEDDING_CACHE_MAX_ENTRIES", default=10_000),
+    "TTL": env.int("EMBEDDING_CACHE_TTL", default=7 * 24 * 3600),
+    "SHARED_ALIAS": env("EMBEDDING_CACHE_SHARED_ALIAS", default=None),
+}
+
+# Vector search
+# Each worker keeps its own in-memory index of the suggestion embeddings and patches it on
+# save/delete. Writes made by other workers are picked up by rebuilding after MAX_AGE seconds.
+# BACKEND is either pathfinder_api.vector_backends.ExactBackend (brute force) or
+# pathfinder_api.vector_backends.IVFFlatBackend (approximate, OPTIONS e.g. {"n_probe": 8}).
+# Workers load the index persisted in DIR by `manage.py build_vector_index` instead of rebuilding it.
+VECTOR_INDEX = {
+    "BACKEND": env("VECTOR_INDEX_BACKEND", default="pathfinder_api.vector_backends.ExactBackend"),
+    "OPTIONS": env.json("VECTOR_INDEX_OPTIONS", default={}),
+    "DIR": env("VECTOR_INDEX_DIR", default=os.path.join(BASE_DIR, "var", "vector_index")),
+    "MAX_AGE": env.int("VECTOR_INDEX_MAX_AGE", default=300),
+}
+
+# Personalized rankings cached in the database, one row per distinct onboarding profile.
+# Rows older than TTL seconds or ranked against an older catalog are recomputed, and past
+# MAX_ENTRIES the least recently hit rows are evicted. A hit refreshes the row's last hit
+# time at most once per TOUCH_INTERVAL seconds, so reads rarely write.
+SUGGESTION_CACHE = {
+    "MAX_ENTRIES": env.int("SUGGESTION_CACHE_MAX_ENTRIES", default=5_000),
+    "TTL": env.int("SUGGESTION_CACHE_TTL", default=30 * 24 * 3600),
+    "TOUCH_INTERVAL": env.int("SUGGESTION_CACHE_TOUCH_INTERVAL", default=300),
+}
+
+# Shared OpenAI client of each process (pathfinder_api/llm.py). At most MAX_CONCURRENCY calls
+# run upstream at once over up to MAX_CONNECTIONS keep-alive connections, and 429/5xx answers
+# are retried MAX_RETRIES times with jittered exponential backoff. BASE_URL points the client
+# at another OpenAI compatible server, e.g. a local stub in tests.
+LLM_CLIENT = {
+    "BASE_URL": env("OPENAI_BASE_URL", default=None),
+    "MAX_CONNECTIONS": env.int("LLM_MAX_CONNECTIONS", default=20),
+    "MAX_CONCURRENCY": env.int("LLM_MAX_CONCURRENCY", default=8),
+    "CONNECT_TIMEOUT": env.float("LLM_CONNECT_TIMEOUT", default=5.0),
+    "READ_TIMEOUT": env.float("LLM_READ_TIMEOUT", default=60.0),
+    "MAX_RETRIES": env.int("LLM_MAX_RETRIES", default=3),
+    "BACKOFF_BASE": env.float("LLM_BACKOFF_BASE", default=0.5),
+    "BACKOFF_MAX": env.float("LLM_BACKOFF_MAX", default=8.0),
+}
+
+# Personalized rankings. A cache miss is answered at once with a fallback ranking (embedding
+# similarity or popularity) while a background refresh awaits the ranker, at most WORKERS of them
+# at once. With BACKGROUND off the refined ranking is computed inside the request instead.
+SUGGESTION_RANKING = {
+    "BACKGROUND": env.bool("SUGGESTION_RANKING_BACKGROUND", default=True),
+    "WORKERS": env.int("SUGGESTION_RANKING_WORKERS", default=2),
+    # Ranker of the candidates (suggestions.rankers), and the one used when it fails or times out
+    "BACKEND": env("SUGGESTION_RANKING_BACKEND", default="suggestions.rankers.OpenAIRanker"),
+    "OPTIONS": env.json("SUGGESTION_RANKING_OPTIONS", default={}),
+    "FALLBACK_BACKEND": env("SUGGESTION_RANKING_FALLBACK_BACKEND", default="suggestions.rankers.LocalRanker"),
+    "MODEL": env("SUGGESTION_RANKING_MODEL", default="gpt-4o-mini"),
+    # Seconds a ranker may spend on one profile
+    "TIMEOUT": env.float("SUGGESTION_RANKING_TIMEOUT", default=60.0),
+    # Suggestions nearest to the profile that the LLM reranks, 0 sends the whole catalog
+    "CANDIDATES": env.int("SUGGESTION_RANKING_CANDIDATES", default=100),
+    # How long a worker owns a profile's refresh before another one may retry, must exceed TIMEOUT.
+    # Also the cooldown before a profile whose ranking failed is sent to the ranker again.
+    "LEASE": env.float("SUGGESTION_RANKING_LEASE", default=120.0),
+    # How long a request waits for an in-flight ranking before serving the cached or fallback one
+    "WAIT": env.float("SUGGESTION_RANKING_WAIT", default=0.0),
+}
@@ -0,0 +1,323 @@
+import os
+import tempfile
+
+import numpy as np
+
+
+def squared_distances(matrix, sq_norms, query):
+    # ||a - q||^2 = ||a||^2 - 2a.q + ||q||^2, a single matrix-vector product for all rows
+    dists = sq_norms - 2.0 * (matrix @ query) + np.dot(query, query)
+    return np.maximum(dists, 0, out=dists)
+
+
+def top_k(dists, k):
+    """Positions of the ``k`` smallest distances, nearest first, without sorting every row"""
+    if k is not None and k < len(dists):
+        positions = np.argpartition(dists, k - 1)[:k]
+    else:
+        positions = np.arange(len(dists))
+    return positions[np.argsort(dists[positions], kind="stable")]
+
+
+def select(ids, dists, k=None, max_distance=None):
+    """Pick the ``k`` nearest ``ids`` within ``max_distance`` given their squared distances"""
+    if max_distance is not None:
+        keep = dists <= max_distance**2
+        ids, dists = ids[keep], dists[keep]
+    positions = top_k(dists, k)
+    return ids[positions], np.sqrt(dists[positions])
+
+
+def row_norms(matrix):
+    return np.einsum("ij,ij->i", matrix, matrix)
+
+
+class VectorBackend:
+    """Nearest-neighbour engine behind ``VectorIndex``.
+
+    Backends hold ``(id, vector)`` pairs and answer ``query`` without touching the database.
+    Writers are serialized by the caller, but queries may run concurrently with them, so each
+    backend swaps its searchable state in as a single attribute.
+    """
+
+    def build(self, ids, vectors):
+        """Replace the whole contents with ``ids``/``vectors`` (an ``(n, d)`` float32 matrix)"""
+        raise NotImplementedError
+
+    def add(self, ids, vectors):
+        """Insert new ids and overwrite the vectors of existing ones"""
+        raise NotImplementedError
+
+    def remove(self, ids):
+        raise NotImplementedError
+
+    def query(self, vector, k=None, max_distance=None, ids=None):
+        """Return ``(ids, distances)`` of the ``k`` closest vectors, nearest first.
+
+        Results further than ``max_distance`` are dropped, and ``ids`` restricts the search to
+        those candidates (a pre-filter computed by the caller).
+        """
+        raise NotImplementedError
+
+    def items(self):
+        """Return ``(ids, vectors)`` of everything in the backend"""
+        raise NotImplementedError
+
+    @property
+    def dimensions(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        return len(self.items()[0])
+
+    def get_state(self):
+        """Extra arrays to persist next to the vectors (e.g. trained centroids)"""
+        return {}
+
+    def set_state(self, state):
+        pass
+
+    def save(self, path):
+        ids, vectors = self.items()
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        # Write next to the target and rename so workers never load a half-written file
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npz", delete=False) as f:
+            np.savez(f, ids=ids, vectors=vectors, **self.get_state())
+        os.replace(f.name, path)
+
+    def load(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.set_state({key: data[key] for key in data.files if key not in ("ids", "vectors")})
+            self.build(data["ids"], data["vectors"])
+
+    @staticmethod
+    def empty_result():
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+class ExactBackend(VectorBackend):
+    """Brute-force search over one contiguous matrix. Exact, O(n·d) per query."""
+
+    def __init__(self):
+        # (ids, (n, d) matrix, squared row norms, id -> row in the matrix)
+        self._state = (np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), np.empty(0, np.float32), {})
+
+    def _set(self, ids, matrix):
+        self._state = (ids, matrix, row_norms(matrix), {pk: i for i, pk in enumerate(ids.tolist())})
+
+    def build(self, ids, vectors):
+        self._set(np.asarray(ids, dtype=np.int64), np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def add(self, ids, vectors):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        current_ids, matrix, _, positions = self._state
+        if len(current_ids) == 0:
+            self.build(ids, vectors)
+            return
+
+        new, replaced, replacements = [], [], []
+        for i, pk in enumerate(ids.tolist()):
+            position = positions.get(pk)
+            if position is None:
+                new.append(i)
+            else:
+                replaced.append(position)
+                replacements.append(i)
+
+        if replaced:
+            matrix = matrix.copy()  # Copy-on-write, concurrent queries keep reading the current state
+            matrix[replaced] = vectors[replacements]
+        if new:
+            current_ids, matrix = np.concatenate([current_ids, ids[new]]), np.vstack([matrix, vectors[new]])
+        self._set(current_ids, matrix)
+
+    def remove(self, ids):
+        current_ids, matrix, _, positions = self._state
+        removed = [positions[pk] for pk in ids if pk in positions]
+        if removed:
+            self._set(np.delete(current_ids, removed), np.delete(matrix, removed, axis=0))
+
+    def query(self, vector, k=None, max_distance=None, ids=None):
+        all_ids, matrix, sq_norms, positions = self._state
+        if len(all_ids) == 0 or (k is not None and k <= 0):
+            return self.empty_result()
+
+        if ids is not None:
+            rows = np.fromiter((positions[pk] for pk in ids if pk in positions), dtype=np.int64)
+            all_ids, matrix, sq_norms = all_ids[rows], matrix[rows], sq_norms[rows]
+
+        return select(all_ids, squared_distances(matrix, sq_norms, vector), k, max_distance)
+
+    def items(self):
+        return self._state[0], self._state[1]
+
+    @property
+    def dimensions(self):
+        return self._state[1].shape[1]
+
+
+class IVFFlatBackend(VectorBackend):
+    """Inverted-file index: vectors are bucketed by their nearest k-means centroid.
+
+    A query only scans the ``n_probe`` buckets whose centroids are closest to it, so the cost is
+    roughly ``n_probe / n_lists`` of an exact scan. Recall is traded for latency via ``n_probe``.
+    Centroids survive rebuilds and are persisted with ``save``. A rebuild only retrains them once the
+    corpus has outgrown them: ``retrain_growth`` times the rows they were trained on, or too few lists
+    for its size.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, max_training_rows=20_000, retrain_growth=4, seed=0):
+        self.n_lists = n_lists  # Defaults to sqrt(n) at training time
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.max_training_rows = max_training_rows
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+        self._centroids = None
+        self._trained_rows = None  # Size of the corpus the centroids were trained on
+        # (centroids, centroid norms, [(ids, matrix, sq_norms) per list], id -> list number)
+        self._state = None
+
+    def get_state(self):
+        if self._centroids is None:
+            return {}
+        return {"centroids": self._centroids, "trained_rows": np.asarray(self._trained_rows or 0)}
+
+    def set_state(self, state):
+        if "centroids" in state:
+            self._centroids = np.ascontiguousarray(state["centroids"], dtype=np.float32)
+            self._trained_rows = int(state["trained_rows"]) if "trained_rows" in state else None
+
+    def needs_training(self, n, dimensions):
+        """Whether a build of ``n`` vectors should train new centroids rather than reuse the current ones"""
+        if self._centroids is None or self._centroids.shape[1] != dimensions:
+            return True
+        if self._trained_rows and n > self.retrain_growth * self._trained_rows:
+            return True
+        # With n_lists derived from the corpus, sqrt(n) lists keep every list about sqrt(n) long
+        return self.n_lists is None and len(self._centroids) < np.sqrt(n) / 2
+
+    def train(self, vectors):
+        self._trained_rows = len(vectors)
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.max_training_rows:
+            vectors = vectors[rng.choice(len(vectors), self.max_training_rows, replace=False)]
+
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = self._assign(vectors, centroids)
+            order = np.argsort(assignments, kind="stable")
+            lists, starts, counts = np.unique(assignments[order], return_index=True, return_counts=True)
+            sums = np.add.reduceat(vectors[order], starts, axis=0)
+            centroids[lists] = sums / counts[:, None]  # Empty lists keep their previous centroid
+        self._centroids = centroids
+
+    @staticmethod
+    def _assign(vectors, centroids, chunk_size=8192):
+        c_norms = row_norms(centroids)
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start : start + chunk_size]
+            assignments[start : start + chunk_size] = np.argmin(c_norms - 2.0 * (chunk @ centroids.T), axis=1)
+        return assignments
+
+    def build(self, ids, vectors):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(ids) and self.needs_training(len(ids), vectors.shape[1]):
+            self.train(vectors)
+        if self._centroids is None:
+            self._state = None
+            return
+
+        assignments = self._assign(vectors, self._centroids) if len(ids) else np.empty(0, dtype=np.int64)
+        lists = []
+        for n in range(len(self._centroids)):
+            mask = assignments == n
+            lists.append((ids[mask], vectors[mask], row_norms(vectors[mask])))
+        self._state = (
+            self._centroids,
+            row_norms(self._centroids),
+            lists,
+            dict(zip(ids.tolist(), assignments.tolist())),
+        )
+
+    def add(self, ids, vectors):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self._state is None:
+            self.build(ids, vectors)
+            return
+
+        centroids, c_norms = self._state[:2]
+        lists, where = self._without(ids.tolist())
+        assignments = self._assign(vectors, centroids)
+        for n in np.unique(assignments).tolist():
+            mask = assignments == n
+            list_ids, matrix, _ = lists[n]
+            matrix = np.vstack([matrix, vectors[mask]])
+            lists[n] = (np.concatenate([list_ids, ids[mask]]), matrix, row_norms(matrix))
+        where.update(zip(ids.tolist(), assignments.tolist()))
+        self._state = (centroids, c_norms, lists, where)
+
+    def remove(self, ids):
+        if self._state is None:
+            return
+        self._state = (*self._state[:2], *self._without(ids))
+
+    def _without(self, ids):
+        """Copies of the lists and the id -> list map without ``ids``, concurrent queries keep the current ones"""
+        lists, where = list(self._state[2]), dict(self._state[3])
+        by_list = {}
+        for pk in ids:
+            if pk in where:
+                by_list.setdefault(where.pop(pk), set()).add(pk)
+        for n, removed in by_list.items():
+            list_ids, matrix, sq_norms = lists[n]
+            keep = ~np.isin(list_ids, list(removed))
+            lists[n] = (list_ids[keep], matrix[keep], sq_norms[keep])
+        return lists, where
+
+    def query(self, vector, k=None, max_distance=None, ids=None):
+        if self._state is None or (k is not None and k <= 0):
+            return self.empty_result()
+
+        centroids, c_norms, lists, where = self._state
+        if ids is None:
+            probe = top_k(squared_distances(centroids, c_norms, vector), self.n_probe).tolist()
+            candidates = None
+        else:
+            # A pre-filter is usually selective, so scan exactly the lists holding a candidate
+            candidates = np.asarray(list(ids), dtype=np.int64)
+            probe = sorted({where[pk] for pk in candidates.tolist() if pk in where})
+
+        found_ids, dists = [], []
+        for n in probe:
+            list_ids, matrix, sq_norms = lists[n]
+            if candidates is not None:
+                keep = np.isin(list_ids, candidates)
+                list_ids, matrix, sq_norms = list_ids[keep], matrix[keep], sq_norms[keep]
+            if len(list_ids):
+                found_ids.append(list_ids)
+                dists.append(squared_distances(matrix, sq_norms, vector))
+        if not found_ids:
+            return self.empty_result()
+
+        return select(np.concatenate(found_ids), np.concatenate(dists), k, max_distance)
+
+    def items(self):
+        if self._state is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        lists = self._state[2]
+        return np.concatenate([ids for ids, _, _ in lists]), np.vstack([matrix for _, matrix, _ in lists])
+
+    @property
+    def dimensions(self):
+        return 0 if self._centroids is None else self._centroids.shape[1]
+
+    def __len__(self):
+        return 0 if self._state is None else len(self._state[3])
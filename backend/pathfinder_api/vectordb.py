@@ -1,12 +1,19 @@
-import functools
 import json
+import logging
 import os
 import threading
+import time
 
 import numpy as np
 from fastembed import TextEmbedding
 
+from django.conf import settings
 from django.db import models
+from django.utils.module_loading import import_string
+
+from .embedding_cache import EmbeddingCache, normalize_text
+
+logger = logging.getLogger(__name__)
 
 
 class LazySingleton:
@@ -37,40 +44,289 @@ class LazySingleton:
         return getattr(self.get(), name)
 
 
-# Only loaded the first time it is used
-model: TextEmbedding = LazySingleton(lambda: TextEmbedding())  # Use the base model
+def create_model():
+    config = settings.EMBEDDING_MODEL
+    # fastembed applies THREADS to both the intra-op and inter-op pools of the ONNX session
+    kwargs = {"model_name": config["NAME"], "cache_dir": config["CACHE_DIR"], "threads": config["THREADS"]}
+    if config.get("LOCAL_FILES_ONLY"):
+        kwargs["local_files_only"] = True  # Never download weights, fail instead
+    return TextEmbedding(**kwargs)
+
+
+# Only loaded the first time it is used, unless warm_up() preloads it
+model: TextEmbedding = LazySingleton(create_model)
+
+
+embedding_cache = LazySingleton(
+    lambda: EmbeddingCache(
+        max_entries=settings.EMBEDDING_CACHE["MAX_ENTRIES"],
+        ttl=settings.EMBEDDING_CACHE["TTL"],
+        shared_alias=settings.EMBEDDING_CACHE["SHARED_ALIAS"],
+        namespace=f"embedding:{settings.EMBEDDING_MODEL['NAME']}",  # Vectors of another model are useless
+    )
+)
+
+
+def embed_texts(texts):
+    """Embed ``texts`` with the model in batches, as float32 vectors, without the embedding cache.
+
+    For catalog documents, which are embedded once per change and would only evict hot queries.
+    """
+    config = settings.EMBEDDING_MODEL
+    texts = [normalize_text(text) for text in texts]
+    embeddings = model.embed(texts, batch_size=config["BATCH_SIZE"], parallel=config["PARALLEL"])
+    return [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+
+
+def get_embeddings(texts):
+    """Embed ``texts`` as float32 vectors, sending only the cache misses to the model in one batch"""
+    texts = [normalize_text(text) for text in texts]
+    found = embedding_cache.get_many(set(texts))
+
+    misses = list(dict.fromkeys(text for text in texts if text not in found))
+    if misses:
+        computed = dict(zip(misses, embed_texts(misses)))
+        embedding_cache.set_many(computed)
+        found.update(computed)
+
+    return [np.asarray(found[text], dtype=np.float32) for text in texts]
 
 
-@functools.lru_cache
 def get_embedding(data):
-    return [vec.tolist() for vec in model.embed(data)]
+    return get_embeddings([data])[0]
+
+
+def warm_up(index_models=()):
+    """Load the embedding model, run one embedding and load the vector indexes of ``index_models``.
+
+    Called at worker boot so the first request does not pay for it. Returns the timings in seconds.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    model.get()
+    timings["load_model"] = time.perf_counter() - start
+
+    # The first run initializes the ONNX session (memory arenas, kernel selection)
+    start = time.perf_counter()
+    list(model.embed(["warm up"]))
+    timings["first_embedding"] = time.perf_counter() - start
+
+    for index_model in index_models:
+        start = time.perf_counter()
+        len(get_vector_index(index_model))
+        timings[f"load_index:{index_model._meta.label_lower}"] = time.perf_counter() - start
+
+    logger.info("Warmed up in %s", ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    return timings
 
 
 class VectorField(models.Field):
-    def __init__(self, dimensions, *args, **kwargs):
+    """Stores an embedding either as JSON text or, with ``binary=True``, as packed float32 bytes.
+
+    The binary mode uses the backend's native binary column (bytea on Postgres, BLOB on SQLite)
+    and decodes straight into a read-only ``np.ndarray`` without copying.
+    """
+
+    # Little-endian float32, independent of the architecture the rows were written on
+    DTYPE = np.dtype("<f4")
+
+    def __init__(self, dimensions, *args, binary=False, **kwargs):
         self.dimensions = int(dimensions)
+        self.binary = binary
         super().__init__(*args, **kwargs)
 
     def deconstruct(self):
         name, path, args, kwargs = super().deconstruct()
         kwargs["dimensions"] = self.dimensions
+        if self.binary:
+            kwargs["binary"] = True
         return name, path, args, kwargs
 
     def db_type(self, connection):
+        if self.binary:
+            return connection.data_types["BinaryField"]
         return "text"
 
     def get_prep_value(self, value):
         if value is None:
             return None
+        if self.binary:
+            return np.asarray(value, dtype=self.DTYPE).reshape(-1).tobytes()
         return json.dumps(value)
 
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if self.binary and value is not None:
+            return connection.Database.Binary(value)
+        return value
+
     def from_db_value(self, value, expression, connection):
         if value is None:
             return None
+        if self.binary:
+            return np.frombuffer(value, dtype=self.DTYPE)
         return json.loads(value)
 
 
-def vector_search(model, query_vec):
-    objs = list(model.objects.all())
-    dists = [np.linalg.norm(np.array(o.embedding) - query_vec).item() for o in objs]
-    return sorted(zip(objs, dists), key=lambda x: x[1])  # Sort by distance, but return (objs, dists)
+class VectorIndex:
+    """Process-local nearest-neighbour index over the embeddings of a model.
+
+    The search itself is delegated to the backend configured in ``settings.VECTOR_INDEX``. The
+    index is loaded from its persisted file (or built from the database) on the first search,
+    then patched in place through ``upsert``/``remove`` so saves and deletes do not force a rebuild.
+    """
+
+    def __init__(self, model, field="embedding", condition=None):
+        self.model = model
+        self.field = field
+        self.condition = condition  # Q the indexed rows must match
+        self._lock = threading.Lock()
+        self._backend = None
+        self._built_at = 0.0
+        self._use_file = True  # Only the first build of the process may come from the persisted file
+
+    @property
+    def path(self):
+        directory = settings.VECTOR_INDEX.get("DIR")
+        if not directory:
+            return None
+        return os.path.join(directory, f"{self.model._meta.label_lower}.npz")
+
+    def _create_backend(self):
+        backend = import_string(settings.VECTOR_INDEX["BACKEND"])(**settings.VECTOR_INDEX.get("OPTIONS", {}))
+        if self._backend is not None:
+            backend.set_state(self._backend.get_state())  # e.g. keep trained centroids across rebuilds
+        return backend
+
+    def _is_stale(self):
+        # Other workers patch their own copy only, so rebuild after a while to pick up their writes
+        max_age = settings.VECTOR_INDEX.get("MAX_AGE")
+        return bool(max_age) and time.monotonic() - self._built_at > max_age
+
+    def _read_rows(self):
+        ids, vectors = [], []
+        dimensions = None
+        queryset = self.model.objects.all()
+        if self.condition is not None:
+            queryset = queryset.filter(self.condition)
+        rows = queryset.values_list("pk", self.field).iterator(chunk_size=2000)
+        for pk, embedding in rows:
+            if embedding is None:
+                continue
+            vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            if dimensions is None and len(vector):
+                dimensions = len(vector)
+            if not len(vector) or len(vector) != dimensions:
+                continue  # Skip empty rows and rows embedded with a different model
+            ids.append(pk)
+            vectors.append(vector)
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dimensions or 0)
+        return np.asarray(ids, dtype=np.int64), matrix
+
+    def _load(self):
+        path = self.path
+        self._use_file = False
+        if not path or not os.path.exists(path):
+            return False
+
+        backend = self._create_backend()
+        try:
+            backend.load(path)
+        except (OSError, ValueError, KeyError):
+            logger.warning("Could not load vector index from %s, rebuilding it", path, exc_info=True)
+            return False
+
+        self._backend = backend
+        self._built_at = time.monotonic()
+        return True
+
+    def _build(self):
+        backend = self._create_backend()
+        backend.build(*self._read_rows())
+        self._backend = backend  # Swapped in whole, so concurrent searches never see a partial build
+        self._built_at = time.monotonic()
+
+    def _get_backend(self):
+        with self._lock:
+            stale = self._backend is None or self._is_stale()
+            if stale and not (self._use_file and self._load()):
+                self._build()
+            return self._backend
+
+    def search(self, query_vec, k=None, max_distance=None, ids=None):
+        """Return ``(ids, distances)`` of the ``k`` closest rows within ``max_distance``, nearest first.
+
+        ``ids`` optionally restricts the search to those primary keys.
+        """
+        backend = self._get_backend()
+        query = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        if len(backend) == 0 or backend.dimensions != query.shape[0]:
+            return backend.empty_result()
+        return backend.query(query, k, max_distance, ids)
+
+    def upsert(self, pk, embedding):
+        """Add or replace the vector of ``pk`` without rebuilding the index"""
+        with self._lock:
+            if self._backend is None:
+                return  # Not built yet, the next search loads the row from the database
+
+            vector = np.asarray([] if embedding is None else embedding, dtype=np.float32).reshape(-1)
+            if not len(vector) or (len(self._backend) and len(vector) != self._backend.dimensions):
+                self._backend.remove([pk])
+                return
+            self._backend.add([pk], vector[None, :])
+
+    def remove(self, pk):
+        with self._lock:
+            if self._backend is not None:
+                self._backend.remove([pk])
+
+    def invalidate(self):
+        """Drop the index, it is rebuilt from the database on the next search"""
+        with self._lock:
+            self._backend = None
+            self._use_file = False
+
+    def save(self):
+        """Rebuild the index from the database and persist it for the workers to load at startup"""
+        with self._lock:
+            self._build()
+            self._backend.save(self.path)
+        return self.path
+
+    def __len__(self):
+        return len(self._get_backend())
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(model):
+    with _indexes_lock:
+        if model._meta.label not in _indexes:
+            _indexes[model._meta.label] = VectorIndex(model, condition=getattr(model, "vector_index_condition", None))
+        return _indexes[model._meta.label]
+
+
+def nearest_ids(model, query_vec, k=None, max_distance=None, queryset=None):
+    """Return ``(ids, distances)`` lists of the ``k`` nearest rows within ``max_distance``, nearest first.
+
+    ``queryset`` pre-filters the candidates, the distances are only computed for its rows.
+    """
+    candidates = None
+    if queryset is not None:
+        candidates = list(queryset.values_list("pk", flat=True))
+
+    ids, dists = get_vector_index(model).search(query_vec, k, max_distance, candidates)
+    return ids.tolist(), dists.tolist()
+
+
+def vector_search(model, query_vec, k=None, max_distance=None, queryset=None):
+    """Return ``(obj, distance)`` pairs of the ``k`` nearest rows within ``max_distance``, see ``nearest_ids``"""
+    ids, dists = nearest_ids(model, query_vec, k, max_distance, queryset)
+    objs = model.objects.in_bulk(ids)  # Only the winning rows are loaded
+    # Sorted by distance, but return (objs, dists). Rows deleted by another worker are skipped.
+    return [(objs[pk], dist) for pk, dist in zip(ids, dists) if pk in objs]
@@ -24,5 +24,14 @@ echo "Migrating database..."
 python manage.py makemigrations --no-input || true
 python manage.py migrate --no-input
 
+echo "Downloading embedding model..."
+python manage.py warm_up_embeddings
+
 echo "Syncing suggestions..."
 python manage.py sync_sheet
+
+echo "Building vector index..."
+python manage.py build_vector_index
+
+echo "Pruning personalized suggestion cache..."
+python manage.py prune_suggestion_cache
@@ -14,5 +14,12 @@ class UserRating(models.Model):
     image = models.ImageField(upload_to="uploads/", blank=True, null=True, default=None)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored rating, so the signals can move the suggestion aggregates by the difference
+        instance._stored_rating = instance.rating if "rating" in field_names else None
+        return instance
+
     def __str__(self):
         return f"{self.user.name} - {self.suggestion.name}"
@@ -0,0 +1,39 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from suggestions.models import SuggestionModel
+
+from .models import UserRating
+
+
+def move_rating_aggregates(suggestion_id, rating_delta, count_delta):
+    # A single UPDATE, so concurrent ratings of the same suggestion never overwrite each other
+    SuggestionModel.objects.filter(pk=suggestion_id).update(
+        rating_sum=F("rating_sum") + rating_delta, rating_count=F("rating_count") + count_delta
+    )
+
+
+@receiver(pre_save, sender=UserRating)
+def load_stored_rating(sender, instance, **kwargs):
+    # Instances that did not come from the database (or deferred the rating) look it up once
+    if instance.pk is not None and getattr(instance, "_stored_rating", None) is None:
+        instance._stored_rating = sender.objects.filter(pk=instance.pk).values_list("rating", flat=True).first()
+
+
+@receiver(post_save, sender=UserRating)
+def update_rating_aggregates(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        move_rating_aggregates(instance.suggestion_id, instance.rating, 1)
+    elif update_fields is None or "rating" in update_fields:
+        stored = instance._stored_rating if instance._stored_rating is not None else instance.rating
+        if instance.rating != stored:
+            move_rating_aggregates(instance.suggestion_id, instance.rating - stored, 0)
+    instance._stored_rating = instance.rating
+
+
+@receiver(post_delete, sender=UserRating)
+def remove_rating_aggregates(sender, instance, **kwargs):
+    # Also fires for the ratings cascaded away with a deleted profile
+    rating = getattr(instance, "_stored_rating", None) or instance.rating
+    move_rating_aggregates(instance.suggestion_id, -rating, -1)
@@ -1,8 +1,11 @@
+from io import StringIO
+
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
 
 from accounts.models import UserProfile
 from suggestions.models import EXAMPLE_EXTERNAL_ID, SuggestionModel
@@ -16,12 +19,7 @@ class UpdateOrModifySuggestionRatingTestCase(APITestCase):
     def setUp(self):
         """Set up test user"""
         self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
-        UserProfile.objects.update_or_create(
-            user=self.user,
-            defaults={
-                "saved_items": [EXAMPLE_EXTERNAL_ID],
-            },
-        )
+        UserProfile.objects.create(user=self.user)
         self.access = AccessToken.for_user(self.user)
         SuggestionModel.objects.update_or_create(
             external_id=EXAMPLE_EXTERNAL_ID,
@@ -131,6 +129,68 @@ class UpdateOrModifySuggestionRatingTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class RatingAggregatesTestCase(APITestCase):
+    """Tests for the rating aggregates stored on suggestions"""
+
+    def setUp(self):
+        """Set up test users and a suggestion"""
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
+        self.access = AccessToken.for_user(self.user)
+        self.user_profile = UserProfile.objects.create(user=self.user, name="Test User")
+        other_user = User.objects.create_user(username="other", email="other@example.com", password="testpassword123")
+        self.other_profile = UserProfile.objects.create(user=other_user, name="Other User")
+        self.suggestion = SuggestionModel.objects.create(external_id=EXAMPLE_EXTERNAL_ID, name="Example Item")
+
+    def assertAggregates(self, rating_sum, rating_count, rating_average):
+        self.suggestion.refresh_from_db()
+        self.assertEqual(
+            (self.suggestion.rating_sum, self.suggestion.rating_count, self.suggestion.rating_average),
+            (rating_sum, rating_count, rating_average),
+        )
+
+    def rate(self, rating):
+        response = self.client.post(
+            "/api/social/rate/",
+            {"external_id": EXAMPLE_EXTERNAL_ID, "rating": rating},
+            HTTP_AUTHORIZATION=f"Bearer {self.access}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rating_updates_aggregates(self):
+        """Test that creating and then changing a rating moves the aggregates"""
+        UserRating.objects.create(user=self.other_profile, suggestion=self.suggestion, rating=4)
+        self.rate(2)
+        self.assertAggregates(6, 2, 3.0)
+
+        self.rate(5)
+        self.assertAggregates(9, 2, 4.5)
+
+    def test_deletes_update_aggregates(self):
+        """Test that deleted ratings, directly or with their profile, leave the aggregates"""
+        rating = UserRating.objects.create(user=self.user_profile, suggestion=self.suggestion, rating=3)
+        UserRating.objects.create(user=self.other_profile, suggestion=self.suggestion, rating=5)
+        self.assertAggregates(8, 2, 4.0)
+
+        rating.delete()
+        self.assertAggregates(5, 1, 5.0)
+
+        self.other_profile.delete()
+        self.assertAggregates(0, 0, 0.0)
+
+    def test_recompute_rating_aggregates(self):
+        """Test that the management command rebuilds drifted aggregates"""
+        UserRating.objects.create(user=self.user_profile, suggestion=self.suggestion, rating=3)
+        UserRating.objects.create(user=self.other_profile, suggestion=self.suggestion, rating=4)
+        SuggestionModel.objects.update(rating_sum=0, rating_count=0)
+        empty = SuggestionModel.objects.create(external_id="empty", name="Empty")
+
+        call_command("recompute_rating_aggregates", stdout=StringIO())
+
+        self.assertAggregates(7, 2, 3.5)
+        empty.refresh_from_db()
+        self.assertEqual((empty.rating_sum, empty.rating_count), (0, 0))
+
+
 class GetSuggestionReviewsTestCase(APITestCase):
     """Tests for the get suggestion reviews endpoint"""
 
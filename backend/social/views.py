@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView, Response
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
 from accounts.models import UserProfile
 from suggestions.models import SuggestionModel
@@ -51,33 +52,35 @@ class UpdateOrModifySuggestionRating(APIView):
         except SuggestionModel.DoesNotExist:
             raise errors.ValidationError("Failed due to external ID not existing")
 
-        user_profile = UserProfile.objects.get(user=request.user)
-        review = UserRating.objects.filter(user=user_profile, suggestion=suggestion).first()
-
-        if review:
-            # If review already exists, update it
-            review.rating = rating
-            review.comment = comment
-            if image is not None:
-                review.image = image
-            review.save()
-        else:
-            # If review does not exist, create it
-            if image is not None:
-                UserRating.objects.get_or_create(
-                    user=user_profile,
-                    suggestion=suggestion,
-                    rating=rating,
-                    comment=comment,
-                    image=image,
-                )
+        # The rating and the suggestion aggregates (updated by the signals) commit together
+        with transaction.atomic():
+            user_profile = UserProfile.objects.get(user=request.user)
+            review = UserRating.objects.select_for_update().filter(user=user_profile, suggestion=suggestion).first()
+
+            if review:
+                # If review already exists, update it
+                review.rating = rating
+                review.comment = comment
+                if image is not None:
+                    review.image = image
+                review.save()
             else:
-                UserRating.objects.get_or_create(
-                    user=user_profile,
-                    suggestion=suggestion,
-                    rating=rating,
-                    comment=comment,
-                )
+                # If review does not exist, create it
+                if image is not None:
+                    UserRating.objects.get_or_create(
+                        user=user_profile,
+                        suggestion=suggestion,
+                        rating=rating,
+                        comment=comment,
+                        image=image,
+                    )
+                else:
+                    UserRating.objects.get_or_create(
+                        user=user_profile,
+                        suggestion=suggestion,
+                        rating=rating,
+                        comment=comment,
+                    )
         updated = UserRating.objects.get(user=user_profile, suggestion=suggestion)
         serializer = UserRatingSerializer(updated)
         return Response(serializer.data, status=status.HTTP_200_OK)
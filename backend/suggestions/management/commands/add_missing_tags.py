@@ -2,13 +2,15 @@ import asyncio
 import json
 import logging
 import os
+import time
 from datetime import datetime
 
-from openai import AsyncOpenAI
+from asgiref.sync import async_to_sync, sync_to_async
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from suggestions.models import SuggestionModel
+from pathfinder_api.llm import llm_client
+from suggestions.models import CatalogVersion, SuggestionModel
 
 from .reco_schema import ACTIVITY_CLASSIFICATION_SCHEMA, SYSTEM_RULES
 
@@ -25,37 +27,106 @@ file_handler.setLevel(logging.INFO)
 file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
 logger.addHandler(file_handler)
 
+DEFAULT_CHECKPOINT = "./var/add_missing_tags.checkpoint"
+
 
 class Command(BaseCommand):
     """Add tags to all the activities"""
 
     help = "Add tags to all the activities"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--only-missing", action="store_true", help="Only tag activities without tags")
+        parser.add_argument("--concurrency", type=int, default=8, help="Classification requests in flight at once")
+        parser.add_argument("--batch-size", type=int, default=50, help="Activities written per bulk update")
+        parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="File recording the progress")
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an unfinished run")
+
     def handle(self, *args, **kwargs):
+        for option in ("concurrency", "batch_size"):
+            if kwargs[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1")
         logger.info("Adding missing tags")
 
-        api_key = os.environ.get("OPENAI_API_KEY")
-        client = AsyncOpenAI(api_key=api_key)
-
-        for suggestion in SuggestionModel.objects.all():
-            completion = asyncio.run(self.async_completions(client, suggestion))
-            content = completion.choices[0].message.content
-            content = json.loads(content)
-            self.stdout.write(suggestion.name)
-            self.stdout.write(json.dumps(content))
-            classification = content["classification"]
-            tags = (
-                self.ensure_list(classification["interest_area"])
-                + self.ensure_list(classification["activity_type"])
-                + self.ensure_list(classification["skill_focus"])
+        last_id = None if kwargs["restart"] else self.read_checkpoint(kwargs["checkpoint"])
+        if last_id is not None:
+            self.stdout.write(f"Resuming after activity {last_id}")
+
+        start = time.perf_counter()
+        # async_to_sync keeps the ORM calls on this thread and its database connection
+        tagged, failed = async_to_sync(self.tag_all)(last_id, kwargs)
+        elapsed = time.perf_counter() - start
+
+        if failed:
+            self.stdout.write("Run again to retry the failed activities from the checkpoint")
+        elif os.path.exists(kwargs["checkpoint"]):
+            os.remove(kwargs["checkpoint"])  # Finished, the next run starts over
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Tagged {tagged} activities ({failed} failed) in {elapsed:.1f}s, {tagged / max(elapsed, 1e-9):.1f} rows/sec"
             )
-            suggestion.tags = tags
-            suggestion.save()
-
+        )
         logger.info("Added missing tags")
 
-    async def async_completions(self, client, suggestions):
-        completion = await client.chat.completions.create(
+    async def tag_all(self, last_id, options):
+        queryset = SuggestionModel.objects.order_by("id")
+        if options["only_missing"]:
+            queryset = queryset.filter(tags=[])
+        if last_id is not None:
+            queryset = queryset.filter(id__gt=last_id)
+
+        # Only the columns the prompt needs, the embeddings stay in the database
+        suggestions = [suggestion async for suggestion in queryset.only("id", "name", "description")]
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        tagged = failed = 0
+        checkpoint = last_id  # Only advanced past activities that are done, up to the first failure
+
+        for start in range(0, len(suggestions), options["batch_size"]):
+            batch = suggestions[start : start + options["batch_size"]]
+            results = await asyncio.gather(*(self.classify(semaphore, suggestion) for suggestion in batch))
+
+            updated = [suggestion for suggestion, tags in zip(batch, results) if tags is not None]
+            for suggestion, tags in zip(batch, results):
+                if tags is not None:
+                    suggestion.tags = tags
+            if updated:
+                await SuggestionModel.objects.abulk_update(updated, ["tags"])
+                # bulk_update sends no post_save, so invalidate the cached rankings here
+                await sync_to_async(CatalogVersion.bump)()
+
+            tagged += len(updated)
+            if not failed:
+                for suggestion, tags in zip(batch, results):
+                    if tags is None:
+                        break
+                    checkpoint = suggestion.id
+                if checkpoint is not None:
+                    self.write_checkpoint(options["checkpoint"], checkpoint)
+            failed += len(batch) - len(updated)
+            self.stdout.write(f"{start + len(batch)}/{len(suggestions)} activities classified")
+
+        return tagged, failed
+
+    async def classify(self, semaphore, suggestion):
+        """The tags of one activity, or None if it could not be classified"""
+        try:
+            async with semaphore:
+                completion = await self.completions(suggestion)
+            content = json.loads(completion.choices[0].message.content)
+            classification = content["classification"]
+        except Exception:
+            logger.exception("Could not classify %s", suggestion.name)
+            return None
+
+        logger.info("%s: %s", suggestion.name, json.dumps(content))
+        return (
+            self.ensure_list(classification["interest_area"])
+            + self.ensure_list(classification["activity_type"])
+            + self.ensure_list(classification["skill_focus"])
+        )
+
+    async def completions(self, suggestions):
+        completion = await llm_client.achat(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": SYSTEM_RULES},
@@ -73,11 +144,25 @@ class Command(BaseCommand):
                 "type": "json_schema",
                 "json_schema": ACTIVITY_CLASSIFICATION_SCHEMA,
             },
-            timeout=20_000,
             temperature=0,
         )
         return completion
 
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)["last_id"]
+        except FileNotFoundError:
+            return None
+
+    def write_checkpoint(self, path, last_id):
+        # Written next to the target and renamed, so a crash never leaves a truncated checkpoint
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"last_id": last_id}, f)
+        os.replace(f"{path}.tmp", path)
+
     def ensure_list(self, a):
         if isinstance(a, list):
             return a
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SAMPLE_TEXTS = [
+    "Robotics club building competition robots",
+    "Debate team practicing for regional tournaments",
+    "Volunteer tutoring for primary school students",
+    "Math olympiad preparation and problem solving",
+    "Student council organizing school events",
+    "Photography workshop on composition and editing",
+    "Model United Nations conference delegation",
+    "Hackathon for building mobile apps in a weekend",
+]
+
+
+def run_worker(config, threads, texts, batch_size, barrier, results):
+    """Embed ``texts`` in a separate process, like one gunicorn worker would"""
+    from fastembed import TextEmbedding
+
+    model = TextEmbedding(model_name=config["NAME"], cache_dir=config["CACHE_DIR"], threads=threads)
+    list(model.embed(texts[:batch_size], batch_size=batch_size))  # Warm up the ONNX session
+
+    barrier.wait()  # Every worker starts embedding at the same time, so they compete for the CPU
+    start = time.perf_counter()
+    list(model.embed(texts, batch_size=batch_size))
+    results.put((len(texts), time.perf_counter() - start))
+
+
+class Command(BaseCommand):
+    """Measure embeddings/sec for different worker x thread splits of the CPU"""
+
+    help = "Measure embeddings/sec for different worker x thread splits of the CPU"
+
+    def add_arguments(self, parser):
+        cores = os.cpu_count() or 1
+        parser.add_argument(
+            "--splits",
+            type=str,
+            default=f"1x{cores},{max(1, cores // 2)}x2,{cores}x1",
+            help="Comma separated WORKERSxTHREADS splits, e.g. 1x4,2x2,4x1",
+        )
+        parser.add_argument("--texts", type=int, default=512, help="Number of texts embedded by each worker")
+        parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_MODEL["BATCH_SIZE"])
+
+    def handle(self, *args, **kwargs):
+        try:
+            splits = [tuple(int(n) for n in split.split("x")) for split in kwargs["splits"].split(",")]
+        except ValueError:
+            raise CommandError("Splits must look like 2x4 (workers x threads)")
+
+        texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] + f" #{i}" for i in range(kwargs["texts"])]
+        self.stdout.write(f"{os.cpu_count()} cores, {len(texts)} texts per worker, batch size {kwargs['batch_size']}")
+
+        # ONNX sessions are not fork safe, so every worker starts from a fresh interpreter
+        context = multiprocessing.get_context("spawn")
+        for workers, threads in splits:
+            barrier, results = context.Barrier(workers), context.Queue()
+            processes = [
+                context.Process(
+                    target=run_worker,
+                    args=(dict(settings.EMBEDDING_MODEL), threads, texts, kwargs["batch_size"], barrier, results),
+                )
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            measurements = self.collect(processes, results)
+
+            total = sum(count for count, _ in measurements)
+            elapsed = max(seconds for _, seconds in measurements)
+            self.stdout.write(
+                f"{workers} workers x {threads} threads: {total / elapsed:8.1f} embeddings/sec "
+                f"({total / elapsed / workers:.1f} per worker)"
+            )
+
+    def collect(self, processes, results):
+        measurements = []
+        while len(measurements) < len(processes):
+            try:
+                measurements.append(results.get(timeout=1))
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    for process in processes:
+                        process.terminate()
+                    raise CommandError("A benchmark worker failed, is the embedding model downloaded?")
+        for process in processes:
+            process.join()
+        return measurements
@@ -0,0 +1,89 @@
+import json
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import UserProfile
+from suggestions.personalization import fallback_ranking, get_suggestions, ranking_candidates
+from suggestions.rankers import OpenAIRanker
+from suggestions.reco_schema import SYSTEM_RULES
+
+# OpenAI tokenizers average about 4 characters of English/JSON per token
+CHARS_PER_TOKEN = 4
+
+
+class Command(BaseCommand):
+    """Compare the size and latency of the ranking prompt with and without the embedding pre-filter"""
+
+    help = "Compare the size and latency of the ranking prompt with and without the embedding pre-filter"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=20, help="Number of user profiles to rank")
+        parser.add_argument("--candidates", type=int, default=settings.SUGGESTION_RANKING["CANDIDATES"] or 100)
+        parser.add_argument(
+            "--live", action="store_true", help="Also send the prompts to OpenAI and report its token usage"
+        )
+
+    def handle(self, *args, **kwargs):
+        profiles = list(UserProfile.objects.exclude(interests=[], goals=[])[: kwargs["profiles"]])
+        if not profiles:
+            raise CommandError("No user profiles with interests or goals to benchmark")
+
+        self.stdout.write(f"{len(profiles)} profiles, {kwargs['candidates']} candidates")
+        self.report("full catalog", [self.full_catalog(profile) for profile in profiles], kwargs["live"])
+        self.report(
+            f"top {kwargs['candidates']}",
+            [self.pre_filtered(profile, kwargs["candidates"]) for profile in profiles],
+            kwargs["live"],
+        )
+
+    def full_catalog(self, profile):
+        # What refresh_ranking sent before the pre-filter: every serialized suggestion
+        start = time.perf_counter()
+        suggestions_data = get_suggestions()
+        messages = [
+            {"role": "system", "content": SYSTEM_RULES},
+            {
+                "role": "user",
+                "content": json.dumps(
+                    {
+                        "basic_info": profile.basic_information,
+                        "interests": profile.interests,
+                        "goals": profile.goals,
+                        "additional_info": profile.other_goals,
+                        "suggestions": suggestions_data,
+                    }
+                ),
+            },
+        ]
+        return messages, time.perf_counter() - start
+
+    def pre_filtered(self, profile, limit):
+        start = time.perf_counter()
+        messages = OpenAIRanker().messages(profile, ranking_candidates(fallback_ranking(profile), limit))
+        return messages, time.perf_counter() - start
+
+    def report(self, name, prompts, live):
+        chars = np.array([sum(len(message["content"]) for message in messages) for messages, _ in prompts])
+        build = np.array([seconds for _, seconds in prompts]) * 1000
+        self.stdout.write(
+            f"{name:<14} ~{np.mean(chars) / CHARS_PER_TOKEN:9.0f} prompt tokens (estimated)  "
+            f"build p50 {np.percentile(build, 50):7.1f}ms  p95 {np.percentile(build, 95):7.1f}ms"
+        )
+        if not live:
+            return
+
+        ranker, timeout = OpenAIRanker(), settings.SUGGESTION_RANKING["TIMEOUT"]
+        tokens, latency = [], []
+        for messages, _ in prompts:
+            start = time.perf_counter()
+            completion = ranker.complete(messages, timeout)
+            latency.append(time.perf_counter() - start)
+            tokens.append(completion.usage.prompt_tokens)
+        self.stdout.write(
+            f"{'':<14} {np.mean(tokens):10.0f} prompt tokens (OpenAI)     "
+            f"call p50 {np.percentile(latency, 50):7.2f}s   p95 {np.percentile(latency, 95):7.2f}s"
+        )
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from pathfinder_api.vector_backends import ExactBackend, IVFFlatBackend
+from pathfinder_api.vectordb import get_vector_index
+from suggestions.models import SuggestionModel
+
+
+class Command(BaseCommand):
+    """Compare recall and latency of the approximate vector backend against the exact one"""
+
+    help = "Compare recall and latency of the approximate vector backend against the exact one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Number of synthetic vectors")
+        parser.add_argument("--dimensions", type=int, default=384, help="Dimensions of the synthetic vectors")
+        parser.add_argument("--queries", type=int, default=200, help="Number of queries to time")
+        parser.add_argument("--k", type=int, default=50, help="Number of neighbours per query")
+        parser.add_argument("--n-probe", type=str, default="1,4,8,16,32", help="Comma separated n_probe values")
+        parser.add_argument("--from-db", action="store_true", help="Use the suggestion embeddings instead")
+
+    def handle(self, *args, **kwargs):
+        rng = np.random.default_rng(0)
+        if kwargs["from_db"]:
+            ids, vectors = get_vector_index(SuggestionModel)._read_rows()
+        else:
+            ids, vectors = np.arange(kwargs["rows"], dtype=np.int64), self.synthetic(rng, kwargs)
+
+        # Queries are perturbed catalog rows, which is what real searches look like
+        sample = rng.choice(len(vectors), kwargs["queries"])
+        queries = vectors[sample] + rng.normal(0, 0.05, (len(sample), vectors.shape[1])).astype(np.float32)
+        k = kwargs["k"]
+
+        self.stdout.write(f"{len(vectors)} vectors x {vectors.shape[1]} dimensions, {len(queries)} queries, k={k}")
+
+        exact = ExactBackend()
+        build_time = self.timed(exact.build, ids, vectors)
+        truth, latency = self.run_queries(exact, queries, k)
+        self.report("exact", build_time, latency, 1.0)
+
+        for n_probe in [int(n) for n in kwargs["n_probe"].split(",")]:
+            ivf = IVFFlatBackend(n_probe=n_probe)
+            build_time = self.timed(ivf.build, ids, vectors)
+            results, latency = self.run_queries(ivf, queries, k)
+            recall = np.mean([len(np.intersect1d(r, t)) / len(t) for r, t in zip(results, truth)])
+            self.report(f"ivf n_probe={n_probe}", build_time, latency, recall)
+
+    def synthetic(self, rng, kwargs):
+        # Clustered, unit-length vectors, like sentence embeddings of a topical catalog
+        centers = rng.normal(size=(max(1, kwargs["rows"] // 500), kwargs["dimensions"]))
+        vectors = centers[rng.integers(len(centers), size=kwargs["rows"])]
+        vectors = vectors + rng.normal(0, 1.5, vectors.shape)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.astype(np.float32)
+
+    def run_queries(self, backend, queries, k):
+        results, latency = [], []
+        for query in queries:
+            start = time.perf_counter()
+            ids, _ = backend.query(query, k)
+            latency.append(time.perf_counter() - start)
+            results.append(ids)
+        return results, np.array(latency) * 1000
+
+    def timed(self, func, *args):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+    def report(self, name, build_time, latency, recall):
+        self.stdout.write(
+            f"{name:<18} build {build_time:7.2f}s  "
+            f"p50 {np.percentile(latency, 50):7.2f}ms  p95 {np.percentile(latency, 95):7.2f}ms  "
+            f"recall@k {recall:.3f}"
+        )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pathfinder_api.vectordb import get_vector_index
+from suggestions.models import SuggestionModel
+
+
+class Command(BaseCommand):
+    """Build the suggestion vector index and persist it for the API workers"""
+
+    help = "Build the suggestion vector index and persist it for the API workers"
+
+    def handle(self, *args, **kwargs):
+        index = get_vector_index(SuggestionModel)
+        if not index.path:
+            raise CommandError("VECTOR_INDEX['DIR'] is not configured")
+
+        start = time.perf_counter()
+        path = index.save()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(index)} suggestions into {path} in {elapsed:.2f}s"))
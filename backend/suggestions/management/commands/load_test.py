@@ -0,0 +1,66 @@
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+from rest_framework_simplejwt.tokens import AccessToken
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Measure the throughput and latency of an endpoint under concurrent requests"""
+
+    help = "Measure the throughput and latency of an endpoint under concurrent requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="e.g. http://127.0.0.1:8000/api/suggestions/personalized-suggestions/")
+        parser.add_argument("--concurrency", type=str, default="1,10,50", help="Comma separated concurrency levels")
+        parser.add_argument("--requests", type=int, default=500, help="Requests sent at each concurrency level")
+        parser.add_argument("--username", help="Authenticate as this user with a freshly minted JWT")
+        parser.add_argument("--timeout", type=float, default=30.0)
+
+    def handle(self, *args, **kwargs):
+        headers = {}
+        if kwargs["username"]:
+            try:
+                user = User.objects.get(username=kwargs["username"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {kwargs['username']}")
+            headers["Authorization"] = f"Bearer {AccessToken.for_user(user)}"
+
+        for concurrency in [int(n) for n in kwargs["concurrency"].split(",")]:
+            elapsed, latency, statuses = asyncio.run(
+                self.run(kwargs["url"], headers, concurrency, kwargs["requests"], kwargs["timeout"])
+            )
+            latency = np.array(latency) * 1000
+            self.stdout.write(
+                f"concurrency {concurrency:>4}: {len(latency) / elapsed:8.1f} req/s  "
+                f"p50 {np.percentile(latency, 50):8.1f}ms  p95 {np.percentile(latency, 95):8.1f}ms  "
+                f"p99 {np.percentile(latency, 99):8.1f}ms  "
+                + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str))
+            )
+
+    async def run(self, url, headers, concurrency, requests, timeout):
+        latency, statuses = [], Counter()
+        remaining = iter(range(requests))
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=timeout) as client:
+
+            async def worker():
+                # Each worker sends its requests back to back, so `concurrency` are always in flight
+                for _ in remaining:
+                    start = time.perf_counter()
+                    try:
+                        status = (await client.get(url)).status_code
+                    except httpx.HTTPError as error:
+                        status = type(error).__name__
+                    latency.append(time.perf_counter() - start)
+                    statuses[status] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return time.perf_counter() - start, latency, statuses
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from suggestions.models import CatalogVersion, SuggestionsCacheModel
+
+
+class Command(BaseCommand):
+    """Delete expired, outdated and least recently used personalized rankings"""
+
+    help = "Delete expired, outdated and least recently used personalized rankings"
+
+    def add_arguments(self, parser):
+        config = settings.SUGGESTION_CACHE
+        parser.add_argument("--max-entries", type=int, default=config["MAX_ENTRIES"])
+        parser.add_argument("--ttl", type=int, default=config["TTL"], help="Maximum age of a ranking, in seconds")
+        parser.add_argument(
+            "--keep-outdated", action="store_true", help="Keep rankings computed against an older catalog"
+        )
+
+    def handle(self, *args, **kwargs):
+        before = SuggestionsCacheModel.objects.count()
+        deleted = SuggestionsCacheModel.objects.prune(
+            max_entries=kwargs["max_entries"],
+            ttl=kwargs["ttl"] or None,
+            catalog_version=None if kwargs["keep_outdated"] else CatalogVersion.current(),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} of {before} cached rankings"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from social.models import UserRating
+from suggestions.models import SuggestionModel
+
+
+class Command(BaseCommand):
+    """Rebuild the rating aggregates of every suggestion from the ratings table"""
+
+    help = "Rebuild the rating aggregates of every suggestion from the ratings table"
+
+    def handle(self, *args, **kwargs):
+        ratings = UserRating.objects.filter(suggestion=OuterRef("pk")).order_by().values("suggestion")
+
+        # One UPDATE with correlated subqueries instead of a query per suggestion
+        with transaction.atomic():
+            updated = SuggestionModel.objects.update(
+                rating_sum=Coalesce(
+                    Subquery(ratings.annotate(total=Sum("rating")).values("total"), output_field=IntegerField()),
+                    Value(0),
+                ),
+                rating_count=Coalesce(
+                    Subquery(ratings.annotate(total=Count("id")).values("total"), output_field=IntegerField()),
+                    Value(0),
+                ),
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed rating aggregates of {updated} suggestions"))
@@ -1,14 +1,15 @@
 import logging
 import os
+import time
 from datetime import datetime
+from itertools import islice
 
-import requests
-
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from pathfinder_api.vectordb import get_embedding
-from suggestions.models import SuggestionModel
+from pathfinder_api.vectordb import embed_texts, get_vector_index
+from suggestions.models import CatalogVersion, SuggestionModel, content_hash
+from suggestions.sources import FORMATS, open_source
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -33,6 +34,8 @@ MAPPING = {
     "url": "url",
     "image": "image",
 }
+BATCH_SIZE = 500
+CHUNK_SIZE = 1000
 
 
 class Command(BaseCommand):
@@ -41,49 +44,159 @@ class Command(BaseCommand):
     help = "Sync suggestions from Google Sheet"
 
     def add_arguments(self, parser):
-        parser.add_argument("--csv-url", type=str, help="The URL of the CSV file")
+        parser.add_argument(
+            "--source",
+            "--csv-url",
+            type=str,
+            help="URL or path of a JSON array, NDJSON or CSV file of activities, the Google Sheet by default",
+        )
+        parser.add_argument("--format", choices=FORMATS, help="Format of the source, guessed from its extension")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows diffed and written at a time")
+        parser.add_argument("--dry-run", action="store_true", help="Only print what the sync would change")
 
     def handle(self, *args, **kwargs):
-        csv_url = kwargs.get("csv_url")
-        if not csv_url:
-            csv_url = SHEET_CSV_URL
-
-        self.stdout.write(self.style.NOTICE(f"Syncing suggestions from {csv_url}"))
-        logger.info(f"Syncing suggestions from {csv_url}")
-        response = requests.get(csv_url, timeout=30)
-        response.raise_for_status()
-
-        incoming_ext_ids = set()
-        upserts = 0
+        try:
+            source = open_source(kwargs.get("source") or SHEET_CSV_URL, kwargs.get("format"))
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.NOTICE(f"Syncing suggestions from {source}"))
+        logger.info(f"Syncing suggestions from {source}")
+        start = time.perf_counter()
+
+        # The only query of a sync against an unchanged sheet
+        stored = {
+            external_id: (pk, stored_hash, is_active)
+            for pk, external_id, stored_hash, is_active in SuggestionModel.objects.values_list(
+                "pk", "external_id", "content_hash", "is_active"
+            )
+        }
+        seen = set()
+        totals = dict.fromkeys(("inserted", "updated", "restored", "unchanged", "deleted"), 0)
+
+        # Rows are read, diffed and written one chunk at a time, so memory does not grow with the sheet
+        rows = iter(source.rows())
+        while chunk := list(islice(rows, kwargs["chunk_size"])):
+            payloads = self.parse(chunk)
+            seen.update(payloads)
+            self.sync(payloads, self.diff(payloads, stored), totals, kwargs["dry_run"])
+            for external_id, payload in payloads.items():
+                stored[external_id] = (stored.get(external_id, (None,))[0], payload["content_hash"], True)
+
+        if not seen:
+            # Most likely a broken export, not a sheet whose every activity was removed
+            raise CommandError("The sheet has no valid rows, refusing to deactivate the whole catalog")
+
+        # Only once the whole source was read, so a failed download never deletes anything
+        diff = self.diff({}, stored)
+        diff["deleted"] = {
+            external_id: pk
+            for external_id, (pk, _, is_active) in stored.items()
+            if is_active and external_id not in seen
+        }
+        self.sync({}, diff, totals, kwargs["dry_run"])
+        elapsed = time.perf_counter() - start
+
+        summary = (
+            f"{'Would sync' if kwargs['dry_run'] else 'Synced'} {len(seen)}: "
+            f"{totals['inserted']} inserted, {totals['updated']} updated, {totals['restored']} restored, "
+            f"{totals['unchanged']} unchanged, {totals['deleted']} deleted "
+            f"in {elapsed:.1f}s, {len(seen) / max(elapsed, 1e-9):.1f} rows/sec"
+        )
+        self.stdout.write(self.style.SUCCESS(summary))
+        logger.info(summary)
+
+    def sync(self, payloads, diff, totals, dry_run):
+        """Apply (or with ``dry_run`` print) one diff and add it to the ``totals``"""
+        if dry_run:
+            for outcome, sign in (("inserted", "+"), ("updated", "~"), ("restored", "^"), ("deleted", "-")):
+                for external_id in diff[outcome]:
+                    self.stdout.write(f"{sign} {external_id}")
+        else:
+            self.apply(payloads, diff)
+
+        for outcome in totals:
+            totals[outcome] += diff[outcome] if outcome == "unchanged" else len(diff[outcome])
+
+    def parse(self, rows):
+        """The payload of every valid row by external id, the last duplicate wins"""
+        payloads = {}
+        for row in rows:
+            external_id = SuggestionModel.external_id_from_row(row)
+            if not external_id:
+                continue
+
+            payload = {}
+            for key, value in MAPPING.items():
+                # JSON sources can hold nulls and numbers where a CSV only has strings
+                cell = str(row.get(key) or "").strip()
+                payload[key] = [v.strip() for v in cell.split(",")] if isinstance(value, list) else cell
+
+            if not payload.get("name"):
+                continue
+
+            payload["content_hash"] = content_hash(payload)
+            payloads[external_id] = payload
+        return payloads
+
+    def diff(self, payloads, stored):
+        """External ids of the ``payloads`` to insert, update and restore, and the count of unchanged ones"""
+        diff = {"inserted": [], "updated": [], "restored": [], "unchanged": 0, "deleted": {}}
+        for external_id, payload in payloads.items():
+            if external_id not in stored:
+                diff["inserted"].append(external_id)
+            elif stored[external_id][1] != payload["content_hash"]:
+                diff["updated"].append(external_id)
+            elif not stored[external_id][2]:
+                diff["restored"].append(external_id)
+            else:
+                diff["unchanged"] += 1
+        return diff
+
+    def apply(self, payloads, diff):
+        """Write the new and changed rows and flag the active state of the restored and removed ones"""
+        changed = {external_id: payloads[external_id] for external_id in diff["inserted"] + diff["updated"]}
+        if not (changed or diff["restored"] or diff["deleted"]):
+            return
+
+        # One batch per chunk through the model, outside the transaction. Not through the query
+        # embedding cache, which a large sync would flush. Skipped when only active flags change, so
+        # those syncs never load the model.
+        texts = [f"{payload['name']} {payload['description']}" for payload in changed.values()]
+        embeddings = embed_texts(texts) if texts else []
+        suggestions = [
+            SuggestionModel(external_id=external_id, embedding=embedding, is_active=True, **payload)
+            for (external_id, payload), embedding in zip(changed.items(), embeddings)
+        ]
 
         with transaction.atomic():
-            for row in response.json():
-                external_id = SuggestionModel.external_id_from_row(row)
-                if not external_id:
-                    continue
-
-                payload = {}
-                for key, value in MAPPING.items():
-                    if isinstance(value, list):
-                        val = row.get(key, "").strip().split(",")
-                        val = [v.strip() for v in val]
-                    else:
-                        val = row.get(key, "").strip()
-                    payload[key] = val
-
-                if not payload.get("name"):
-                    continue
-
-                # Don't query by embedding
-                payload["embedding"] = get_embedding(payload["name"] + " " + payload["description"])
-
-                SuggestionModel.objects.update_or_create(
-                    external_id=external_id,
-                    defaults=payload,
-                )
-                incoming_ext_ids.add(external_id)
-                upserts += 1
-                self.stdout.write(self.style.SUCCESS(f"Synced {external_id}"))
-                logger.info(f"Synced {external_id}")
-
-        self.stdout.write(self.style.SUCCESS(f"Synced {upserts}"))
+            SuggestionModel.objects.bulk_create(
+                suggestions,
+                batch_size=BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["external_id"],
+                update_fields=[*MAPPING, "embedding", "content_hash", "is_active", "created_at"],
+            )
+            SuggestionModel.objects.filter(external_id__in=diff["restored"]).update(is_active=True)
+            # Soft-deleted, so saved items and ratings survive and the row comes back if the sheet does
+            SuggestionModel.objects.filter(pk__in=list(diff["deleted"].values())).update(is_active=False)
+            # bulk_create and update send no post_save, so do what the signals would have done
+            CatalogVersion.bump()
+
+            ids = dict(SuggestionModel.objects.filter(external_id__in=list(changed)).values_list("external_id", "pk"))
+            upserts = [(ids[suggestion.external_id], suggestion.embedding) for suggestion in suggestions]
+            upserts += SuggestionModel.objects.filter(external_id__in=diff["restored"]).values_list("pk", "embedding")
+            removals = list(diff["deleted"].values())
+            transaction.on_commit(lambda: self.update_vector_index(upserts, removals))
+
+        if changed:
+            logger.info("Synced %s", ", ".join(changed))
+        if diff["deleted"]:
+            logger.info("Deleted %s", ", ".join(diff["deleted"]))
+
+    def update_vector_index(self, upserts, removals):
+        index = get_vector_index(SuggestionModel)
+        for pk, embedding in upserts:
+            index.upsert(pk, embedding)
+        for pk in removals:
+            index.remove(pk)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from pathfinder_api.vectordb import warm_up
+from suggestions.models import SuggestionModel
+
+
+class Command(BaseCommand):
+    """Download and load the embedding model, then report how long it took"""
+
+    help = "Download and load the embedding model, then report how long it took"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--with-index", action="store_true", help="Also load the suggestion vector index")
+
+    def handle(self, *args, **kwargs):
+        timings = warm_up(index_models=[SuggestionModel] if kwargs["with_index"] else [])
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name}: {seconds:.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"Warmed up in {sum(timings.values()):.2f}s"))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations
+
+import pathfinder_api.vectordb
+
+
+def json_to_binary(apps, schema_editor):
+    SuggestionModel = apps.get_model("suggestions", "SuggestionModel")
+    suggestions = list(SuggestionModel.objects.only("embedding_binary", "embedding"))
+    for suggestion in suggestions:
+        # Older syncs stored nested [[...]] lists, the binary field flattens them
+        suggestion.embedding_binary = suggestion.embedding or []
+    SuggestionModel.objects.bulk_update(suggestions, ["embedding_binary"], batch_size=500)
+
+
+def binary_to_json(apps, schema_editor):
+    SuggestionModel = apps.get_model("suggestions", "SuggestionModel")
+    suggestions = list(SuggestionModel.objects.only("embedding_binary", "embedding"))
+    for suggestion in suggestions:
+        suggestion.embedding = suggestion.embedding_binary.tolist()
+    SuggestionModel.objects.bulk_update(suggestions, ["embedding"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionmodel",
+            name="embedding_binary",
+            field=pathfinder_api.vectordb.VectorField(binary=True, default=[], dimensions=3, editable=False),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name="suggestionmodel",
+            name="embedding",
+        ),
+        migrations.RenameField(
+            model_name="suggestionmodel",
+            old_name="embedding_binary",
+            new_name="embedding",
+        ),
+        migrations.AlterModelOptions(
+            name="suggestionmodel",
+            options={"base_manager_name": "objects"},
+        ),
+    ]
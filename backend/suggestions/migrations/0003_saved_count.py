@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0002_binary_embedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionmodel",
+            name="saved_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    SuggestionModel = apps.get_model("suggestions", "SuggestionModel")
+    UserRating = apps.get_model("social", "UserRating")
+
+    ratings = UserRating.objects.filter(suggestion=OuterRef("pk")).order_by().values("suggestion")
+    SuggestionModel.objects.update(
+        rating_sum=Coalesce(
+            Subquery(ratings.annotate(total=Sum("rating")).values("total"), output_field=IntegerField()), Value(0)
+        ),
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(total=Count("id")).values("total"), output_field=IntegerField()), Value(0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social", "0001_initial"),
+        ("suggestions", "0003_saved_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionmodel",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="suggestionmodel",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="suggestionmodel",
+            name="rating_average",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(rating_count=0, then=models.Value(0.0)),
+                    default=django.db.models.expressions.CombinedExpression(
+                        django.db.models.functions.comparison.Cast("rating_sum", models.FloatField()),
+                        "/",
+                        models.F("rating_count"),
+                    ),
+                ),
+                output_field=models.FloatField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="suggestionmodel",
+            index=models.Index(fields=["-rating_average", "-rating_count", "name"], name="suggestion_rating_idx"),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+import hashlib
+import json
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copies of suggestions.models.profile_fingerprint and its helpers as of this migration, so
+# later changes to the live functions do not change what it computes
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFKC", str(text)).split())
+
+
+def canonical_profile(value):
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {str(key): canonical_profile(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_profile(item) for item in value]
+    return value
+
+
+def profile_fingerprint(basic_information, interests, goals, other_goals):
+    profile = canonical_profile([basic_information or {}, interests or [], goals or [], other_goals or ""])
+    canonical = json.dumps(profile, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def fingerprint_cache_rows(apps, schema_editor):
+    SuggestionsCacheModel = apps.get_model("suggestions", "SuggestionsCacheModel")
+
+    seen = set()
+    duplicates = []
+    rows = SuggestionsCacheModel.objects.order_by("-id").only("basic_information", "interests", "goals", "other_goals")
+    for row in rows:
+        row.fingerprint = profile_fingerprint(row.basic_information, row.interests, row.goals, row.other_goals)
+        if row.fingerprint in seen:
+            # Profiles that only differed in whitespace or key order now share a row, keep the newest
+            duplicates.append(row.id)
+        else:
+            seen.add(row.fingerprint)
+            row.save(update_fields=["fingerprint"])
+    SuggestionsCacheModel.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0004_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionscachemodel",
+            name="fingerprint",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fingerprint_cache_rows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="suggestionscachemodel",
+            name="fingerprint",
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+def suggestions_to_ranking(apps, schema_editor):
+    SuggestionsCacheModel = apps.get_model("suggestions", "SuggestionsCacheModel")
+    rows = list(SuggestionsCacheModel.objects.only("suggestions"))
+    for row in rows:
+        ranking = [[item["id"], item.get("score") or 0] for item in row.suggestions if "id" in item]
+        row.ranking = sorted(ranking, key=lambda pair: pair[1], reverse=True)
+    SuggestionsCacheModel.objects.bulk_update(rows, ["ranking"], batch_size=100)
+
+
+def drop_rankings(apps, schema_editor):
+    # Full serialized catalogs can't be rebuilt from ids alone, the rows are recomputed on the next miss
+    apps.get_model("suggestions", "SuggestionsCacheModel").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0005_cache_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionscachemodel",
+            name="ranking",
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(suggestions_to_ranking, drop_rankings),
+        migrations.RemoveField(
+            model_name="suggestionscachemodel",
+            name="suggestions",
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_catalog_version(apps, schema_editor):
+    # Existing cache rows default to version 0, so they stay valid until the catalog changes
+    apps.get_model("suggestions", "CatalogVersion").objects.get_or_create(pk=1, defaults={"version": 0})
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0006_cache_ranking"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogVersion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("version", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="suggestionscachemodel",
+            name="catalog_version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="suggestionscachemodel",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="suggestionscachemodel",
+            name="last_hit_at",
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(create_catalog_version, migrations.RunPython.noop),
+    ]
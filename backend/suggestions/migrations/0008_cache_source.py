@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0007_cache_eviction"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionscachemodel",
+            name="source",
+            field=models.CharField(
+                choices=[
+                    ("llm", "LLM ranking"),
+                    ("fallback", "Fallback ranking, served until the LLM ranking is ready"),
+                ],
+                default="llm",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0008_cache_source"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionscachemodel",
+            name="refreshing_until",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0009_cache_refresh_lease"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="suggestionscachemodel",
+            name="source",
+            field=models.CharField(
+                choices=[
+                    ("llm", "LLM ranking"),
+                    ("local", "Local ranking"),
+                    ("fallback", "Fallback ranking, served until the refined ranking is ready"),
+                ],
+                default="llm",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0010_cache_local_source"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestionmodel",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", editable=False, max_length=64),
+        ),
+    ]
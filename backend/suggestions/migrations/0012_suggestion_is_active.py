@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0011_suggestion_content_hash"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="suggestionmodel",
+            name="suggestion_rating_idx",
+        ),
+        migrations.AddField(
+            model_name="suggestionmodel",
+            name="is_active",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name="suggestionmodel",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["-rating_average", "-rating_count", "name"],
+                name="active_suggestion_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="suggestionmodel",
+            index=models.Index(
+                condition=models.Q(("is_active", True)), fields=["name"], name="active_suggestion_name_idx"
+            ),
+        ),
+    ]
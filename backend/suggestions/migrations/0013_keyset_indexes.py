@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0012_suggestion_is_active"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="suggestionmodel",
+            name="active_suggestion_rating_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="suggestionmodel",
+            name="active_suggestion_name_idx",
+        ),
+        migrations.AddIndex(
+            model_name="suggestionmodel",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["-rating_average", "-rating_count", "name", "id"],
+                name="active_suggestion_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="suggestionmodel",
+            index=models.Index(
+                condition=models.Q(("is_active", True)), fields=["name", "id"], name="active_suggestion_name_idx"
+            ),
+        ),
+    ]
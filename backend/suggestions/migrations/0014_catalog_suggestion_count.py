@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+def count_suggestions(apps, schema_editor):
+    CatalogVersion = apps.get_model("suggestions", "CatalogVersion")
+    SuggestionModel = apps.get_model("suggestions", "SuggestionModel")
+    CatalogVersion.objects.update(suggestion_count=SuggestionModel.objects.filter(is_active=True).count())
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("suggestions", "0013_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="catalogversion",
+            name="suggestion_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_suggestions, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,13 @@
+import hashlib
+import json
+from datetime import timedelta
+
 from django.db import models
+from django.db.models.functions import Cast
+from django.utils import timezone
 from django.utils.text import slugify
 
+from pathfinder_api.embedding_cache import normalize_text
 from pathfinder_api.vectordb import VectorField
 
 
@@ -9,16 +16,49 @@ def slug_from_name_category(name, category, description):
     return slugify(base)[:64]
 
 
+def canonical_profile(value):
+    """``value`` with every string whitespace-normalized, recursively"""
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {str(key): canonical_profile(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_profile(item) for item in value]
+    return value
+
+
+def profile_fingerprint(basic_information, interests, goals, other_goals):
+    """Hash identifying the onboarding answers a personalized ranking was computed for"""
+    profile = canonical_profile([basic_information or {}, interests or [], goals or [], other_goals or ""])
+    canonical = json.dumps(profile, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def content_hash(payload):
+    """Hash of the sheet columns of a suggestion, unchanged rows are skipped by the sync"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
 DEFAULT_IMAGE = r"https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcQeJQeJyzgAzTEVqXiGe90RGBFhfp_4RcJJMQ&s"
 DEFAULT_URL = ""
 DEFAULT_DESCRIPTION = ""
 EXAMPLE_EXTERNAL_ID = "example-example-this-is-an-example-item"
 
 
-class SuggestionModel(models.Model):
-    # The average rating field is not stored here, as it is computed in the
-    # serializer.
+class SuggestionQuerySet(models.QuerySet):
+    def active(self):
+        """Suggestions still in the sheet, the only ones listed, searched and ranked"""
+        return self.filter(is_active=True)
+
+
+class SuggestionManager(models.Manager.from_queryset(SuggestionQuerySet)):
+    def get_queryset(self):
+        # The embedding is only needed by the vector index, which selects it explicitly
+        return super().get_queryset().defer("embedding")
 
+
+class SuggestionModel(models.Model):
     external_id = models.CharField(max_length=64, unique=True)
     name = models.CharField(max_length=255)
     category = models.JSONField(default=list)
@@ -28,9 +68,45 @@ class SuggestionModel(models.Model):
     image = models.URLField(max_length=255, default=DEFAULT_IMAGE)
     created_at = models.DateTimeField(auto_now=True)
     score = models.IntegerField(default=0)
+    # Number of SavedItem rows pointing here, kept in step by the accounts signals
+    saved_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Rating aggregates, kept in step with social.UserRating by the social signals
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.GeneratedField(
+        expression=models.Case(
+            models.When(rating_count=0, then=models.Value(0.0)),
+            default=Cast("rating_sum", models.FloatField()) / models.F("rating_count"),
+        ),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
+
+    # To search. Stored as packed float32 bytes and never loaded unless asked for.
+    embedding = VectorField(dimensions=3, default=[], binary=True, editable=False)
+    # content_hash() of the synced columns, empty for rows that were never synced
+    content_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+    # Cleared by sync_sheet once the activity leaves the sheet, saves and ratings keep pointing at it
+    is_active = models.BooleanField(default=True)
+
+    objects = SuggestionManager()
 
-    # To search
-    embedding = VectorField(dimensions=3, default=[])
+    # Rows get_vector_index() loads, removed activities are never searched
+    vector_index_condition = models.Q(is_active=True)
+
+    class Meta:
+        base_manager_name = "objects"
+        indexes = (
+            # Partial, the listings only ever read active rows. Each matches a sort order of the listing
+            # down to the id tiebreaker, so keyset pagination seeks to a page instead of scanning to it.
+            models.Index(
+                fields=["-rating_average", "-rating_count", "name", "id"],
+                condition=models.Q(is_active=True),
+                name="active_suggestion_rating_idx",
+            ),
+            models.Index(fields=["name", "id"], condition=models.Q(is_active=True), name="active_suggestion_name_idx"),
+        )
 
     @classmethod
     def external_id_from_row(cls, row):
@@ -42,12 +118,94 @@ class SuggestionModel(models.Model):
         return self.name
 
 
+def active_suggestion_count():
+    """COUNT of the active suggestions as a subquery, so bump() stores it in the same UPDATE"""
+    count = models.Func("id", function="COUNT", output_field=models.PositiveIntegerField())
+    return models.Subquery(SuggestionModel.objects.active().order_by().values(count=count)[:1])
+
+
+class CatalogVersion(models.Model):
+    """Single row counter, bumped whenever a suggestion is created, edited or deleted"""
+
+    SINGLETON_ID = 1
+
+    version = models.PositiveBigIntegerField(default=0)
+    # Number of active suggestions, recounted by every bump so listings never COUNT the catalog
+    suggestion_count = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=cls.SINGLETON_ID).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def current_subquery(cls):
+        """The version as a subquery, so lookups can compare against it without an extra query"""
+        return models.Subquery(cls.objects.filter(pk=cls.SINGLETON_ID).values("version")[:1])
+
+    @classmethod
+    def bump(cls):
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            version=models.F("version") + 1, suggestion_count=active_suggestion_count()
+        )
+        if not updated:
+            count = SuggestionModel.objects.active().count()
+            cls.objects.get_or_create(pk=cls.SINGLETON_ID, defaults={"version": 1, "suggestion_count": count})
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+
+class SuggestionsCacheQuerySet(models.QuerySet):
+    def prune(self, max_entries=None, ttl=None, catalog_version=None):
+        """Delete expired rows, rows ranked against another catalog version and, past
+        ``max_entries``, the least recently hit ones. Returns the number of deleted rows."""
+        deleted = 0
+        if ttl is not None:
+            deleted += self.filter(created_at__lt=timezone.now() - timedelta(seconds=ttl)).delete()[0]
+        if catalog_version is not None:
+            deleted += self.exclude(catalog_version=catalog_version).delete()[0]
+        if max_entries is not None:
+            evicted = list(self.order_by("-last_hit_at", "-id").values_list("id", flat=True)[max_entries:])
+            if evicted:
+                deleted += self.filter(id__in=evicted).delete()[0]
+        return deleted
+
+
 class SuggestionsCacheModel(models.Model):
+    class Source(models.TextChoices):
+        LLM = "llm", "LLM ranking"
+        LOCAL = "local", "Local ranking"
+        FALLBACK = "fallback", "Fallback ranking, served until the refined ranking is ready"
+
+    # profile_fingerprint() of the four profile fields, the only column lookups use
+    fingerprint = models.CharField(max_length=64, unique=True, editable=False)
     basic_information = models.JSONField(default=dict)
     interests = models.JSONField(default=list)
     goals = models.JSONField(default=list)
     other_goals = models.TextField(blank=True, null=True)
-    suggestions = models.JSONField(default=list)
+    # [[suggestion id, score], ...] best first, hydrated from the live catalog one page at a time
+    ranking = models.JSONField(default=list)
+    source = models.CharField(max_length=16, choices=Source.choices, default=Source.LLM)
+    # CatalogVersion the ranking was computed against, rows from other versions are stale
+    catalog_version = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_hit_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Lease of the worker computing the LLM ranking, so only one upstream call runs per fingerprint
+    refreshing_until = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = SuggestionsCacheQuerySet.as_manager()
+
+    @classmethod
+    def fingerprint_for(cls, profile):
+        """Fingerprint of a ``UserProfile`` (or of a cache row)"""
+        return profile_fingerprint(profile.basic_information, profile.interests, profile.goals, profile.other_goals)
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = self.fingerprint_for(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "fingerprint"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Interests: {self.interests} Goals: {self.goals} Other Goals: {self.other_goals}"
@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+
+from asgiref.sync import ThreadSensitiveContext, async_to_sync, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from pathfinder_api.vectordb import LazySingleton, get_embedding, get_vector_index
+
+from .models import CatalogVersion, SuggestionModel, SuggestionsCacheModel
+from .rankers import PROMPT_FIELDS, get_ranker, profile_text
+from .serializers import SuggestionSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestionCacheStats:
+    """Per-worker outcome counters of the personalized ranking cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = self.stale = self.misses = 0
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.stale = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale + self.misses
+            return {
+                "hits": self.hits,
+                "stale": self.stale,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+suggestion_cache_stats = SuggestionCacheStats()
+
+
+class RankingLoop:
+    """Event loop thread the background refreshes run on, so they outlive the request that started them.
+
+    A cache miss never blocks a request on the OpenAI round trip, and a refresh awaiting the LLM
+    holds no thread. At most ``SUGGESTION_RANKING["WORKERS"]`` refreshes run at once.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(settings.SUGGESTION_RANKING["WORKERS"])
+        self.thread = threading.Thread(target=self.loop.run_forever, name="ranking", daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine):
+        """Schedule ``coroutine`` on the loop, returns its ``concurrent.futures.Future``"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+ranking_loop = LazySingleton(RankingLoop)
+# Single flight: requests of one process share the Future of a fingerprint's refresh, and the
+# refreshing_until lease on the cache row keeps the other workers from starting their own
+_refreshes = {}  # fingerprint -> Future of the ranking being computed by this process
+_refreshes_lock = threading.Lock()
+
+
+def cache_entry(row, current_version):
+    """What the views need to know about a cache row (a model instance or a ``values()`` dict)"""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    config = settings.SUGGESTION_CACHE
+    expired = config["TTL"] and get("created_at") < timezone.now() - timedelta(seconds=config["TTL"])
+    return {
+        "ranking": get("ranking"),
+        "source": get("source"),
+        "stale": bool(expired or get("catalog_version") != current_version),
+    }
+
+
+def ranking_row(user_model):
+    """Query of the profile's cache row, with the current catalog version in the same SELECT"""
+    return (
+        SuggestionsCacheModel.objects.filter(fingerprint=SuggestionsCacheModel.fingerprint_for(user_model))
+        .annotate(current_version=CatalogVersion.current_subquery())
+        .values(
+            "id", "fingerprint", "ranking", "source", "catalog_version", "current_version", "created_at", "last_hit_at"
+        )
+    )
+
+
+def ranking_entry(row):
+    """Count the lookup of ``row`` and build its cache entry.
+
+    Returns ``(entry, touch)``, ``touch`` is a queryset whose last hit time is due for an update, or None.
+    """
+    if row is None:
+        suggestion_cache_stats.record("misses")
+        return None, None
+
+    entry = cache_entry(row, row["current_version"] or 0)
+    if entry["stale"]:
+        suggestion_cache_stats.record("stale")
+        return entry, None
+
+    suggestion_cache_stats.record("hits")
+    if row["last_hit_at"] < timezone.now() - timedelta(seconds=settings.SUGGESTION_CACHE["TOUCH_INTERVAL"]):
+        return entry, SuggestionsCacheModel.objects.filter(id=row["id"])
+    return entry, None
+
+
+async def alookup_ranking(user_model):
+    """The cache entry for the profile's answers, stale or not, or None. One indexed row lookup."""
+    entry, touch = ranking_entry(await ranking_row(user_model).afirst())
+    if touch is not None:
+        await touch.aupdate(last_hit_at=timezone.now())
+    return entry
+
+
+def cache_row_fields(user_model, ranking, catalog_version, source):
+    """Field values of the profile's cache row holding ``ranking``"""
+    now = timezone.now()
+    return {
+        "basic_information": user_model.basic_information,
+        "interests": user_model.interests,
+        "goals": user_model.goals,
+        "other_goals": user_model.other_goals,
+        "ranking": [[pk, score] for pk, score in ranking],
+        "source": source,
+        "catalog_version": catalog_version,
+        "created_at": now,
+        "last_hit_at": now,
+    }
+
+
+def add_suggestion_cache_sync(
+    user_model, ranking, catalog_version, source=SuggestionsCacheModel.Source.LLM, release_lease=True
+):
+    defaults = cache_row_fields(user_model, ranking, catalog_version, source)
+    if release_lease:
+        defaults["refreshing_until"] = None
+    row, created = SuggestionsCacheModel.objects.update_or_create(
+        fingerprint=SuggestionsCacheModel.fingerprint_for(user_model), defaults=defaults
+    )
+    if created:
+        # Keep the table bounded, the least recently hit profiles go first
+        SuggestionsCacheModel.objects.prune(max_entries=settings.SUGGESTION_CACHE["MAX_ENTRIES"])
+    return cache_entry(row, catalog_version)
+
+
+def store_fallback_ranking(user_model):
+    """Cache the fallback ranking of the profile, returns the cache entry of the profile.
+
+    Insert only: when another worker stored its row in the meantime, that row and its refresh
+    lease are left as they are and its entry is returned, so the lease keeps a single refresh.
+    """
+    catalog_version = CatalogVersion.current()
+    row, created = SuggestionsCacheModel.objects.get_or_create(
+        fingerprint=SuggestionsCacheModel.fingerprint_for(user_model),
+        defaults=cache_row_fields(
+            user_model, fallback_ranking(user_model), catalog_version, SuggestionsCacheModel.Source.FALLBACK
+        ),
+    )
+    if created:
+        SuggestionsCacheModel.objects.prune(max_entries=settings.SUGGESTION_CACHE["MAX_ENTRIES"])
+    return cache_entry(row, catalog_version)
+
+
+def get_suggestions():
+    suggestions = SuggestionModel.objects.active().order_by("name")
+    serializer = SuggestionSerializer(suggestions, many=True)
+    return serializer.data
+
+
+def rank_suggestions(suggestions_data, scored):
+    """Order the suggestions by the LLM ``scored`` items, as ``[(suggestion id, score), ...]``"""
+    scores = {suggestion["external_id"]: suggestion["score"] for suggestion in scored}
+    ranking = [(s["id"], scores.get(s["external_id"], s.get("score", 0))) for s in suggestions_data]
+    ranking.sort(key=lambda pair: pair[1], reverse=True)  # Stable, so ties keep the catalog order
+    return ranking
+
+
+def popularity_ranking(exclude=()):
+    """Best rated, then most saved suggestions first, scored from their average rating"""
+    rows = (
+        SuggestionModel.objects.active()
+        .order_by("-rating_average", "-rating_count", "-saved_count", "name")
+        .values_list("id", "rating_average")
+    )
+    return [(pk, round(average * 20)) for pk, average in rows if pk not in exclude]
+
+
+def fallback_ranking(user_model):
+    """Instant ranking served until the LLM one is ready.
+
+    Suggestions are ordered by the embedding distance to the profile's answers, or by
+    popularity when the profile is empty or the embeddings are unavailable.
+    """
+    text = profile_text(user_model)
+    index = get_vector_index(SuggestionModel)
+    if not text or not len(index):
+        return popularity_ranking()
+
+    try:
+        ids, distances = index.search(get_embedding(text))
+    except Exception:
+        logger.warning("Could not embed the profile, falling back to popularity", exc_info=True)
+        return popularity_ranking()
+
+    # Normalized embeddings are at most 2 apart, so map the distance onto the LLM's 0-100 scale
+    ranking = [(pk, round(100 * max(0.0, 1 - distance / 2))) for pk, distance in zip(ids.tolist(), distances.tolist())]
+    ranked = {pk for pk, _ in ranking}
+    return ranking + [(pk, 0) for pk, _ in popularity_ranking(exclude=ranked)]
+
+
+def ranking_candidates(ranked, limit):
+    """Stage two input: the first ``limit`` suggestions of ``ranked``, trimmed to ``PROMPT_FIELDS``.
+
+    With no ``limit`` the whole catalog is sent, which is what the LLM ranked before the
+    embedding pre-filter.
+    """
+    ids = [pk for pk, _ in (ranked[:limit] if limit else ranked)]
+    rows = SuggestionModel.objects.active().in_bulk(ids, field_name="id")
+    return [{"id": pk, **{field: getattr(rows[pk], field) for field in PROMPT_FIELDS}} for pk in ids if pk in rows]
+
+
+async def arank_candidates(user_model, candidates):
+    """Score the candidates with the configured ranker, or with the fallback one if it fails.
+
+    Returns ``(scored, source)``. A ranking from the fallback ranker is stored as a fallback,
+    so it is refreshed again on a later request.
+    """
+    config = settings.SUGGESTION_RANKING
+    ranker = get_ranker(config["BACKEND"], config["OPTIONS"])
+    try:
+        return await ranker.arank(user_model, candidates, config["TIMEOUT"]), ranker.source
+    except Exception:
+        if not config["FALLBACK_BACKEND"]:
+            raise
+        logger.warning("%s failed, ranking with %s", config["BACKEND"], config["FALLBACK_BACKEND"], exc_info=True)
+        fallback = get_ranker(config["FALLBACK_BACKEND"])
+        return await fallback.arank(user_model, candidates, config["TIMEOUT"]), SuggestionsCacheModel.Source.FALLBACK
+
+
+def ranking_inputs(user_model, limit):
+    """``(catalog version, embedding ranking, candidates)`` of the profile, read before ranking it"""
+    # The version is read first, so an edit made while the LLM ranks leaves the row stale
+    catalog_version = CatalogVersion.current()
+    ranked = fallback_ranking(user_model)
+    return catalog_version, ranked, ranking_candidates(ranked, limit)
+
+
+async def arefresh_ranking(user_model):
+    """Compute the refined ranking of the profile and cache it. Returns the new cache entry, or None.
+
+    Retrieval runs in two stages: the embedding ranking picks the ``SUGGESTION_RANKING["CANDIDATES"]``
+    suggestions nearest to the profile, and only those are reranked by the configured ranker. The rest of
+    the catalog follows in embedding order with a score of 0. The database and embedding steps run
+    through ``sync_to_async``, the ranker is awaited.
+
+    When the ranker fails the refresh lease is kept until it runs out, so an unavailable upstream is
+    retried once per ``SUGGESTION_RANKING["LEASE"]`` rather than on every request.
+    """
+    try:
+        limit = settings.SUGGESTION_RANKING["CANDIDATES"]
+        catalog_version, ranked, candidates = await sync_to_async(ranking_inputs)(user_model, limit)
+        scored, source = await arank_candidates(user_model, candidates)
+        ranking = rank_suggestions(candidates, scored)
+        if limit:
+            ranking += [(pk, 0) for pk, _ in ranked[limit:]]
+        release = source != SuggestionsCacheModel.Source.FALLBACK  # Ranked by the fallback ranker
+        return await sync_to_async(add_suggestion_cache_sync)(user_model, ranking, catalog_version, source, release)
+    except Exception:
+        fingerprint = SuggestionsCacheModel.fingerprint_for(user_model)
+        logger.exception("Could not rank suggestions for profile %s", fingerprint)
+        return None
+
+
+def claim_refresh(fingerprint):
+    """Take the refresh lease of the fingerprint's cache row, across all workers.
+
+    A single conditional UPDATE, so exactly one caller wins until the winner stores its ranking
+    or the lease runs out (e.g. the worker died). The cache row must already exist.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=settings.SUGGESTION_RANKING["LEASE"])
+    claimed = (
+        SuggestionsCacheModel.objects.filter(fingerprint=fingerprint)
+        .filter(Q(refreshing_until__isnull=True) | Q(refreshing_until__lte=now))
+        .update(refreshing_until=now + lease)
+    )
+    return claimed == 1
+
+
+async def _run_refresh(fingerprint, user_model):
+    try:
+        # ThreadSensitiveContext gives the refresh a sync thread of its own, like a request, so its
+        # steps share one connection
+        async with ranking_loop.semaphore, ThreadSensitiveContext():
+            try:
+                return await arefresh_ranking(user_model)
+            finally:
+                await sync_to_async(connections.close_all)()  # Only that thread's connections
+    finally:
+        with _refreshes_lock:
+            _refreshes.pop(fingerprint, None)
+
+
+def schedule_refresh(user_model):
+    """Start computing the profile's LLM ranking, unless a refresh of it is already running.
+
+    Returns the ``Future`` of the new cache entry, the one this process already has in flight
+    for the fingerprint, or None when another worker holds the refresh lease. With
+    ``SUGGESTION_RANKING["BACKGROUND"]`` off (e.g. in tests or management commands) the ranking
+    is computed before returning.
+    """
+    fingerprint = SuggestionsCacheModel.fingerprint_for(user_model)
+    with _refreshes_lock:
+        future = _refreshes.get(fingerprint)
+    if future is not None:
+        return future
+    if not claim_refresh(fingerprint):
+        return None
+
+    if not settings.SUGGESTION_RANKING["BACKGROUND"]:
+        future = Future()
+        future.set_result(async_to_sync(arefresh_ranking)(user_model))
+        return future
+
+    with _refreshes_lock:
+        future = _refreshes.get(fingerprint)  # Taken over from an expired lease of this process
+        if future is None:
+            future = _refreshes[fingerprint] = ranking_loop.submit(_run_refresh(fingerprint, user_model))
+    return future
+
+
+async def await_refresh(future):
+    """The refreshed cache entry if ``future`` finishes within ``SUGGESTION_RANKING["WAIT"]``, else None"""
+    if future is None:
+        return None
+    if not future.done():
+        try:
+            # Shielded, so giving up on the wait does not cancel the refresh
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), settings.SUGGESTION_RANKING["WAIT"])
+        except TimeoutError:
+            return None
+    return future.result()
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from pathfinder_api.llm import llm_client
+from pathfinder_api.vectordb import get_embedding, get_vector_index
+
+from .models import SuggestionModel, SuggestionsCacheModel
+from .reco_schema import RANKING_SCHEMA, SYSTEM_RULES
+
+logger = logging.getLogger(__name__)
+
+# All the LLM needs to rank a suggestion, the rest of the row only costs prompt tokens
+PROMPT_FIELDS = ("external_id", "name", "tags", "category")
+TOP_ITEMS = 20
+
+
+def profile_text(user_model):
+    """The profile's answers as one sentence to embed"""
+    parts = [str(value) for value in (user_model.basic_information or {}).values() if value]
+    parts += [*(user_model.interests or []), *(user_model.goals or [])]
+    if user_model.other_goals:
+        parts.append(user_model.other_goals)
+    return ". ".join(str(part).strip() for part in parts if str(part).strip())
+
+
+def words(text):
+    return set(re.findall(r"[a-z0-9]{3,}", str(text).lower()))
+
+
+class Ranker:
+    """Scores the ranking candidates of a profile.
+
+    ``candidates`` are dicts of the suggestion ``id`` and ``PROMPT_FIELDS``, nearest to the profile
+    first. ``rank`` returns ``[{"external_id": ..., "score": 0-100}, ...]`` for the best of them and
+    must give up after ``timeout`` seconds; candidates it leaves out keep their embedding order.
+    ``arank`` is what the background refresh awaits.
+    """
+
+    source = SuggestionsCacheModel.Source.LLM  # Stored with the cached ranking
+
+    def rank(self, user_model, candidates, timeout):
+        raise NotImplementedError
+
+    async def arank(self, user_model, candidates, timeout):
+        # CPU bound by default, so it runs on the refresh's sync thread instead of the event loop
+        return await sync_to_async(self.rank)(user_model, candidates, timeout)
+
+
+class OpenAIRanker(Ranker):
+    """Asks an OpenAI chat model to score the candidates, with ``RANKING_SCHEMA`` structured output.
+
+    With ``record_to`` set, every answer is appended to that JSON lines file for ``ReplayRanker``.
+    """
+
+    def __init__(self, model=None, top=TOP_ITEMS, record_to=None):
+        self.model = model or settings.SUGGESTION_RANKING["MODEL"]
+        self.top = top
+        self.record_to = record_to
+        self._record_lock = threading.Lock()
+
+    def messages(self, user_model, candidates):
+        """Chat messages asking the model to score ``candidates`` for the profile"""
+        return [
+            {"role": "system", "content": SYSTEM_RULES},
+            {
+                "role": "user",
+                "content": json.dumps(
+                    {
+                        "basic_info": user_model.basic_information,
+                        "interests": user_model.interests,
+                        "goals": user_model.goals,
+                        "additional_info": user_model.other_goals,
+                        "suggestions": [
+                            {field: candidate[field] for field in PROMPT_FIELDS} for candidate in candidates
+                        ],
+                    }
+                ),
+            },
+        ]
+
+    def completion_options(self, messages, timeout):
+        return {
+            "model": self.model,
+            "messages": messages,
+            "response_format": {"type": "json_schema", "json_schema": RANKING_SCHEMA},
+            "temperature": 0.2,
+            "timeout": timeout,
+        }
+
+    def complete(self, messages, timeout):
+        """Send ``messages`` to the model over the shared client, returns the chat completion"""
+        return llm_client.chat(**self.completion_options(messages, timeout))
+
+    async def acomplete(self, messages, timeout):
+        return await llm_client.achat(**self.completion_options(messages, timeout))
+
+    def rank(self, user_model, candidates, timeout):
+        return self.scored(user_model, self.complete(self.messages(user_model, candidates), timeout))
+
+    async def arank(self, user_model, candidates, timeout):
+        # Awaited, so a refresh holds no thread during the upstream round trip
+        return self.scored(user_model, await self.acomplete(self.messages(user_model, candidates), timeout))
+
+    def scored(self, user_model, completion):
+        """The scored suggestions of ``completion``, recorded for ``ReplayRanker`` if enabled"""
+        scored = json.loads(completion.choices[0].message.content)["suggestions"][: self.top]
+        if self.record_to:
+            record = {"fingerprint": SuggestionsCacheModel.fingerprint_for(user_model), "suggestions": scored}
+            with self._record_lock, open(self.record_to, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return scored
+
+
+class LocalRanker(Ranker):
+    """Scores candidates offline, in one vectorized pass over them.
+
+    The score blends how many of the profile's interest and goal words a candidate's name, tags
+    and categories cover with the cosine similarity of their embeddings. Deterministic and fast
+    enough to stand in for the LLM when it is slow or unavailable.
+    """
+
+    source = SuggestionsCacheModel.Source.LOCAL
+
+    def __init__(self, overlap_weight=0.5, top=TOP_ITEMS):
+        self.overlap_weight = overlap_weight
+        self.top = top
+
+    def rank(self, user_model, candidates, timeout):
+        if not candidates:
+            return []
+
+        overlap = self.overlap(user_model, candidates)
+        similarity = self.similarity(user_model, candidates)
+        scores = 100 * (self.overlap_weight * overlap + (1 - self.overlap_weight) * similarity)
+        best = np.argsort(-scores, kind="stable")[: self.top]  # Ties keep the embedding order
+        return [
+            {"external_id": candidates[i]["external_id"], "score": round(float(scores[i]), 1)} for i in best.tolist()
+        ]
+
+    def overlap(self, user_model, candidates):
+        """Share of the profile's interest and goal words found in each candidate, ``(n,)`` in [0, 1]"""
+        answers = [*(user_model.interests or []), *(user_model.goals or []), user_model.other_goals or ""]
+        terms = sorted(set().union(*(words(answer) for answer in answers)))
+        if not terms:
+            return np.zeros(len(candidates))
+
+        vocabulary = {term: j for j, term in enumerate(terms)}
+        matches = np.zeros((len(candidates), len(terms)), dtype=bool)
+        for i, candidate in enumerate(candidates):
+            labels = " ".join([candidate["name"], *(candidate["tags"] or []), *(candidate["category"] or [])])
+            matches[i, [vocabulary[word] for word in words(labels) if word in vocabulary]] = True
+        return matches.mean(axis=1)
+
+    def similarity(self, user_model, candidates):
+        """Cosine similarity of each candidate to the profile, ``(n,)`` clipped to [0, 1]"""
+        similarity = np.zeros(len(candidates))
+        text = profile_text(user_model)
+        index = get_vector_index(SuggestionModel)
+        if not text or not len(index):
+            return similarity
+
+        try:
+            query = get_embedding(text)
+        except Exception:
+            logger.warning("Could not embed the profile, ranking by word overlap only", exc_info=True)
+            return similarity
+
+        positions = {candidate["id"]: i for i, candidate in enumerate(candidates)}
+        ids, distances = index.search(query, ids=list(positions))
+        # Embeddings are normalized, so ||a - b||^2 = 2 - 2cos(a, b)
+        similarity[[positions[pk] for pk in ids.tolist()]] = 1 - np.square(distances) / 2
+        return np.clip(similarity, 0, 1)
+
+
+class ReplayRanker(Ranker):
+    """Answers with the rankings ``OpenAIRanker(record_to=...)`` recorded, for benchmarks and load tests.
+
+    ``latency`` seconds (capped by the timeout) are slept per call to stand in for the upstream
+    round trip. Profiles that were never recorded get an empty ranking.
+    """
+
+    def __init__(self, path, latency=0.0):
+        self.latency = latency
+        with open(path) as f:
+            self.responses = {record["fingerprint"]: record["suggestions"] for record in map(json.loads, f)}
+
+    def rank(self, user_model, candidates, timeout):
+        time.sleep(min(self.latency, timeout))
+        return self.responses.get(SuggestionsCacheModel.fingerprint_for(user_model), [])
+
+    async def arank(self, user_model, candidates, timeout):
+        await asyncio.sleep(min(self.latency, timeout))
+        return self.responses.get(SuggestionsCacheModel.fingerprint_for(user_model), [])
+
+
+_rankers = {}
+_rankers_lock = threading.Lock()
+
+
+def get_ranker(backend, options=None):
+    """The shared instance of the ``backend`` dotted path, built with ``options``"""
+    key = (backend, json.dumps(options or {}, sort_keys=True))
+    with _rankers_lock:
+        if key not in _rankers:
+            _rankers[key] = import_string(backend)(**(options or {}))
+        return _rankers[key]
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from pathfinder_api.vectordb import get_vector_index
+
+from .models import CatalogVersion, SuggestionModel
+
+
+@receiver(post_save, sender=SuggestionModel)
+def update_vector_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {"embedding", "is_active"} & set(update_fields):
+        return
+
+    # Only patch the index once the row is actually visible to other queries
+    pk, embedding = instance.pk, instance.embedding
+    if not instance.is_active:
+        transaction.on_commit(lambda: get_vector_index(sender).remove(pk))
+        return
+    transaction.on_commit(lambda: get_vector_index(sender).upsert(pk, embedding))
+
+
+@receiver(post_delete, sender=SuggestionModel)
+def remove_from_vector_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: get_vector_index(sender).remove(pk))
+
+
+@receiver(post_save, sender=SuggestionModel)
+@receiver(post_delete, sender=SuggestionModel)
+def bump_catalog_version(sender, **kwargs):
+    # Cached personalized rankings were computed against the old catalog
+    CatalogVersion.bump()
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import os
+from urllib.parse import urlparse
+
+import requests
+
+# Characters read from a file or the network at a time, so a source never holds the whole payload
+READ_SIZE = 64 * 1024
+
+FORMATS = ("json", "ndjson", "csv")
+EXTENSIONS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+def iter_json_array(chunks):
+    """Yield the objects of a JSON array read as text ``chunks``, one at a time.
+
+    Only the text of the object being decoded is buffered, whatever the size of the array.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, started = "", 0, False
+    for chunk in chunks:
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array of rows")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                row, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # The object continues in the next chunk
+            yield row
+    raise ValueError("Truncated JSON array")
+
+
+def iter_ndjson(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(lines):
+    # Missing trailing cells read as "", like the empty cells of the sheet export
+    yield from csv.DictReader(lines, restval="")
+
+
+class Source:
+    """Rows of activities, as dicts of sheet columns, read incrementally by ``rows()``"""
+
+    def __init__(self, location, format):
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        self.location = location
+        self.format = format
+
+    def rows(self):
+        raise NotImplementedError
+
+    def __str__(self):
+        return f"{self.location} ({self.format})"
+
+
+class FileSource(Source):
+    """A local JSON array, NDJSON or CSV file, so the sync runs offline"""
+
+    def rows(self):
+        with open(self.location, newline="", encoding="utf-8") as f:
+            if self.format == "json":
+                yield from iter_json_array(iter(lambda: f.read(READ_SIZE), ""))
+            elif self.format == "ndjson":
+                yield from iter_ndjson(f)
+            else:
+                yield from iter_csv(f)
+
+
+class HTTPSource(Source):
+    """A JSON array, NDJSON or CSV document streamed from a URL, e.g. the opensheet export"""
+
+    def __init__(self, location, format, timeout=30):
+        super().__init__(location, format)
+        self.timeout = timeout
+
+    def rows(self):
+        with requests.get(self.location, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"  # Decoded to text as it arrives
+            if self.format == "json":
+                yield from iter_json_array(response.iter_content(READ_SIZE, decode_unicode=True))
+                return
+            # Read like a local file: lines keep their endings, so quoted multi-line CSV cells survive
+            response.raw.decode_content = True  # Undo any gzip transfer encoding
+            lines = io.TextIOWrapper(response.raw, encoding=response.encoding, newline="")
+            if self.format == "ndjson":
+                yield from iter_ndjson(lines)
+            else:
+                yield from iter_csv(lines)
+
+
+def open_source(location, format=None, timeout=30):
+    """The source of a URL or file path, its format guessed from the extension unless given.
+
+    URLs without a known extension default to JSON, which is what the opensheet export serves.
+    """
+    is_url = urlparse(location).scheme in ("http", "https")
+    path = urlparse(location).path if is_url else location
+    format = format or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if is_url:
+        return HTTPSource(location, format or "json", timeout)
+    if format is None:
+        raise ValueError(f"Cannot tell the format of {location}, pass it explicitly")
+    return FileSource(location, format)
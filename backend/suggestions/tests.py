@@ -1,13 +1,62 @@
-from unittest.mock import patch
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
+import numpy as np
+import openai
+from asgiref.sync import async_to_sync
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from accounts.models import UserProfile
-from suggestions.models import EXAMPLE_EXTERNAL_ID, SuggestionModel, SuggestionsCacheModel
+from accounts.models import SavedItem, UserProfile
+from pathfinder_api.llm import LLMClient, llm_stats
+from pathfinder_api.vector_backends import ExactBackend, IVFFlatBackend
+from pathfinder_api.vectordb import (
+    embedding_cache,
+    get_embedding,
+    get_embeddings,
+    get_vector_index,
+    vector_search,
+    warm_up,
+)
+from social.models import UserRating
+from suggestions import personalization
+from suggestions.models import (
+    EXAMPLE_EXTERNAL_ID,
+    CatalogVersion,
+    SuggestionModel,
+    SuggestionsCacheModel,
+    profile_fingerprint,
+)
+from suggestions.rankers import LocalRanker, OpenAIRanker, ReplayRanker
+from suggestions.sources import iter_json_array, open_source
+from suggestions.views import (
+    SORT_ORDERS,
+    PersonalizedSuggestionsView,
+    SuggestionDetailView,
+    SuggestionDetailWithSavedStatusView,
+    SuggestionListView,
+    _filtered_counts,
+    encode_cursor,
+    keyset_filter,
+)
 
 
 # The token obtain endpoint are located at the root level of the API
@@ -90,7 +139,10 @@ class SuggestionListViewTestCase(APITestCase):
         """Set up test user and suggestions"""
         self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
         self.access = AccessToken.for_user(self.user)
-        self.user_profile = UserProfile.objects.create(user=self.user, name="Test User", saved_items=["item1"])
+        self.user_profile = UserProfile.objects.create(user=self.user, name="Test User")
+        # Catalog versions restart with every test database, so do the cached counts
+        _filtered_counts.clear()
+        self.addCleanup(_filtered_counts.clear)
 
         # Create multiple test suggestions
         for i in range(15):
@@ -102,6 +154,7 @@ class SuggestionListViewTestCase(APITestCase):
                 url="https://example.com",
                 image="https://example.com/image.jpg",
             )
+        SavedItem.objects.create(user=self.user_profile, suggestion=SuggestionModel.objects.get(external_id="item1"))
 
     def test_suggestion_list_view_returns_ok(self):
         """Test that the suggestion list view endpoint returns status ok"""
@@ -152,12 +205,191 @@ class SuggestionListViewTestCase(APITestCase):
                 if item["external_id"] == "item1":
                     self.assertTrue(item["is_saved"])
 
+    def test_suggestion_list_view_query_count_is_constant(self):
+        """Test that serializing a page does not run queries for every suggestion"""
+        for i in range(15):
+            UserRating.objects.create(
+                user=self.user_profile, suggestion=SuggestionModel.objects.get(external_id=f"item{i}"), rating=i % 5 + 1
+            )
+
+        def list_page(page_size):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    "/api/suggestions/suggestions/",
+                    {"page_size": page_size},
+                    HTTP_AUTHORIZATION=f"Bearer {self.access}",
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response, len(queries)
+
+        _, small_queries = list_page(2)
+        large_response, large_queries = list_page(15)
+
+        self.assertEqual(small_queries, large_queries)
+        item = next(item for item in large_response.data["results"] if item["external_id"] == "item1")
+        self.assertEqual((item["average_rating"], item["rate_count"], item["saved_count"]), (2, 1, 1))
+
+    def test_suggestion_list_view_sorts_by_rating(self):
+        """Test that sort=rating lists the best rated suggestions first"""
+        UserRating.objects.create(
+            user=self.user_profile, suggestion=SuggestionModel.objects.get(external_id="item7"), rating=5
+        )
+        UserRating.objects.create(
+            user=self.user_profile, suggestion=SuggestionModel.objects.get(external_id="item3"), rating=2
+        )
+
+        response = self.client.get(
+            "/api/suggestions/suggestions/", {"sort": "rating"}, HTTP_AUTHORIZATION=f"Bearer {self.access}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["external_id"] for item in response.data["results"][:2]], ["item7", "item3"])
+
+        response = self.client.get(
+            "/api/suggestions/suggestions/", {"sort": "price"}, HTTP_AUTHORIZATION=f"Bearer {self.access}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_suggestion_list_view_default_page_size(self):
         """Test that the suggestion list view uses default page size of 50"""
         response = self.client.get("/api/suggestions/suggestions/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["pagination"]["page_size"], 50)
 
+    def list_suggestions(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/suggestions/suggestions/", params, HTTP_AUTHORIZATION=f"Bearer {self.access}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = [query["sql"] for query in queries if "COUNT" in query["sql"]]
+        return response.data["pagination"], counts
+
+    def test_total_count_is_cached(self):
+        """Test that totals are read from the catalog counter, which saves and deletes keep current"""
+        pagination, counts = self.list_suggestions(page_size=4)
+        self.assertEqual((pagination["total_count"], pagination["total_pages"]), (15, 4))
+        self.assertEqual(counts, [])
+
+        SuggestionModel.objects.get(external_id="item0").delete()
+        SuggestionModel.objects.filter(external_id="item1").update(is_active=False)
+        SuggestionModel.objects.create(external_id="item15", name="Test Item 15", category=["Category B"])
+        pagination, counts = self.list_suggestions(page_size=4)
+        self.assertEqual(pagination["total_count"], 14)  # The update sent no signal, item1 still counts
+        self.assertEqual(counts, [])
+
+    def test_filtered_counts_are_cached_per_catalog_version(self):
+        """Test that a filtered listing is counted once until the catalog changes"""
+        self.assertEqual(self.list_suggestions(category="Category A")[0]["total_count"], 15)
+        self.assertEqual(self.list_suggestions(category="Category A")[1], [])
+
+        SuggestionModel.objects.create(external_id="item15", name="Test Item 15", category=["Category A"])
+        pagination, counts = self.list_suggestions(category="Category A")
+        self.assertEqual(pagination["total_count"], 16)
+        self.assertEqual(len(counts), 1)
+
+    def test_totals_can_be_skipped(self):
+        """Test that include_total=false paginates without counting anything"""
+        pagination, counts = self.list_suggestions(page_size=4, include_total="false")
+        self.assertEqual(counts, [])
+        self.assertNotIn("total_count", pagination)
+        self.assertTrue(pagination["has_next"])
+
+        pagination, counts = self.list_suggestions(page_size=4, page=4, include_total="false")
+        self.assertEqual((pagination["has_next"], pagination["has_previous"]), (False, True))
+        pagination, _ = self.list_suggestions(pagination="cursor", include_total="false")
+        self.assertNotIn("total_count", pagination)
+
+    def walk(self, params, cursor_key="next_cursor"):
+        """Follow the cursors from the first page, returns the pages of external ids and the last response"""
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(
+                "/api/suggestions/suggestions/",
+                {**params, **({"cursor": cursor} if cursor else {"pagination": "cursor"})},
+                HTTP_AUTHORIZATION=f"Bearer {self.access}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item["external_id"] for item in response.data["results"]])
+            cursor = response.data["pagination"][cursor_key]
+            if cursor is None:
+                return pages, response
+
+    def test_cursor_pagination_walks_the_catalog(self):
+        """Test that following the cursors lists every suggestion once, in the page number order"""
+        UserRating.objects.create(
+            user=self.user_profile, suggestion=SuggestionModel.objects.get(external_id="item7"), rating=5
+        )
+        for sort in ("name", "rating"):
+            with self.subTest(sort):
+                response = self.client.get(
+                    "/api/suggestions/suggestions/", {"sort": sort}, HTTP_AUTHORIZATION=f"Bearer {self.access}"
+                )
+                expected = [item["external_id"] for item in response.data["results"]]
+
+                pages, last = self.walk({"sort": sort, "page_size": 4})
+                self.assertEqual([len(page) for page in pages], [4, 4, 4, 3])
+                self.assertEqual([item for page in pages for item in page], expected)
+                self.assertFalse(last.data["pagination"]["has_next"])
+
+                previous = self.client.get(
+                    "/api/suggestions/suggestions/",
+                    {"sort": sort, "page_size": 4, "cursor": last.data["pagination"]["previous_cursor"]},
+                    HTTP_AUTHORIZATION=f"Bearer {self.access}",
+                )
+                self.assertEqual([item["external_id"] for item in previous.data["results"]], pages[2])
+                self.assertTrue(previous.data["pagination"]["has_next"])
+
+    def test_cursor_page_reads_only_its_rows(self):
+        """Test that a cursor page fetches page_size + 1 rows without the embeddings"""
+        first = self.client.get(
+            "/api/suggestions/suggestions/",
+            {"pagination": "cursor", "page_size": 4},
+            HTTP_AUTHORIZATION=f"Bearer {self.access}",
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/suggestions/suggestions/",
+                {"cursor": first.data["pagination"]["next_cursor"], "page_size": 4},
+                HTTP_AUTHORIZATION=f"Bearer {self.access}",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        (page_query,) = [query["sql"] for query in queries if 'FROM "suggestions_suggestionmodel"' in query["sql"]]
+        self.assertIn("LIMIT 5", page_query)
+        self.assertNotIn("embedding", page_query)
+        self.assertNotIn("COUNT", page_query)
+
+    @skipUnless(connection.vendor == "sqlite", "Checks the SQLite query plan")
+    def test_cursor_seeks_into_the_sort_index(self):
+        """Test that a cursor page is a range search of the sort index, not a scan from its start"""
+        for sort, values in (("name", ["Test Item 5", 6]), ("rating", [0.0, 0, "Test Item 5", 6])):
+            with self.subTest(sort):
+                queryset = SuggestionModel.objects.active().filter(keyset_filter(SORT_ORDERS[sort], values))
+                plan = queryset.order_by(*SORT_ORDERS[sort])[:5].explain()
+                self.assertIn("SEARCH", plan)
+                self.assertNotIn("SCAN", plan)
+
+    def test_invalid_cursor_is_rejected(self):
+        """Test that tampered cursors and cursors of another sort order are refused"""
+        first = self.client.get(
+            "/api/suggestions/suggestions/",
+            {"pagination": "cursor", "page_size": 4},
+            HTTP_AUTHORIZATION=f"Bearer {self.access}",
+        )
+        forged = [
+            encode_cursor({"sort": "name", "after": 5}),
+            encode_cursor({"sort": "name", "after": ["Test Item 1", {"id": 1}]}),
+            encode_cursor({"sort": "name", "before": ["Test Item 1"]}),
+        ]
+        for params in (
+            {"cursor": "not a cursor"},
+            {"cursor": first.data["pagination"]["next_cursor"], "sort": "rating"},
+            *({"cursor": cursor} for cursor in forged),
+        ):
+            response = self.client.get(
+                "/api/suggestions/suggestions/", params, HTTP_AUTHORIZATION=f"Bearer {self.access}"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class SuggestionListWithSavedStatusViewTestCase(APITestCase):
     """Tests for the suggestion list with saved status view endpoint"""
@@ -169,7 +401,6 @@ class SuggestionListWithSavedStatusViewTestCase(APITestCase):
         self.user_profile = UserProfile.objects.create(
             user=self.user,
             name="Test User",
-            saved_items=[EXAMPLE_EXTERNAL_ID],
             basic_information={"role": "student", "grade": "10"},
             interests=["math", "science"],
             goals=["learn programming"],
@@ -184,19 +415,17 @@ class SuggestionListWithSavedStatusViewTestCase(APITestCase):
             url="https://example.com",
             image="https://example.com/image.jpg",
         )[0]
+        SavedItem.objects.create(user=self.user_profile, suggestion=suggestion)
 
-        # Create a cached suggestion to avoid OpenAI API calls in tests
-        from suggestions.serializers import SuggestionSerializer
-
-        serializer = SuggestionSerializer(suggestion)
-        cached_suggestions = [serializer.data]
+        self.suggestion = suggestion
 
+        # Create a cached ranking to avoid OpenAI API calls in tests
         SuggestionsCacheModel.objects.update_or_create(
             basic_information=self.user_profile.basic_information,
             interests=self.user_profile.interests,
             goals=self.user_profile.goals,
             other_goals=self.user_profile.other_goals,
-            defaults={"suggestions": cached_suggestions},
+            defaults={"ranking": [[suggestion.id, 80]], "catalog_version": CatalogVersion.current()},
         )
 
     def test_suggestion_list_with_saved_status_view_returns_ok(self):
@@ -255,6 +484,78 @@ class SuggestionListWithSavedStatusViewTestCase(APITestCase):
                 if item["external_id"] == EXAMPLE_EXTERNAL_ID:
                     self.assertTrue(item["is_saved"])
 
+    def test_profile_fingerprint_is_canonical(self):
+        """Test that key order and whitespace do not change the profile fingerprint"""
+        fingerprint = profile_fingerprint({"role": "student", "grade": "10"}, ["math"], ["learn  programming"], None)
+        self.assertEqual(
+            fingerprint,
+            profile_fingerprint({"grade": "10", "role": " student"}, ["math "], ["learn programming"], ""),
+        )
+        self.assertNotEqual(fingerprint, profile_fingerprint({"role": "student", "grade": "11"}, ["math"], [], None))
+
+    def test_cache_lookup_does_not_depend_on_cache_size(self):
+        """Test that a cache hit costs the same queries however many profiles are cached"""
+
+        def personalized():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    "/api/suggestions/personalized-suggestions/", HTTP_AUTHORIZATION=f"Bearer {self.access}"
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response.content, len(queries)
+
+        content, query_count = personalized()
+        for i in range(20):
+            SuggestionsCacheModel.objects.create(interests=[f"interest {i}"], ranking=[[self.suggestion.id, i]])
+
+        self.assertEqual(personalized(), (content, query_count))
+
+    def test_add_suggestion_cache_upserts_by_fingerprint(self):
+        """Test that caching a ranking twice for equivalent profiles keeps a single row"""
+        from suggestions.personalization import add_suggestion_cache_sync, alookup_ranking
+
+        self.user_profile.goals = ["  learn programming "]
+        add_suggestion_cache_sync(self.user_profile, [(self.suggestion.id, 95)], CatalogVersion.current())
+
+        self.assertEqual(SuggestionsCacheModel.objects.count(), 1)
+        entry = async_to_sync(alookup_ranking)(self.user_profile)
+        self.assertEqual(entry["ranking"], [[self.suggestion.id, 95]])
+        self.assertFalse(entry["stale"])
+
+    def test_cached_ranking_is_hydrated_from_the_catalog(self):
+        """Test that cached pages show the ranked score and the current catalog data"""
+        second = SuggestionModel.objects.create(external_id="second", name="Second Item")
+        gone = SuggestionModel.objects.create(external_id="gone", name="Gone Item")
+        gone.delete()
+        SuggestionsCacheModel.objects.update(
+            ranking=[[second.id, 90], [gone.id, 85], [self.suggestion.id, 80]], catalog_version=CatalogVersion.current()
+        )
+        UserRating.objects.create(user=self.user_profile, suggestion=self.suggestion, rating=4)
+
+        response = self.client.get(
+            "/api/suggestions/personalized-suggestions/", HTTP_AUTHORIZATION=f"Bearer {self.access}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            [(item["external_id"], item["score"]) for item in results], [("second", 90), (EXAMPLE_EXTERNAL_ID, 80)]
+        )
+        self.assertEqual(
+            (results[1]["average_rating"], results[1]["saved_count"], results[1]["is_saved"]), (4.0, 1, True)
+        )
+
+    def test_rank_suggestions_orders_by_score(self):
+        """Test that LLM scores order the ranking and unscored items keep their catalog order"""
+        from suggestions.personalization import rank_suggestions
+
+        catalog = [
+            {"id": 1, "external_id": "a", "score": 0},
+            {"id": 2, "external_id": "b", "score": 0},
+            {"id": 3, "external_id": "c", "score": 0},
+        ]
+        ranking = rank_suggestions(catalog, [{"external_id": "c", "score": 70}])
+        self.assertEqual(ranking, [(3, 70), (1, 0), (2, 0)])
+
 
 class SuggestionDetailViewTestCase(APITestCase):
     """Tests for the suggestion detail view endpoint"""
@@ -309,21 +610,17 @@ class SuggestionDetailWithSavedStatusViewTestCase(APITestCase):
     def setUp(self):
         """Set up test user"""
         self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
-        UserProfile.objects.update_or_create(
-            user=self.user,
-            defaults={
-                "saved_items": [EXAMPLE_EXTERNAL_ID],
-            },
-        )
+        user_profile = UserProfile.objects.create(user=self.user)
         self.access = AccessToken.for_user(self.user)
-        SuggestionModel.objects.update_or_create(
+        suggestion = SuggestionModel.objects.update_or_create(
             external_id=EXAMPLE_EXTERNAL_ID,
             name="Example Item",
             category=["Example Category"],
             description="Example Description",
             url="https://example.com",
             image="https://example.com/image.jpg",
-        )
+        )[0]
+        SavedItem.objects.create(user=user_profile, suggestion=suggestion)
 
     def test_suggestion_detail_with_saved_status_view_returns_ok(self):
         """Test that the suggestion detail with saved status view endpoint returns status ok"""
@@ -359,7 +656,7 @@ class SuggestionDetailWithSavedStatusViewTestCase(APITestCase):
         """Test that the suggestion detail with saved status view shows is_saved=False when item is not saved"""
         # Create a user without the item saved
         user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword123")
-        UserProfile.objects.create(user=user2, name="Test User 2", saved_items=[])
+        UserProfile.objects.create(user=user2, name="Test User 2")
         access2 = AccessToken.for_user(user2)
 
         response = self.client.get(
@@ -368,3 +665,1160 @@ class SuggestionDetailWithSavedStatusViewTestCase(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(response.data["is_saved"])
+
+    async def test_suggestion_views_run_on_the_event_loop(self):
+        """Test that the suggestion views are async and answer through the ASGI handler"""
+        for view in (
+            SuggestionListView,
+            PersonalizedSuggestionsView,
+            SuggestionDetailView,
+            SuggestionDetailWithSavedStatusView,
+        ):
+            self.assertTrue(view.view_is_async)
+
+        response = await self.async_client.get(
+            f"/api/suggestions/suggestions-with-saved-status/{EXAMPLE_EXTERNAL_ID}/",
+            headers={"Authorization": f"Bearer {self.access}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["is_saved"])
+
+
+class VectorFieldTestCase(APITestCase):
+    """Tests for the binary storage of suggestion embeddings"""
+
+    def setUp(self):
+        """Create a suggestion with a nested embedding, as written by older syncs"""
+        SuggestionModel.objects.create(external_id="item0", name="Test Item 0", embedding=[[0.5, 1.5, 2.0]])
+
+    def test_embedding_is_deferred_by_default(self):
+        """Test that normal suggestion queries do not load the embedding column"""
+        suggestion = SuggestionModel.objects.get(external_id="item0")
+        self.assertEqual(suggestion.get_deferred_fields(), {"embedding"})
+
+    def test_embedding_round_trips_as_float32_array(self):
+        """Test that the embedding is decoded into a flat float32 array"""
+        embedding = SuggestionModel.objects.values_list("embedding", flat=True).get(external_id="item0")
+        self.assertEqual(embedding.dtype, np.float32)
+        self.assertEqual(embedding.tolist(), [0.5, 1.5, 2.0])
+
+
+class VectorIndexTestCase(APITestCase):
+    """Tests for the in-memory vector index used by the suggestion search"""
+
+    def setUp(self):
+        """Create suggestions with small embeddings and start from an empty index"""
+        self.index = get_vector_index(SuggestionModel)
+        self.index.invalidate()
+        self.addCleanup(self.index.invalidate)
+
+        for i, embedding in enumerate([[0, 0, 0], [1, 0, 0], [5, 5, 5], []]):
+            SuggestionModel.objects.create(external_id=f"item{i}", name=f"Test Item {i}", embedding=embedding)
+
+    def test_vector_search_returns_nearest_first(self):
+        """Test that the search orders results by distance and skips rows without an embedding"""
+        results = vector_search(SuggestionModel, [[0.9, 0, 0]])
+        self.assertEqual([obj.external_id for obj, dist in results], ["item1", "item0", "item2"])
+        self.assertAlmostEqual(results[0][1], 0.1, places=5)
+
+    def test_vector_search_limits_to_k(self):
+        """Test that only the k closest suggestions are returned"""
+        results = vector_search(SuggestionModel, [4, 4, 4], k=2)
+        self.assertEqual([obj.external_id for obj, dist in results], ["item2", "item1"])
+
+    def test_vector_search_dimension_mismatch_returns_nothing(self):
+        """Test that a query with different dimensions does not match any row"""
+        self.assertEqual(vector_search(SuggestionModel, [1, 0]), [])
+
+    def test_index_is_patched_on_save(self):
+        """Test that saving a suggestion updates the built index without a rebuild"""
+        self.assertEqual(len(self.index), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SuggestionModel.objects.create(external_id="item4", name="Test Item 4", embedding=[10, 10, 10])
+            suggestion = SuggestionModel.objects.get(external_id="item0")
+            suggestion.embedding = [9, 9, 9]
+            suggestion.save()
+
+        results = vector_search(SuggestionModel, [10, 10, 10], k=2)
+        self.assertEqual([obj.external_id for obj, dist in results], ["item4", "item0"])
+        self.assertEqual(len(self.index), 4)
+
+    def test_index_is_patched_on_delete(self):
+        """Test that deleting a suggestion removes it from the built index"""
+        self.assertEqual(len(self.index), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SuggestionModel.objects.get(external_id="item1").delete()
+
+        self.assertEqual(len(self.index), 2)
+        results = vector_search(SuggestionModel, [1, 0, 0])
+        self.assertEqual([obj.external_id for obj, dist in results], ["item0", "item2"])
+
+
+class VectorBackendTestCase(APITestCase):
+    """Tests for the exact and approximate vector backends"""
+
+    def setUp(self):
+        """Create random vectors and queries"""
+        rng = np.random.default_rng(0)
+        self.ids = np.arange(500, dtype=np.int64)
+        self.vectors = rng.normal(size=(500, 8)).astype(np.float32)
+        self.queries = rng.normal(size=(10, 8)).astype(np.float32)
+
+    def test_ivf_backend_matches_exact_when_probing_every_list(self):
+        """Test that probing every list makes the approximate backend exact"""
+        exact, ivf = ExactBackend(), IVFFlatBackend(n_lists=10, n_probe=10)
+        exact.build(self.ids, self.vectors)
+        ivf.build(self.ids, self.vectors)
+
+        for query in self.queries:
+            self.assertEqual(ivf.query(query, 5)[0].tolist(), exact.query(query, 5)[0].tolist())
+
+    def test_ivf_backend_add_and_remove(self):
+        """Test that added vectors are found and removed ones are not"""
+        ivf = IVFFlatBackend(n_lists=10, n_probe=10)
+        ivf.build(self.ids, self.vectors)
+
+        ivf.add([1000], self.queries[:1])
+        ivf.remove([1000, 0])
+
+        self.assertEqual(len(ivf), 499)
+        self.assertNotIn(0, ivf.query(self.vectors[0], 1)[0].tolist())
+        ivf.add([0], self.vectors[:1])
+        self.assertEqual(ivf.query(self.vectors[0], 1)[0].tolist(), [0])
+
+    def test_ivf_backend_retrains_when_the_corpus_grows(self):
+        """Test that a rebuild retrains centroids trained on a much smaller corpus"""
+        ivf = IVFFlatBackend(n_probe=2)
+        ivf.add(self.ids[:1], self.vectors[:1])
+        ivf.add(self.ids[1:], self.vectors[1:])
+        self.assertEqual(len(ivf.get_state()["centroids"]), 1)
+
+        rebuilt = IVFFlatBackend(n_probe=2)
+        rebuilt.set_state(ivf.get_state())
+        rebuilt.build(*ivf.items())
+        self.assertEqual(len(rebuilt.get_state()["centroids"]), int(np.sqrt(500)))
+
+        centroids = rebuilt.get_state()["centroids"]
+        rebuilt.build(self.ids[:400], self.vectors[:400])
+        self.assertIs(rebuilt.get_state()["centroids"], centroids)
+
+    def test_exact_backend_updates_copy_on_write(self):
+        """Test that replacing a vector swaps in new arrays instead of editing those a query may be reading"""
+        exact = ExactBackend()
+        exact.build(self.ids, self.vectors)
+        _, matrix, sq_norms, _ = exact._state
+        before = matrix.copy(), sq_norms.copy()
+
+        exact.add([0, 1000], self.queries[:2])
+
+        np.testing.assert_array_equal(matrix, before[0])
+        np.testing.assert_array_equal(sq_norms, before[1])
+        self.assertEqual(exact.query(self.queries[0], 1)[0].tolist(), [0])
+        self.assertEqual(len(exact), 501)
+        self.assertAlmostEqual(float(exact._state[2][0]), float(np.dot(self.queries[0], self.queries[0])), places=4)
+
+    def test_ivf_backend_updates_copy_on_write(self):
+        """Test that adding and removing swap in new lists instead of editing those a query may be reading"""
+        ivf = IVFFlatBackend(n_lists=10, n_probe=10)
+        ivf.build(self.ids, self.vectors)
+        state = ivf._state
+        lists, where = list(state[2]), dict(state[3])
+
+        ivf.add([0, 1000], self.queries[:2])
+        ivf.remove([1])
+
+        self.assertTrue(all(a is b for a, b in zip(state[2], lists, strict=True)))  # None replaced in place
+        self.assertEqual(state[3], where)
+        self.assertEqual(ivf.query(self.queries[0], 1)[0].tolist(), [0])
+        self.assertEqual(len(ivf), 500)
+        self.assertNotIn(1, ivf._state[3])
+
+    def test_backend_round_trips_through_file(self):
+        """Test that a saved backend loads with the same contents and centroids"""
+        ivf = IVFFlatBackend(n_lists=10, n_probe=2)
+        ivf.build(self.ids, self.vectors)
+
+        with tempfile.TemporaryDirectory() as directory:
+            ivf.save(f"{directory}/index.npz")
+            loaded = IVFFlatBackend(n_lists=10, n_probe=2)
+            loaded.load(f"{directory}/index.npz")
+
+        np.testing.assert_array_equal(loaded.get_state()["centroids"], ivf.get_state()["centroids"])
+        for query in self.queries:
+            self.assertEqual(loaded.query(query, 5)[0].tolist(), ivf.query(query, 5)[0].tolist())
+
+    def test_index_loads_persisted_file(self):
+        """Test that a fresh index is loaded from the persisted file instead of the database"""
+        SuggestionModel.objects.create(external_id="item0", name="Test Item 0", embedding=[1, 0, 0])
+
+        with tempfile.TemporaryDirectory() as directory:
+            config = {"BACKEND": "pathfinder_api.vector_backends.IVFFlatBackend", "DIR": directory}
+            with override_settings(VECTOR_INDEX=config):
+                index = get_vector_index(SuggestionModel)
+                index.save()
+                SuggestionModel.objects.all().delete()
+
+                index._backend, index._use_file = None, True  # As in a freshly started worker
+                self.addCleanup(index.invalidate)
+                self.assertEqual(len(index), 1)
+
+
+class SuggestionSearchTestCase(APITestCase):
+    """Tests for the search parameters of the suggestion list view"""
+
+    def setUp(self):
+        """Create suggestions with small embeddings and start from an empty index"""
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
+        self.access = AccessToken.for_user(self.user)
+        UserProfile.objects.create(user=self.user, name="Test User")
+        get_vector_index(SuggestionModel).invalidate()
+        self.addCleanup(get_vector_index(SuggestionModel).invalidate)
+
+        rows = [([0, 0, 0], ["Club"]), ([1, 0, 0], ["Competition"]), ([3, 0, 0], ["Club"])]
+        for i, (embedding, category) in enumerate(rows):
+            SuggestionModel.objects.create(
+                external_id=f"item{i}", name=f"Test Item {i}", category=category, embedding=embedding
+            )
+
+        patcher = patch("suggestions.views.get_embedding", return_value=[[1, 0, 0]])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, **params):
+        return self.client.get(
+            "/api/suggestions/suggestions/",
+            {"query": "test", **params},
+            HTTP_AUTHORIZATION=f"Bearer {self.access}",
+        )
+
+    def test_search_returns_nearest_first(self):
+        """Test that search results are ordered by distance to the query"""
+        response = self.search()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["external_id"] for item in response.data["results"]], ["item1", "item0", "item2"])
+
+    def test_search_limits_to_k(self):
+        """Test that the k parameter limits the number of results"""
+        response = self.search(k=1)
+        self.assertEqual([item["external_id"] for item in response.data["results"]], ["item1"])
+
+    def test_search_drops_results_beyond_max_distance(self):
+        """Test that the max_distance parameter drops far away results"""
+        response = self.search(max_distance=1.5)
+        self.assertEqual([item["external_id"] for item in response.data["results"]], ["item1", "item0"])
+
+    def test_search_filters_by_category(self):
+        """Test that the category parameter pre-filters the candidates"""
+        response = self.search(category="Club")
+        self.assertEqual([item["external_id"] for item in response.data["results"]], ["item0", "item2"])
+
+    def test_search_rejects_invalid_k(self):
+        """Test that an invalid k returns 400"""
+        self.assertEqual(self.search(k="a").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search(k=0).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_counts_the_index_results(self):
+        """Test that search totals come from the index and only the page's rows are loaded"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.search(page_size=1, page=2)
+        self.assertEqual([item["external_id"] for item in response.data["results"]], ["item0"])
+        self.assertEqual(
+            (response.data["pagination"]["total_count"], response.data["pagination"]["total_pages"]), (3, 3)
+        )
+        self.assertFalse([query for query in queries if "COUNT" in query["sql"]])
+        loaded = [query["sql"] for query in queries if '"suggestions_suggestionmodel"."id" IN' in query["sql"]]
+        self.assertEqual(len(loaded), 1)
+        self.assertIn("IN (1)", loaded[0])
+
+
+class EmbeddingCacheTestCase(APITestCase):
+    """Tests for the cached, batched query embeddings"""
+
+    def setUp(self):
+        """Replace the embedding model with a fake that records its batches"""
+        embedding_cache.clear()
+        self.addCleanup(embedding_cache.clear)
+
+        self.batches = []
+
+        def embed(texts, **kwargs):
+            self.batches.append(list(texts))
+            return [np.full(3, len(text), dtype=np.float32) for text in texts]
+
+        patcher = patch("pathfinder_api.vectordb.model", new=Mock(embed=embed))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_embeddings_batches_misses(self):
+        """Test that only cache misses are embedded, in a single call"""
+        get_embedding("robotics")
+        vectors = get_embeddings(["robotics", "chess club", "debate", "chess club"])
+
+        self.assertEqual(self.batches, [["robotics"], ["chess club", "debate"]])
+        self.assertEqual([v.tolist() for v in vectors], [[8] * 3, [10] * 3, [6] * 3, [10] * 3])
+        self.assertEqual(vectors[0].dtype, np.float32)
+
+    def test_queries_are_normalized(self):
+        """Test that whitespace differences share one cache entry"""
+        get_embedding("chess  club")
+        get_embedding(" chess club\n")
+
+        self.assertEqual(self.batches, [["chess club"]])
+        self.assertEqual(embedding_cache.stats()["hits"], 1)
+        self.assertEqual(embedding_cache.stats()["misses"], 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test that the cache does not grow past its maximum size"""
+        with patch.object(embedding_cache.get(), "max_entries", 2):
+            get_embeddings(["a", "b"])
+            get_embedding("a")
+            get_embedding("c")  # Evicts "b"
+            get_embeddings(["a", "b"])
+
+        self.assertEqual(self.batches, [["a", "b"], ["c"], ["b"]])
+        self.assertEqual(embedding_cache.stats()["evictions"], 2)
+
+    def test_entries_expire(self):
+        """Test that entries are embedded again after their TTL"""
+        with patch.object(embedding_cache.get(), "ttl", 10):
+            get_embedding("a")
+            with patch("pathfinder_api.embedding_cache.time.monotonic", return_value=time.monotonic() + 11):
+                get_embedding("a")
+
+        self.assertEqual(self.batches, [["a"], ["a"]])
+
+    @override_settings(CACHES={"shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_shared_cache_is_used_across_workers(self):
+        """Test that a miss in the local cache is served by the shared cache"""
+        with patch.object(embedding_cache.get(), "shared_alias", "shared"):
+            get_embedding("a")
+            embedding_cache.get()._entries.clear()  # As seen from another worker
+            self.assertEqual(get_embedding("a").tolist(), [1, 1, 1])
+
+        self.assertEqual(self.batches, [["a"]])
+        self.assertEqual(embedding_cache.stats()["shared_hits"], 1)
+
+    def test_metrics_view_requires_admin(self):
+        """Test that cache metrics are only visible to staff"""
+        user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
+        response = self.client.get(
+            "/api/suggestions/metrics/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(
+            "/api/suggestions/metrics/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("hit_rate", response.data["embedding_cache"])
+
+
+class WarmUpTestCase(APITestCase):
+    """Tests for preloading the embedding model"""
+
+    def test_warm_up_loads_model_and_index(self):
+        """Test that warming up embeds once and loads the vector index"""
+        get_vector_index(SuggestionModel).invalidate()
+        self.addCleanup(get_vector_index(SuggestionModel).invalidate)
+        SuggestionModel.objects.create(external_id="item0", name="Test Item 0", embedding=[1, 0, 0])
+
+        fake_model = Mock(embed=Mock(return_value=[np.zeros(3)]))
+        with patch("pathfinder_api.vectordb.model", new=fake_model):
+            timings = warm_up(index_models=[SuggestionModel])
+
+        fake_model.get.assert_called_once()
+        fake_model.embed.assert_called_once_with(["warm up"])
+        self.assertEqual(set(timings), {"load_model", "first_embedding", "load_index:suggestions.suggestionmodel"})
+
+
+class SuggestionCacheEvictionTestCase(APITestCase):
+    """Tests for the expiry and eviction of cached personalized rankings"""
+
+    def setUp(self):
+        """Set up a profile with a fresh cached ranking"""
+        from suggestions.personalization import suggestion_cache_stats
+
+        self.stats = suggestion_cache_stats
+        self.stats.clear()
+        self.addCleanup(self.stats.clear)
+
+        user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
+        self.user_profile = UserProfile.objects.create(user=user, name="Test User", interests=["math"])
+        self.suggestion = SuggestionModel.objects.create(external_id=EXAMPLE_EXTERNAL_ID, name="Example Item")
+        self.cache = SuggestionsCacheModel.objects.create(
+            interests=["math"], ranking=[[self.suggestion.id, 80]], catalog_version=CatalogVersion.current()
+        )
+
+    def lookup(self):
+        """The fresh cached ranking of the profile, or None"""
+        from suggestions.personalization import alookup_ranking
+
+        entry = async_to_sync(alookup_ranking)(self.user_profile)
+        return None if entry is None or entry["stale"] else entry["ranking"]
+
+    def test_catalog_changes_make_rankings_stale(self):
+        """Test that creating, editing or deleting a suggestion invalidates cached rankings"""
+        self.assertEqual(self.lookup(), [[self.suggestion.id, 80]])
+
+        version = CatalogVersion.current()
+        self.suggestion.name = "Renamed Item"
+        self.suggestion.save()
+        self.assertEqual(CatalogVersion.current(), version + 1)
+        self.assertIsNone(self.lookup())
+
+        SuggestionsCacheModel.objects.update(catalog_version=CatalogVersion.current())
+        SuggestionModel.objects.create(external_id="new", name="New Item").delete()
+        self.assertIsNone(self.lookup())
+        self.assertEqual((self.stats.hits, self.stats.stale, self.stats.misses), (1, 2, 0))
+
+    @override_settings(SUGGESTION_CACHE={"MAX_ENTRIES": 10, "TTL": 60, "TOUCH_INTERVAL": 30})
+    def test_expired_rankings_are_stale_and_hits_touch_rows(self):
+        """Test that old rankings expire and hits refresh the last hit time sparingly"""
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        SuggestionsCacheModel.objects.update(last_hit_at=an_hour_ago)
+        self.assertIsNotNone(self.lookup())
+        self.cache.refresh_from_db()
+        self.assertGreater(self.cache.last_hit_at, an_hour_ago)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.lookup()
+        self.assertEqual(len(queries), 1)  # Touched recently, so the hit does not write
+
+        SuggestionsCacheModel.objects.update(created_at=an_hour_ago)
+        self.assertIsNone(self.lookup())
+
+    def test_prune_suggestion_cache(self):
+        """Test that pruning drops outdated rows and then the least recently hit ones"""
+        now = timezone.now()
+        for i in range(4):
+            SuggestionsCacheModel.objects.create(
+                interests=[f"interest {i}"],
+                catalog_version=CatalogVersion.current(),
+                last_hit_at=now - timedelta(minutes=i + 1),
+            )
+        SuggestionsCacheModel.objects.create(interests=["outdated"], catalog_version=CatalogVersion.current() - 1)
+
+        call_command("prune_suggestion_cache", max_entries=3, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(SuggestionsCacheModel.objects.values_list("interests", flat=True)),
+            [["interest 0"], ["interest 1"], ["math"]],
+        )
+
+    @override_settings(SUGGESTION_CACHE={"MAX_ENTRIES": 2, "TTL": 60, "TOUCH_INTERVAL": 30})
+    def test_new_rankings_evict_the_least_recently_hit(self):
+        """Test that caching a new ranking keeps the table within MAX_ENTRIES"""
+        from suggestions.personalization import add_suggestion_cache_sync
+
+        SuggestionsCacheModel.objects.update(last_hit_at=timezone.now() - timedelta(hours=1))
+        SuggestionsCacheModel.objects.create(interests=["recent"], catalog_version=CatalogVersion.current())
+        self.user_profile.interests = ["newest"]
+        add_suggestion_cache_sync(self.user_profile, [(self.suggestion.id, 50)], CatalogVersion.current())
+
+        self.assertEqual(
+            sorted(SuggestionsCacheModel.objects.values_list("interests", flat=True)), [["newest"], ["recent"]]
+        )
+
+    def test_metrics_include_suggestion_cache(self):
+        """Test that the metrics endpoint reports the ranking cache size and hit rate"""
+        self.lookup()
+        admin = User.objects.create_user(username="admin", password="testpassword123", is_staff=True)
+        response = self.client.get(
+            "/api/suggestions/metrics/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(admin)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["suggestion_cache"]["size"], 1)
+        self.assertEqual(response.data["suggestion_cache"]["hit_rate"], 1.0)
+
+
+INLINE_RANKING = {
+    "BACKGROUND": False,
+    "WORKERS": 1,
+    "BACKEND": "suggestions.rankers.OpenAIRanker",
+    "OPTIONS": {},
+    "FALLBACK_BACKEND": "suggestions.rankers.LocalRanker",
+    "MODEL": "test",
+    "TIMEOUT": 1,
+    "CANDIDATES": 100,
+    "LEASE": 60,
+    "WAIT": 0,
+}
+
+
+@override_settings(SUGGESTION_RANKING=INLINE_RANKING)
+class PersonalizedRankingTestCase(APITestCase):
+    """Tests for the fallback and background refresh of personalized rankings"""
+
+    def setUp(self):
+        """Set up a profile with an empty ranking cache and a few rated suggestions"""
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
+        self.access = AccessToken.for_user(self.user)
+        self.user_profile = UserProfile.objects.create(user=self.user, name="Test User")
+        self.low = SuggestionModel.objects.create(external_id="low", name="A Low Rated Item")
+        self.high = SuggestionModel.objects.create(external_id="high", name="B High Rated Item")
+        UserRating.objects.create(user=self.user_profile, suggestion=self.low, rating=2)
+        UserRating.objects.create(user=self.user_profile, suggestion=self.high, rating=5)
+
+    def personalized(self, **headers):
+        return self.client.get(
+            "/api/suggestions/personalized-suggestions/", HTTP_AUTHORIZATION=f"Bearer {self.access}", **headers
+        )
+
+    def test_miss_serves_the_fallback_while_ranking(self):
+        """Test that a cache miss answers from the fallback ranking without waiting for the LLM"""
+        with (
+            override_settings(SUGGESTION_RANKING={**INLINE_RANKING, "BACKGROUND": True}),
+            patch("suggestions.views.schedule_refresh", return_value=Future()) as schedule_refresh,
+        ):
+            response = self.personalized()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ranking"], {"source": "fallback", "refreshing": True})
+        self.assertEqual([item["external_id"] for item in response.data["results"]], ["high", "low"])
+        self.assertEqual(SuggestionsCacheModel.objects.get().source, SuggestionsCacheModel.Source.FALLBACK)
+        schedule_refresh.assert_called_once()
+
+    def test_llm_ranking_replaces_the_fallback(self):
+        """Test that the finished LLM ranking is cached and served"""
+        scored = [{"external_id": "low", "score": 90}]
+        with patch.object(OpenAIRanker, "arank", return_value=scored) as rank:
+            response = self.personalized()
+            self.assertEqual(response.data["ranking"], {"source": "llm", "refreshing": False})
+            self.assertEqual([item["external_id"] for item in response.data["results"]], ["low", "high"])
+
+            self.personalized()
+        rank.assert_called_once()  # The second request is a plain cache hit
+
+    def test_slow_llm_falls_back_to_the_local_ranker(self):
+        """Test that an LLM timeout stores the local ranking as a fallback, to be refreshed later"""
+        self.user_profile.interests = ["low rated"]
+        self.user_profile.save()
+        with (
+            patch.object(OpenAIRanker, "arank", side_effect=TimeoutError) as rank,
+            self.assertLogs("suggestions.personalization", "WARNING"),
+        ):
+            response = self.personalized()
+            self.personalized()
+        self.assertEqual(response.data["ranking"]["source"], "fallback")
+        self.assertEqual(response.data["results"][0]["external_id"], "low")
+        self.assertEqual(SuggestionsCacheModel.objects.get().ranking[0], [self.low.id, 50.0])
+        rank.assert_called_once()  # The lease is kept as a cooldown before the next attempt
+        self.assertIsNotNone(SuggestionsCacheModel.objects.get().refreshing_until)
+
+    def test_failed_refresh_keeps_serving_the_fallback(self):
+        """Test that a ranker error without a fallback ranker leaves the fallback ranking in place"""
+        with (
+            override_settings(SUGGESTION_RANKING={**INLINE_RANKING, "FALLBACK_BACKEND": None}),
+            patch.object(OpenAIRanker, "arank", side_effect=TimeoutError) as rank,
+            self.assertLogs("suggestions.personalization", "ERROR"),
+        ):
+            response = self.personalized()
+            self.assertEqual(self.personalized().data["ranking"], {"source": "fallback", "refreshing": True})
+            rank.assert_called_once()
+
+            SuggestionsCacheModel.objects.update(refreshing_until=timezone.now() - timedelta(seconds=1))
+            self.personalized()
+            self.assertEqual(rank.call_count, 2)  # Retried once the lease ran out
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ranking"]["source"], "fallback")
+
+    def test_stale_ranking_is_refreshed(self):
+        """Test that an outdated ranking is recomputed once the catalog changes"""
+        with patch.object(OpenAIRanker, "arank", return_value=[]):
+            self.personalized()
+        SuggestionModel.objects.create(external_id="new", name="C New Item")
+
+        with patch.object(OpenAIRanker, "arank", return_value=[{"external_id": "new", "score": 99}]):
+            response = self.personalized()
+        self.assertEqual(response.data["results"][0]["external_id"], "new")
+        self.assertEqual(SuggestionsCacheModel.objects.get().catalog_version, CatalogVersion.current())
+
+    def test_unchanged_ranking_returns_not_modified(self):
+        """Test that polling with the ETag of the current ranking returns 304"""
+        with patch.object(OpenAIRanker, "arank", return_value=[]):
+            etag = self.personalized()["ETag"]
+            response = self.personalized(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+    def test_saves_and_ratings_change_the_etag(self):
+        """Test that a conditional request sees the user's new saves and the live ratings"""
+        with patch.object(OpenAIRanker, "arank", return_value=[]):
+            etag = self.personalized()["ETag"]
+            SavedItem.objects.create(user=self.user_profile, suggestion=self.low)
+            response = self.personalized(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            etag = response["ETag"]
+            other = UserProfile.objects.create(user=User.objects.create_user(username="other"), name="Other")
+            UserRating.objects.create(user=other, suggestion=self.high, rating=1)
+            response = self.personalized(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response["ETag"], etag)
+            self.assertEqual(self.personalized(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_identical_profiles_share_one_refresh(self):
+        """Test that concurrent requests for the same answers start a single LLM ranking"""
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpassword123")
+        UserProfile.objects.create(user=other, name="Other User")
+        self.addCleanup(personalization._refreshes.clear)
+
+        def submit(coroutine):
+            coroutine.close()  # Never run, only the refreshes started are counted
+            return Future()
+
+        loop = Mock(submit=Mock(side_effect=submit))
+        with (
+            override_settings(SUGGESTION_RANKING={**INLINE_RANKING, "BACKGROUND": True}),
+            patch("suggestions.personalization.ranking_loop", new=loop),
+        ):
+            first = self.personalized()
+            second = self.client.get(
+                "/api/suggestions/personalized-suggestions/",
+                HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(other)}",
+            )
+
+        loop.submit.assert_called_once()
+        self.assertEqual(first.data["ranking"], {"source": "fallback", "refreshing": True})
+        self.assertEqual(second.data["ranking"], {"source": "fallback", "refreshing": True})
+
+    def test_refresh_lease_is_shared_across_workers(self):
+        """Test that a lease held by another worker defers the ranking until it expires"""
+        fingerprint = SuggestionsCacheModel.fingerprint_for(self.user_profile)
+        SuggestionsCacheModel.objects.create(
+            source=SuggestionsCacheModel.Source.FALLBACK,
+            catalog_version=CatalogVersion.current(),
+            refreshing_until=timezone.now() + timedelta(seconds=30),
+        )
+        self.assertFalse(personalization.claim_refresh(fingerprint))
+
+        with patch.object(OpenAIRanker, "arank", return_value=[]) as rank:
+            response = self.personalized()
+            rank.assert_not_called()
+            self.assertEqual(response.data["ranking"], {"source": "fallback", "refreshing": True})
+
+            SuggestionsCacheModel.objects.update(refreshing_until=timezone.now() - timedelta(seconds=1))
+            response = self.personalized()
+            rank.assert_called_once()
+        self.assertEqual(response.data["ranking"], {"source": "llm", "refreshing": False})
+        self.assertIsNone(SuggestionsCacheModel.objects.get().refreshing_until)
+
+    def test_concurrent_cold_misses_claim_one_refresh(self):
+        """Test that a second worker's fallback store keeps the first worker's lease and ranking"""
+        fingerprint = SuggestionsCacheModel.fingerprint_for(self.user_profile)
+        # Both workers found no cache row, worker A stores its fallback and claims the refresh first
+        personalization.store_fallback_ranking(self.user_profile)
+        self.assertTrue(personalization.claim_refresh(fingerprint))
+        SuggestionsCacheModel.objects.update(ranking=[[self.low.id, 90]], source=SuggestionsCacheModel.Source.LLM)
+
+        entry = personalization.store_fallback_ranking(self.user_profile)  # Worker B
+        self.assertFalse(personalization.claim_refresh(fingerprint))
+        self.assertEqual(entry["source"], SuggestionsCacheModel.Source.LLM)
+        row = SuggestionsCacheModel.objects.get()
+        self.assertEqual(row.ranking, [[self.low.id, 90]])
+        self.assertIsNotNone(row.refreshing_until)
+
+    def test_llm_reranks_only_the_nearest_candidates(self):
+        """Test that only the top candidates by embedding distance are sent to the LLM, trimmed"""
+        self.user_profile.interests = ["robots"]
+        self.user_profile.save()
+        for suggestion, embedding in ((self.low, [1, 0, 0]), (self.high, [0, 1, 0])):
+            suggestion.embedding = embedding
+            suggestion.save()
+        near = SuggestionModel.objects.create(external_id="near", name="C Near Item", embedding=[0.9, 0.1, 0])
+        get_vector_index(SuggestionModel).invalidate()
+        self.addCleanup(get_vector_index(SuggestionModel).invalidate)
+
+        with (
+            override_settings(SUGGESTION_RANKING={**INLINE_RANKING, "CANDIDATES": 2}),
+            patch("suggestions.personalization.get_embedding", return_value=np.array([1, 0, 0], dtype=np.float32)),
+            patch.object(OpenAIRanker, "arank", return_value=[{"external_id": "near", "score": 95}]) as rank,
+        ):
+            response = self.personalized()
+
+        candidates = rank.call_args.args[1]
+        self.assertEqual([candidate["external_id"] for candidate in candidates], ["low", "near"])
+        self.assertEqual(set(candidates[0]), {"id", *personalization.PROMPT_FIELDS})
+        self.assertEqual(
+            SuggestionsCacheModel.objects.get().ranking, [[near.id, 95], [self.low.id, 0], [self.high.id, 0]]
+        )
+        self.assertEqual(response.data["ranking"]["source"], "llm")
+
+
+class RankerTestCase(APITestCase):
+    """Tests for the offline ranking providers"""
+
+    def setUp(self):
+        """Set up a profile and ranking candidates"""
+        user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword123")
+        self.user_profile = UserProfile.objects.create(
+            user=user, name="Test User", interests=["robotics"], goals=["win a math competition"]
+        )
+        self.candidates = [
+            {"id": 1, "external_id": "art", "name": "Art Club", "tags": ["painting"], "category": ["Club"]},
+            {"id": 2, "external_id": "math", "name": "Math Olympiad", "tags": ["math"], "category": ["Competition"]},
+            {"id": 3, "external_id": "robots", "name": "Robotics", "tags": ["robotics"], "category": ["Competition"]},
+        ]
+
+    def test_local_ranker_scores_word_overlap(self):
+        """Test that the local ranker orders candidates by the profile words they cover"""
+        scored = LocalRanker(top=2).rank(self.user_profile, self.candidates, timeout=1)
+        self.assertEqual(scored, [{"external_id": "math", "score": 25.0}, {"external_id": "robots", "score": 25.0}])
+
+        scored = LocalRanker(overlap_weight=1.0).rank(self.user_profile, self.candidates, timeout=1)
+        self.assertEqual([item["external_id"] for item in scored], ["math", "robots", "art"])
+        self.assertEqual(scored[0]["score"], 50.0)
+
+    def test_local_ranker_blends_embedding_similarity(self):
+        """Test that the local ranker adds the cosine similarity of the candidate embeddings"""
+        for candidate, embedding in zip(self.candidates, ([0, 1, 0], [0.6, 0.8, 0], [1, 0, 0])):
+            SuggestionModel.objects.create(
+                id=candidate["id"], external_id=candidate["external_id"], name=candidate["name"], embedding=embedding
+            )
+        get_vector_index(SuggestionModel).invalidate()
+        self.addCleanup(get_vector_index(SuggestionModel).invalidate)
+
+        with patch("suggestions.rankers.get_embedding", return_value=np.array([1, 0, 0], dtype=np.float32)):
+            scored = LocalRanker().rank(self.user_profile, self.candidates, timeout=1)
+        self.assertEqual(
+            scored,
+            [
+                {"external_id": "robots", "score": 75.0},
+                {"external_id": "math", "score": 55.0},
+                {"external_id": "art", "score": 0.0},
+            ],
+        )
+
+    def test_openai_ranker_awaits_the_async_client(self):
+        """Test that the async ranking path awaits the LLM client instead of blocking on it"""
+        content = '{"suggestions": [{"external_id": "robots", "score": 90}]}'
+        completion = Mock(choices=[Mock(message=Mock(content=content))])
+        client = Mock(achat=AsyncMock(return_value=completion))
+
+        with patch("suggestions.rankers.llm_client", new=client):
+            scored = async_to_sync(OpenAIRanker(model="test").arank)(self.user_profile, self.candidates, timeout=1)
+
+        self.assertEqual(scored, [{"external_id": "robots", "score": 90}])
+        self.assertEqual(client.achat.await_args.kwargs["timeout"], 1)
+        client.chat.assert_not_called()
+
+    def test_replay_ranker_answers_recorded_rankings(self):
+        """Test that rankings recorded by the OpenAI ranker are replayed for the same profile"""
+        with tempfile.NamedTemporaryFile(suffix=".jsonl", delete=False) as f:
+            path = f.name
+        self.addCleanup(os.remove, path)
+        content = '{"suggestions": [{"external_id": "robots", "score": 90}]}'
+        completion = Mock(choices=[Mock(message=Mock(content=content))])
+
+        with patch.object(OpenAIRanker, "complete", return_value=completion):
+            recorded = OpenAIRanker(model="test", record_to=path).rank(self.user_profile, self.candidates, timeout=1)
+
+        replay = ReplayRanker(path)
+        self.assertEqual(replay.rank(self.user_profile, self.candidates, timeout=1), recorded)
+        self.user_profile.interests = ["painting"]
+        self.assertEqual(replay.rank(self.user_profile, self.candidates, timeout=1), [])
+
+
+STUB_COMPLETION = {
+    "id": "stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "test",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{}"}}],
+}
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat completions with the queued ``(status, delay)`` responses, then with 200s"""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is observable
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.ports.append(self.client_address[1])
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            status_code, delay = server.responses.pop(0) if server.responses else (200, 0)
+        time.sleep(delay)
+        body = json.dumps(STUB_COMPLETION if status_code == 200 else {"error": {"message": "stub"}}).encode()
+        try:
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except ConnectionError:
+            pass  # The client gave up waiting
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class LLMClientTestCase(APITestCase):
+    """Tests for the shared OpenAI client against a local stub server"""
+
+    def setUp(self):
+        """Start a stub OpenAI server and a client pointed at it"""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+        self.server.lock, self.server.responses, self.server.ports = threading.Lock(), [], []
+        self.server.active = self.server.max_active = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        llm_stats.clear()
+        self.addCleanup(llm_stats.clear)
+        patcher = patch.dict(os.environ, {"OPENAI_API_KEY": "test"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_client(self, **config):
+        client = LLMClient(
+            {
+                "BASE_URL": f"http://127.0.0.1:{self.server.server_port}/v1",
+                "MAX_CONNECTIONS": 4,
+                "MAX_CONCURRENCY": 4,
+                "CONNECT_TIMEOUT": 1.0,
+                "READ_TIMEOUT": 5.0,
+                "MAX_RETRIES": 2,
+                "BACKOFF_BASE": 0.01,
+                "BACKOFF_MAX": 0.05,
+                **config,
+            }
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def chat(self, client, **kwargs):
+        return client.chat(model="test", messages=[{"role": "user", "content": "hi"}], **kwargs)
+
+    def test_rate_limits_and_server_errors_are_retried(self):
+        """Test that 429 and 5xx answers are retried until a completion arrives"""
+        self.server.responses = [(429, 0), (503, 0)]
+        completion = self.chat(self.make_client())
+        self.assertEqual(completion.choices[0].message.content, "{}")
+        self.assertEqual(llm_stats.stats(), {"requests": 3, "retries": 2, "failures": 0, "in_flight": 0})
+
+    def test_client_errors_and_exhausted_retries_raise(self):
+        """Test that 4xx answers fail at once and retries stop after MAX_RETRIES"""
+        client = self.make_client()
+        self.server.responses = [(400, 0)]
+        with self.assertRaises(openai.BadRequestError):
+            self.chat(client)
+        self.server.responses = [(500, 0)] * 3
+        with self.assertRaises(openai.InternalServerError):
+            self.chat(client)
+        self.assertEqual(llm_stats.stats(), {"requests": 4, "retries": 2, "failures": 2, "in_flight": 0})
+
+    def test_timeout_bounds_the_whole_call(self):
+        """Test that a slow upstream fails within the caller's timeout"""
+        self.server.responses = [(200, 1)]
+        start = time.monotonic()
+        with self.assertRaises(openai.APITimeoutError):
+            self.chat(self.make_client(MAX_RETRIES=0), timeout=0.2)
+        self.assertLess(time.monotonic() - start, 0.9)
+
+    def test_connections_are_reused_and_concurrency_is_capped(self):
+        """Test that calls share keep-alive connections and at most MAX_CONCURRENCY run at once"""
+        client = self.make_client(MAX_CONCURRENCY=1)
+        self.chat(client)
+        self.chat(client)
+        self.assertEqual(len(set(self.server.ports)), 1)
+
+        self.server.responses = [(200, 0.1)] * 3
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda _: self.chat(client), range(3)))
+        self.assertEqual(self.server.max_active, 1)
+
+
+def classification(interest_area):
+    content = {"classification": {"interest_area": interest_area, "activity_type": "Club", "skill_focus": []}}
+    return Mock(choices=[Mock(message=Mock(content=json.dumps(content)))])
+
+
+class AddMissingTagsTestCase(APITestCase):
+    """Tests for the add_missing_tags command"""
+
+    def setUp(self):
+        """Set up untagged activities and a checkpoint file in a temporary directory"""
+        for i in range(5):
+            SuggestionModel.objects.create(external_id=f"activity-{i}", name=f"Activity {i}")
+        SuggestionModel.objects.create(external_id="tagged", name="Tagged", tags=["Robotics"])
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, "checkpoint")
+
+        async def achat(**kwargs):
+            name = json.loads(kwargs["messages"][1]["content"])["name"]
+            if name == "Activity 3":
+                raise openai.APIConnectionError(request=Mock())
+            return classification(name)
+
+        # Replaced outright, probing the lazy singleton would build a real client
+        self.llm_client = Mock(achat=Mock(side_effect=achat))
+        patcher = patch("suggestions.management.commands.add_missing_tags.llm_client", self.llm_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tag(self, **kwargs):
+        stdout = StringIO()
+        call_command("add_missing_tags", checkpoint=self.checkpoint, batch_size=2, stdout=stdout, **kwargs)
+        return stdout.getvalue()
+
+    def test_only_missing_tags_untagged_activities_in_batches(self):
+        """Test that only untagged activities are classified and failed rows keep their tags"""
+        version = CatalogVersion.current()
+        output = self.tag(only_missing=True)
+
+        self.assertEqual(self.llm_client.achat.call_count, 5)
+        self.assertEqual(SuggestionModel.objects.get(name="Activity 0").tags, ["Activity 0", "Club"])
+        self.assertEqual(SuggestionModel.objects.get(name="Activity 3").tags, [])
+        self.assertEqual(SuggestionModel.objects.get(name="Tagged").tags, ["Robotics"])
+        self.assertIn("Tagged 4 activities (1 failed)", output)
+        self.assertIn("rows/sec", output)
+        self.assertGreater(CatalogVersion.current(), version)
+
+    def test_checkpoint_stops_before_the_first_failure(self):
+        """Test that a resumed run retries failed activities and a clean run removes the checkpoint"""
+        output = self.tag()
+        self.assertIn("Run again to retry the failed activities", output)
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["last_id"], SuggestionModel.objects.get(name="Activity 2").id)
+
+        async def achat(**kwargs):
+            return classification("Retried")
+
+        self.llm_client.achat.side_effect = achat
+        self.tag()
+        self.assertEqual(self.llm_client.achat.call_count, 6 + 3)
+        self.assertEqual(SuggestionModel.objects.get(name="Activity 3").tags, ["Retried", "Club"])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_invalid_options_are_rejected(self):
+        """Test that a concurrency or batch size below 1 is an error"""
+        for options in ({"concurrency": 0}, {"batch_size": 0}):
+            with self.subTest(options), self.assertRaises(CommandError):
+                call_command("add_missing_tags", checkpoint=self.checkpoint, **options)
+        self.llm_client.achat.assert_not_called()
+
+    def test_resumes_after_the_checkpoint(self):
+        """Test that an unfinished run is resumed after its last written activity, unless restarted"""
+        last_id = SuggestionModel.objects.get(name="Activity 2").id
+        with open(self.checkpoint, "w") as f:
+            json.dump({"last_id": last_id}, f)
+
+        output = self.tag()
+        self.assertIn(f"Resuming after activity {last_id}", output)
+        self.assertEqual(self.llm_client.achat.call_count, 3)
+        self.assertEqual(SuggestionModel.objects.get(name="Activity 2").tags, [])
+
+        with open(self.checkpoint, "w") as f:
+            json.dump({"last_id": last_id}, f)
+        self.tag(restart=True)
+        self.assertEqual(self.llm_client.achat.call_count, 9)
+
+
+class SyncSheetTestCase(APITestCase):
+    """Tests for the diff-based sync_sheet command"""
+
+    def setUp(self):
+        """Replace the sheet with a local file and the embedding model with a fake"""
+        embedding_cache.clear()
+        self.addCleanup(embedding_cache.clear)
+        get_vector_index(SuggestionModel).invalidate()
+        self.addCleanup(get_vector_index(SuggestionModel).invalidate)
+
+        self.batches = []
+
+        def embed(texts, **kwargs):
+            self.batches.append(list(texts))
+            return [np.full(3, len(text), dtype=np.float32) for text in texts]
+
+        patcher = patch("pathfinder_api.vectordb.model", new=Mock(embed=embed))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.rows = [
+            {"external_id": f"activity-{i}", "name": f"Activity {i}", "category": "STEM, Club", "description": "Fun"}
+            for i in range(3)
+        ]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def sync(self, **kwargs):
+        if "csv_url" not in kwargs and "source" not in kwargs:
+            kwargs["source"] = os.path.join(self.directory, "sheet.json")
+            with open(kwargs["source"], "w") as f:
+                json.dump(self.rows, f)
+        stdout = StringIO()
+        call_command("sync_sheet", stdout=stdout, **kwargs)
+        return stdout.getvalue()
+
+    def test_new_rows_are_embedded_in_one_batch(self):
+        """Test that new rows are inserted with their embeddings from a single model call, uncached"""
+        version = CatalogVersion.current()
+        output = self.sync()
+
+        self.assertIn("3 inserted, 0 updated, 0 restored, 0 unchanged, 0 deleted", output)
+        self.assertIn("rows/sec", output)
+        self.assertEqual(len(self.batches), 1)
+        suggestion = SuggestionModel.objects.only("category", "embedding").get(external_id="activity-0")
+        self.assertEqual(suggestion.category, ["STEM", "Club"])
+        self.assertEqual(suggestion.embedding.tolist(), [14] * 3)
+        self.assertGreater(CatalogVersion.current(), version)
+        self.assertEqual(embedding_cache.stats()["size"], 0)  # Catalog texts bypass the query cache
+
+    def test_unchanged_rows_are_skipped(self):
+        """Test that re-syncing an unchanged sheet takes one query and no embeddings"""
+        self.sync()
+
+        with self.assertNumQueries(1):
+            output = self.sync()
+        self.assertIn("0 inserted, 0 updated, 0 restored, 3 unchanged", output)
+        self.assertEqual(len(self.batches), 1)
+
+    def test_changed_rows_are_updated(self):
+        """Test that only new and edited rows are written and re-embedded"""
+        self.sync()
+        created_at = SuggestionModel.objects.get(external_id="activity-2").created_at
+        self.rows[0]["description"] = "Even more fun"
+        self.rows.append({"external_id": "activity-3", "name": "Activity 3", "category": "Arts", "description": ""})
+        self.rows.pop(2)
+
+        output = self.sync()
+        self.assertIn("1 inserted, 1 updated, 0 restored, 1 unchanged, 1 deleted", output)
+        self.assertEqual(self.batches[1], ["Activity 3", "Activity 0 Even more fun"])
+        self.assertEqual(SuggestionModel.objects.get(external_id="activity-0").description, "Even more fun")
+        self.assertEqual(SuggestionModel.objects.get(external_id="activity-2").created_at, created_at)
+        self.assertEqual(SuggestionModel.objects.count(), 4)
+
+    def test_removed_rows_are_soft_deleted(self):
+        """Test that rows gone from the sheet are deactivated, hidden and restored when they return, unembedded"""
+        self.sync()
+        removed = self.rows.pop(0)
+        output = self.sync()
+
+        self.assertIn("0 inserted, 0 updated, 0 restored, 2 unchanged, 1 deleted", output)
+        self.assertEqual(len(self.batches), 1)
+        suggestion = SuggestionModel.objects.get(external_id="activity-0")
+        self.assertFalse(suggestion.is_active)
+        self.assertNotIn(suggestion.id, get_vector_index(SuggestionModel).search(np.full(3, 14))[0].tolist())
+        self.client.force_authenticate(User.objects.create_user(username="testuser", password="testpassword123"))
+        response = self.client.get("/api/suggestions/suggestions/")
+        self.assertEqual([item["external_id"] for item in response.data["results"]], ["activity-1", "activity-2"])
+        response = self.client.get("/api/suggestions/suggestions/activity-0/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.rows.append(removed)
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self.sync()
+        self.assertIn("0 inserted, 0 updated, 1 restored, 2 unchanged, 0 deleted", output)
+        self.assertEqual(len(self.batches), 1)
+        self.assertTrue(SuggestionModel.objects.get(external_id="activity-0").is_active)
+        self.assertIn(suggestion.id, get_vector_index(SuggestionModel).search(np.full(3, 14))[0].tolist())
+
+    def test_dry_run_writes_nothing(self):
+        """Test that a dry run prints the diff without touching the catalog"""
+        self.sync()
+        self.rows[0]["name"] = "Renamed"
+        self.rows.pop(1)
+        output = self.sync(dry_run=True)
+
+        self.assertIn("~ activity-0\n- activity-1\n", output)
+        self.assertIn("Would sync 2: 0 inserted, 1 updated, 0 restored, 1 unchanged, 1 deleted", output)
+        self.assertEqual(SuggestionModel.objects.get(external_id="activity-0").name, "Activity 0")
+        self.assertEqual(SuggestionModel.objects.active().count(), 3)
+
+    def test_empty_sheet_is_refused(self):
+        """Test that a sheet without valid rows does not deactivate the catalog"""
+        self.sync()
+        self.rows = []
+        with self.assertRaises(CommandError):
+            self.sync()
+        self.assertEqual(SuggestionModel.objects.active().count(), 3)
+
+    def test_rows_are_synced_in_chunks(self):
+        """Test that each chunk is embedded and written on its own and duplicates keep the last row"""
+        self.rows.append({**self.rows[0], "description": "Duplicate"})
+        output = self.sync(chunk_size=2)
+
+        self.assertIn("Synced 3: 3 inserted, 1 updated, 0 restored, 0 unchanged, 0 deleted", output)
+        self.assertEqual(len(self.batches), 2)
+        self.assertEqual(SuggestionModel.objects.get(external_id="activity-0").description, "Duplicate")
+
+    def test_file_formats_yield_the_same_rows(self):
+        """Test that JSON, NDJSON and CSV files are read as the same rows"""
+        paths = {name: os.path.join(self.directory, name) for name in ("sheet.json", "sheet.ndjson", "sheet.csv")}
+        with open(paths["sheet.json"], "w") as f:
+            json.dump(self.rows, f, indent=2)
+        with open(paths["sheet.ndjson"], "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in self.rows)
+        with open(paths["sheet.csv"], "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.rows[0])
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+        for name, path in paths.items():
+            with self.subTest(name):
+                self.assertEqual(list(open_source(path).rows()), self.rows)
+
+    def test_null_and_numeric_cells_are_read_as_text(self):
+        """Test that null and numeric cells of a JSON source are synced as strings"""
+        self.rows[0]["description"] = None
+        self.rows[1]["name"] = 42
+        path = os.path.join(self.directory, "sheet.ndjson")
+        with open(path, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in self.rows)
+
+        output = self.sync(source=path)
+        self.assertIn("3 inserted", output)
+        self.assertEqual(SuggestionModel.objects.get(external_id="activity-0").description, "")
+        self.assertEqual(SuggestionModel.objects.get(external_id="activity-1").name, "42")
+
+    def test_json_arrays_are_decoded_incrementally(self):
+        """Test that rows split across chunks are decoded and truncated arrays are rejected"""
+        text = json.dumps(self.rows)
+        chunks = [text[i : i + 7] for i in range(0, len(text), 7)]
+        self.assertEqual(list(iter_json_array(chunks)), self.rows)
+        with self.assertRaises(ValueError):
+            list(iter_json_array(chunks[:-2]))
+
+    def test_http_source_is_streamed(self):
+        """Test that the sheet URL is downloaded as a stream and read as JSON by default"""
+        text = json.dumps(self.rows)
+        response = MagicMock(encoding=None)
+        response.__enter__.return_value = response
+        response.iter_content.return_value = iter([text[:20], text[20:]])
+
+        with patch("suggestions.sources.requests.get", return_value=response) as get:
+            output = self.sync(csv_url="https://example.com/sheet")
+
+        get.assert_called_once_with("https://example.com/sheet", stream=True, timeout=30)
+        self.assertIn("3 inserted", output)
+
+    def test_http_csv_keeps_multiline_cells(self):
+        """Test that a quoted multi-line cell of a CSV URL is read as in a local file"""
+        self.rows[0]["description"] = "First line\nSecond line"
+        path = os.path.join(self.directory, "sheet.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.rows[0])
+            writer.writeheader()
+            writer.writerows(self.rows)
+        with open(path, "rb") as f:
+            response = MagicMock(encoding="utf-8", raw=BytesIO(f.read()))
+        response.__enter__.return_value = response
+
+        with patch("suggestions.sources.requests.get", return_value=response):
+            rows = list(open_source("https://example.com/sheet.csv").rows())
+
+        self.assertEqual(rows, self.rows)
+        self.assertEqual(rows, list(open_source(path).rows()))
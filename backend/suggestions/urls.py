@@ -4,6 +4,7 @@ from . import views
 
 urlpatterns = [
     path("health/", views.HealthCheckView.as_view(), name="health_check"),
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
     path(
         "suggestions/",
         views.SuggestionListView.as_view(),
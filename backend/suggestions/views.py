@@ -1,28 +1,203 @@
+import base64
+import binascii
+import hashlib
 import json
-import os
 
 import rest_framework.exceptions as errors
+from adrf.views import APIView as AsyncAPIView
 from asgiref.sync import sync_to_async
-from openai import AsyncOpenAI
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from django.core.paginator import Paginator
-
-from accounts.models import UserProfile
-from pathfinder_api.vectordb import get_embedding, vector_search
-from suggestions.models import SuggestionModel, SuggestionsCacheModel
-from suggestions.reco_schema import RANKING_SCHEMA, SYSTEM_RULES
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Q
+
+from accounts.models import SavedItem, UserProfile
+from pathfinder_api.llm import llm_stats
+from pathfinder_api.vectordb import embedding_cache, get_embedding, nearest_ids
+from suggestions.models import CatalogVersion, SuggestionModel, SuggestionsCacheModel
+from suggestions.personalization import (
+    alookup_ranking,
+    await_refresh,
+    schedule_refresh,
+    store_fallback_ranking,
+    suggestion_cache_stats,
+)
 from suggestions.serializers import SuggestionSerializer
 
+DEFAULT_SEARCH_RESULTS = 50
+MAX_SEARCH_RESULTS = 1000
+
+
+# Catalog orderings of the active suggestions, served by the partial active_suggestion_*_idx indexes.
+# The trailing id makes every key unique, which keyset pagination relies on.
+SORT_ORDERS = {
+    "name": ("name", "id"),
+    "rating": ("-rating_average", "-rating_count", "name", "id"),
+}
+# The columns SuggestionSerializer reads, the listings load nothing else
+LIST_COLUMNS = [field.source for field in SuggestionSerializer().fields.values()]
+
+
+# Filtered listing counts of this worker, keyed by catalog version so any write invalidates them
+FILTERED_COUNTS_MAX_ENTRIES = 1024
+_filtered_counts = {}
+
+
+def search_suggestions(query, k=DEFAULT_SEARCH_RESULTS, max_distance=None, queryset=None):
+    """Ids of the suggestions nearest to ``query``, nearest first, straight from the vector index.
+
+    Only the rows of the page being served are loaded afterwards, and the number of results is
+    the length of this list rather than a count of loaded objects.
+    """
+    ids, _ = nearest_ids(SuggestionModel, get_embedding(query), k, max_distance, queryset)
+    return ids
+
+
+async def catalog_count(queryset, category=None, tags=None):
+    """Number of active suggestions matching the filters, without counting the catalog.
+
+    The unfiltered count is kept up to date by ``CatalogVersion.bump``, and filtered ones are
+    counted once per catalog version.
+    """
+    row = (
+        await CatalogVersion.objects.filter(pk=CatalogVersion.SINGLETON_ID)
+        .values_list("version", "suggestion_count")
+        .afirst()
+    )
+    if row is None:  # Never bumped, the catalog was loaded without signals
+        return await queryset.acount()
+
+    version, count = row
+    if not category and not tags:
+        return count
+
+    key = (version, tuple(sorted(category or [])), tuple(sorted(tags or [])))
+    if key not in _filtered_counts:
+        if len(_filtered_counts) >= FILTERED_COUNTS_MAX_ENTRIES:
+            _filtered_counts.clear()
+        _filtered_counts[key] = await queryset.acount()
+    return _filtered_counts[key]
+
+
+async def filter_suggestions(queryset, category=None, tags=None):
+    """Only keep suggestions that have every given category and tag"""
+    if not category and not tags:
+        return queryset
+
+    if connection.features.supports_json_field_contains:
+        if category:
+            queryset = queryset.filter(category__contains=category)
+        if tags:
+            queryset = queryset.filter(tags__contains=tags)
+        return queryset
+
+    # SQLite cannot query inside JSON lists, so match the (small) label columns in Python
+    wanted_category, wanted_tags = set(category or []), set(tags or [])
+    ids = [
+        pk
+        async for pk, row_category, row_tags in queryset.values_list("pk", "category", "tags")
+        if wanted_category <= set(row_category) and wanted_tags <= set(row_tags)
+    ]
+    return queryset.filter(pk__in=ids)
+
+
+async def paginate(queryset, page, page_size, count=None):
+    """Async ``Paginator.get_page`` of a queryset, only the rows of the page are loaded.
+
+    ``count`` is the number of rows, None to skip counting: the page is then fetched with one extra
+    row to tell whether another follows, and the paginator only knows of the rows up to there.
+    """
+    if count is None:
+        page = max(page, 1)
+        start = (page - 1) * page_size
+        rows = [item async for item in queryset[start : start + page_size + 1]]
+        paginator = Paginator(range(start + len(rows)), page_size)
+        return paginator, Page(rows[:page_size], page, paginator)
+
+    paginator = Paginator(range(count), page_size)
+    page_obj = paginator.get_page(page)
+    rows = page_obj.object_list  # The positions of the page's rows
+    page_obj.object_list = [item async for item in queryset[rows.start : rows.stop]]
+    return paginator, page_obj
+
+
+def encode_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise errors.ValidationError("Invalid cursor")
+    if not isinstance(data, dict):
+        raise errors.ValidationError("Invalid cursor")
+    return data
+
+
+def keyset_filter(order, values, backwards=False):
+    """Rows after ``values`` in ``order`` (before them if ``backwards``), as (a > x) or (a = x and b > y)...
+
+    The redundant a >= x bound in front lets the database seek into the sort index, it cannot
+    derive a range from the OR chain alone and would scan the index from its start.
+    """
+    condition, equal = Q(), {}
+    for field, value in zip(order, values):
+        name = field.lstrip("-")
+        lookup = "gt" if field.startswith("-") == backwards else "lt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+        if len(equal) == 1:
+            bound = Q(**{f"{name}__{lookup}e": value})
+    return bound & condition
+
+
+def valid_cursor_values(values, order):
+    """Whether ``values`` can be the sort key of a row: one JSON scalar per column of ``order``"""
+    return (
+        isinstance(values, list)
+        and len(values) == len(order)
+        and all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values)
+    )
+
 
-def search_suggestions(query):
-    emb = get_embedding(query)
-    items = vector_search(SuggestionModel, emb)[:50]
-    items = [item for item, dist in items]  # Add if dist < threshold for threshold
-    return items
+async def keyset_paginate(queryset, sort, page_size, cursor=None):
+    """One page of the catalog after (or before) ``cursor``, in ``SORT_ORDERS[sort]``.
+
+    Seeks straight to the page through the sort index and fetches ``page_size + 1`` rows, so the
+    cost of a page does not depend on how deep it is. Returns the rows, the next and previous
+    cursors (None at either end).
+    """
+    order = SORT_ORDERS[sort]
+    data = decode_cursor(cursor) if cursor else {"sort": sort}
+    backwards = "before" in data
+    values = data.get("before", data.get("after"))
+    if data.get("sort") != sort or (values is not None and not valid_cursor_values(values, order)):
+        raise errors.ValidationError("Invalid cursor")
+
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(order, values, backwards))
+    if backwards:
+        order = [field[1:] if field.startswith("-") else f"-{field}" for field in order]
+    rows = [item async for item in queryset.order_by(*order)[: page_size + 1]]
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    has_next, has_previous = (True, more) if backwards else (more, values is not None)
+    keys = [field.lstrip("-") for field in SORT_ORDERS[sort]]
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor({"sort": sort, "after": [getattr(rows[-1], key) for key in keys]})
+    if rows and has_previous:
+        previous_cursor = encode_cursor({"sort": sort, "before": [getattr(rows[0], key) for key in keys]})
+    return rows, next_cursor, previous_cursor
 
 
 class HealthCheckView(APIView):
@@ -34,12 +209,33 @@ class HealthCheckView(APIView):
         return Response({"status": "ok", "message": "PathFinder API is running"})
 
 
-class SuggestionListView(APIView):
+class MetricsView(APIView):
+    """Per-worker cache metrics, used to size the caches"""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(
+            {
+                "embedding_cache": embedding_cache.stats(),
+                "llm_client": llm_stats.stats(),
+                "suggestion_cache": {
+                    **suggestion_cache_stats.stats(),
+                    "size": SuggestionsCacheModel.objects.count(),
+                    "max_entries": settings.SUGGESTION_CACHE["MAX_ENTRIES"],
+                    "ttl": settings.SUGGESTION_CACHE["TTL"],
+                    "catalog_version": CatalogVersion.current(),
+                },
+            }
+        )
+
+
+class SuggestionListView(AsyncAPIView):
     """Suggestion List View"""
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    async def get(self, request):
         # Get pagination parameters
         user = request.user if request.user.is_authenticated else None
 
@@ -47,283 +243,191 @@ class SuggestionListView(APIView):
         page_size = int(request.GET.get("page_size", 50))  # Default 50 items per page
 
         query = request.GET.get("query", "").lower()
+        category = [c.strip() for c in request.GET.get("category", "").split(",") if c.strip()]
+        tags = [t.strip() for t in request.GET.get("tags", "").split(",") if t.strip()]
+        sort = request.GET.get("sort", "name")
+        if sort not in SORT_ORDERS:
+            raise errors.ValidationError(f"sort must be one of {', '.join(SORT_ORDERS)}")
+
+        # Search parameters, so clients can trade recall for latency
+        try:
+            k = int(request.GET.get("k", DEFAULT_SEARCH_RESULTS))
+            max_distance = request.GET.get("max_distance")
+            max_distance = float(max_distance) if max_distance else None
+        except ValueError:
+            raise errors.ValidationError("k must be an integer and max_distance a number")
+
+        if k < 1 or k > MAX_SEARCH_RESULTS:
+            raise errors.ValidationError(f"k must be between 1 and {MAX_SEARCH_RESULTS}")
+
+        # Infinite scroll clients can skip the totals, and with them any counting
+        include_total = request.GET.get("include_total", "true").lower() != "false"
+
+        # Page numbers by default, opaque cursors for clients that only go forward and back
+        cursor = request.GET.get("cursor")
+        if cursor is not None or request.GET.get("pagination") == "cursor":
+            if query:
+                raise errors.ValidationError("Searches are paginated by page number")
+            queryset = await get_all_suggestions(category, tags, sort)
+            suggestions, next_cursor, previous_cursor = await keyset_paginate(queryset, sort, page_size, cursor)
+            pagination = {
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "previous_cursor": previous_cursor,
+                "has_next": next_cursor is not None,
+                "has_previous": previous_cursor is not None,
+            }
+            if include_total:
+                pagination["total_count"] = await catalog_count(queryset, category, tags)
+            return Response({"results": await self.serialize(user, suggestions), "pagination": pagination})
 
-        # Get suggestions
+        # Get suggestions and paginate
         if query:
-            suggestions = search_suggestions(query)
+            queryset = (
+                await filter_suggestions(SuggestionModel.objects.active(), category, tags) if category or tags else None
+            )
+            # Embedding the query is CPU bound, so it runs off the event loop
+            ids = await sync_to_async(search_suggestions)(query, k=k, max_distance=max_distance, queryset=queryset)
+            paginator = Paginator(ids, page_size)  # Counted from the index results, not from loaded rows
+            page_obj = paginator.get_page(page)
+            rows = await SuggestionModel.objects.active().only(*LIST_COLUMNS).ain_bulk(page_obj.object_list)
+            page_obj.object_list = [rows[pk] for pk in page_obj.object_list if pk in rows]
         else:
-            suggestions = get_all_suggestions()
-
-        # Paginate
-        paginator = Paginator(suggestions, page_size)
-        page_obj = paginator.get_page(page)
-
-        # Serialize
-        serializer = SuggestionSerializer(page_obj.object_list, many=True)
-        suggestions_data = serializer.data
+            queryset = await get_all_suggestions(category, tags, sort)
+            count = await catalog_count(queryset, category, tags) if include_total else None
+            paginator, page_obj = await paginate(queryset, page, page_size, count)
+
+        pagination = {
+            "page": page,
+            "page_size": page_size,
+            "has_next": page_obj.has_next(),
+            "has_previous": page_obj.has_previous(),
+        }
+        if include_total:
+            pagination.update(total_pages=paginator.num_pages, total_count=paginator.count)
+        return Response({"results": await self.serialize(user, page_obj.object_list), "pagination": pagination})
+
+    async def serialize(self, user, suggestions):
+        suggestions_data = SuggestionSerializer(suggestions, many=True).data
 
         if user:
-            saved_items = get_saved_items_sync(user)
+            saved_items = await get_saved_items(user, [suggestion["external_id"] for suggestion in suggestions_data])
 
             for suggestion in suggestions_data:
                 suggestion["is_saved"] = suggestion["external_id"] in saved_items
-
-        return Response(
-            {
-                "results": suggestions_data,
-                "pagination": {
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": paginator.num_pages,
-                    "total_count": paginator.count,
-                    "has_next": page_obj.has_next(),
-                    "has_previous": page_obj.has_previous(),
-                },
-            }
-        )
-
-
-def get_all_suggestions():
-    qs = SuggestionModel.objects.all().order_by("name").values()
-    return list(qs)
-
-
-def get_suggestions():
-    suggestions = SuggestionModel.objects.all().order_by("name")
-    serializer = SuggestionSerializer(suggestions, many=True)
-    return serializer.data
+        return suggestions_data
 
 
-@sync_to_async
-def get_async_suggestions():
-    suggestions = SuggestionModel.objects.all().order_by("name")
-    serializer = SuggestionSerializer(suggestions, many=True)
-    return serializer.data
+async def get_all_suggestions(category=None, tags=None, sort="name"):
+    queryset = await filter_suggestions(SuggestionModel.objects.active(), category, tags)
+    return queryset.only(*LIST_COLUMNS).order_by(*SORT_ORDERS[sort])
 
 
-def get_pagination_data(data, page, page_size):
-    # Ensure data is a list or queryset
-    if hasattr(data, "all"):  # queryset
-        data_list = list(data)
-    else:
-        data_list = data
-
-    paginator = Paginator(data_list, page_size)
+async def get_pagination_data(ranking, page, page_size):
+    """Serialize one page of a ``[(suggestion id, score), ...]`` ranking from the live catalog"""
+    paginator = Paginator(ranking, page_size)
     page_obj = paginator.get_page(page)
 
-    # Use ModelSerializer with model instances
-    serializer = SuggestionSerializer(page_obj.object_list, many=True)
+    # Only the rows of this page are loaded, so ratings and saves are always current
+    suggestions = await SuggestionModel.objects.active().ain_bulk([pk for pk, _ in page_obj.object_list])
+    page_suggestions = []
+    for pk, score in page_obj.object_list:
+        suggestion = suggestions.get(pk)
+        if suggestion is not None:  # Removed from the catalog since it was ranked
+            suggestion.score = score
+            page_suggestions.append(suggestion)
+
+    serializer = SuggestionSerializer(page_suggestions, many=True)
     pagination_data = serializer.data
 
     return pagination_data, paginator, page_obj
 
 
-def get_user_model_sync(user):
-    user_model, created = UserProfile.objects.get_or_create(
-        user=user,
-        defaults={
-            "name": user.email.split("@")[0],
-            "basic_information": {},
-            "interests": [],
-            "goals": [],
-            "saved_items": [],
-            "finished_onboarding": False,
-        },
-    )
-    return user_model
-
-
-def get_all_suggestions_cache_sync():
-    return list(SuggestionsCacheModel.objects.all().values())
-
-
-def add_suggestion_cache_sync(user_model, suggestions):
-    SuggestionsCacheModel.objects.update_or_create(
-        basic_information=user_model.basic_information,
-        interests=user_model.interests,
-        goals=user_model.goals,
-        other_goals=user_model.other_goals,
-        defaults={"suggestions": suggestions},
-    )
-
-
-def get_saved_items_sync(user):
-    try:
-        user_model = UserProfile.objects.get(user=user)
-        return set(user_model.saved_items)
-    except UserProfile.DoesNotExist:
-        return set()
-
-
-@sync_to_async
-def get_user_model(user):
-    user_model, created = UserProfile.objects.get_or_create(
+async def get_user_model(user):
+    user_model, created = await UserProfile.objects.aget_or_create(
         user=user,
         defaults={
             "name": user.email.split("@")[0],
             "basic_information": {},
             "interests": [],
             "goals": [],
-            "saved_items": [],
             "finished_onboarding": False,
         },
     )
     return user_model
 
 
-@sync_to_async
-def get_all_suggestions_cache():
-    return list(SuggestionsCacheModel.objects.all().values())
-
+async def get_saved_items(user, external_ids=None):
+    """External ids saved by ``user``, optionally only among ``external_ids``"""
+    saved_items = SavedItem.objects.filter(user__user=user)
+    if external_ids is not None:
+        saved_items = saved_items.filter(suggestion__external_id__in=external_ids)
+    return {external_id async for external_id in saved_items.values_list("suggestion__external_id", flat=True)}
 
-@sync_to_async
-def add_suggestion_cache(user_model, suggestions):
-    SuggestionsCacheModel.objects.update_or_create(
-        basic_information=user_model.basic_information,
-        interests=user_model.interests,
-        goals=user_model.goals,
-        other_goals=user_model.other_goals,
-        defaults={"suggestions": suggestions},
-    )
 
-
-@sync_to_async
-def get_saved_items(user):
-    try:
-        user_model = UserProfile.objects.get(user=user)
-        return set(user_model.saved_items)
-    except UserProfile.DoesNotExist:
-        return set()
-
-
-class PersonalizedSuggestionsView(APIView):
+class PersonalizedSuggestionsView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    async def get(self, request):
         user = request.user
         page = int(request.GET.get("page", 1))
         page_size = int(request.GET.get("page_size", 50))
 
-        # Get all suggestions
-        suggestions_data = get_suggestions()
-        user_model = get_user_model_sync(user)
-        saved_items = get_saved_items_sync(user)
-
-        # Check cached suggestions
-        suggestions_cache = get_all_suggestions_cache_sync()
-        suggestion_cache = list(
-            filter(
-                lambda cache: cache["interests"] == user_model.interests
-                and cache["basic_information"] == user_model.basic_information
-                and cache["goals"] == user_model.goals
-                and cache["other_goals"] == user_model.other_goals,
-                suggestions_cache,
-            )
-        )
-
-        if suggestion_cache and len(suggestion_cache) > 0:
-            ranked_suggestions = suggestion_cache[0]["suggestions"]
-
-            pagination_data, paginator, page_obj = get_pagination_data(ranked_suggestions, page, page_size)
-            pagination_data, paginator, page_obj = get_pagination_data(ranked_suggestions, page, page_size)
-
-            for suggestion in pagination_data:
-                suggestion["is_saved"] = suggestion["external_id"] in saved_items
-
-            return Response(
-                {
-                    "results": pagination_data,
-                    "pagination": {
-                        "page": page,
-                        "page_size": page_size,
-                        "total_pages": paginator.num_pages,
-                        "total_count": paginator.count,
-                        "has_next": page_obj.has_next(),
-                        "has_previous": page_obj.has_previous(),
-                    },
-                },
-                status=status.HTTP_200_OK,
-            )
-
-        # If no cache, call OpenAI API (still async client)
-        api_key = os.environ.get("OPENAI_API_KEY")
-        client = AsyncOpenAI(api_key=api_key)
-
-        # Use synchronous run for async OpenAI call
-        import asyncio
-
-        async def get_completion():
-            """Async wrapper to ensure client is properly closed"""
-            try:
-                return await client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": SYSTEM_RULES},
-                        {
-                            "role": "user",
-                            "content": json.dumps(
-                                {
-                                    "basic_info": user_model.basic_information,
-                                    "interests": user_model.interests,
-                                    "goals": user_model.goals,
-                                    "additional_info": user_model.other_goals,
-                                    "suggestions": suggestions_data,
-                                }
-                            ),
-                        },
-                    ],
-                    response_format={"type": "json_schema", "json_schema": RANKING_SCHEMA},
-                    timeout=20_000,
-                    temperature=0.2,
-                )
-            finally:
-                # Ensure the async client is properly closed before the event loop closes
-                # This prevents "Event loop is closed" warnings
-                await client.close()
-
-        completion = asyncio.run(get_completion())
-        content = json.loads(completion.choices[0].message.content)
-
-        # Merge scores
-        ranked_suggestions = []
-        for s in suggestions_data:
-            for suggestion in content["suggestions"][:20]:
-                if s["external_id"] == suggestion["external_id"]:
-                    s["score"] = suggestion["score"]
-                    break
-            ranked_suggestions.append(s)
-
-        # Add to cache
-        add_suggestion_cache_sync(user_model, ranked_suggestions)
-
-        pagination_data, paginator, page_obj = get_pagination_data(ranked_suggestions, page, page_size)
+        user_model = await get_user_model(user)
+
+        # Stale-while-revalidate: any cached ranking is served at once, and a missing, outdated
+        # or fallback ranking is (re)computed by the configured ranker in the background
+        entry = await alookup_ranking(user_model)
+        if entry is None:
+            # Embeds the profile, so it runs off the event loop
+            entry = await sync_to_async(store_fallback_ranking)(user_model)
+
+        refreshing = False
+        if entry["stale"] or entry["source"] == SuggestionsCacheModel.Source.FALLBACK:
+            # Identical profiles share one in-flight ranking, the others are served what is cached
+            refresh = await sync_to_async(schedule_refresh)(user_model)
+            refreshed = await await_refresh(refresh)
+            if refreshed is not None:
+                entry = refreshed
+            else:
+                refreshing = refresh is None or not refresh.done()  # None: another worker is ranking
+
+        pagination_data, paginator, page_obj = await get_pagination_data(entry["ranking"], page, page_size)
+        saved_items = await get_saved_items(user, [suggestion["external_id"] for suggestion in pagination_data])
         for suggestion in pagination_data:
             suggestion["is_saved"] = suggestion["external_id"] in saved_items
 
-        return Response(
-            {
-                "results": pagination_data,
-                "pagination": {
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": paginator.num_pages,
-                    "total_count": paginator.count,
-                    "has_next": page_obj.has_next(),
-                    "has_previous": page_obj.has_previous(),
-                },
+        data = {
+            "results": pagination_data,
+            "pagination": {
+                "page": page,
+                "page_size": page_size,
+                "total_pages": paginator.num_pages,
+                "total_count": paginator.count,
+                "has_next": page_obj.has_next(),
+                "has_previous": page_obj.has_previous(),
             },
-            status=status.HTTP_200_OK,
-        )
+            "ranking": {"source": entry["source"], "refreshing": refreshing},
+        }
+
+        # Clients poll with If-None-Match until the refined ranking replaces the fallback. The body
+        # carries the user's saves and live ratings, so the validator covers all of it, and shared
+        # caches must not keep it.
+        etag = f'W/"{hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, status=status.HTTP_200_OK, headers=headers)
 
 
-class SuggestionDetailView(APIView):
+class SuggestionDetailView(AsyncAPIView):
     """Suggestion Detail View"""
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, external_id):
+    async def get(self, request, external_id):
         try:
-            suggestion = SuggestionModel.objects.get(external_id=external_id)
+            suggestion = await SuggestionModel.objects.active().aget(external_id=external_id)
             serializer = SuggestionSerializer(suggestion)
             return Response(
                 {
@@ -338,19 +442,17 @@ class SuggestionDetailView(APIView):
             raise errors.NotFound("Suggestion not found")
 
 
-class SuggestionDetailWithSavedStatusView(APIView):
+class SuggestionDetailWithSavedStatusView(AsyncAPIView):
     """Suggestion Detail View with saved status for authenticated users"""
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, external_id):
+    async def get(self, request, external_id):
         user = request.user
 
         try:
-            suggestion = SuggestionModel.objects.get(external_id=external_id)
-            user_profile = UserProfile.objects.get(user=user)
-            saved_items = set(user_profile.saved_items)
-            is_saved = external_id in saved_items
+            suggestion = await SuggestionModel.objects.active().aget(external_id=external_id)
+            is_saved = await SavedItem.objects.filter(user__user=user, suggestion=suggestion).aexists()
             serializer = SuggestionSerializer(suggestion)
 
             return Response(